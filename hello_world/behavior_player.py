@@ -9,46 +9,81 @@ This script might also be used to test behaviors that you have implemented yours
  Args:
     - behavior: Reachy's recorded behavior that you want to play,
     - --ip_address: ip_address of the robot. Default is 'localhost'.
+    - --trace: record a Chrome trace of the behavior in this file (or set HELLO_WORLD_TRACE).
+    - --compensate_lag: advance the goal positions by the tracking lag of the joints, and report
+      the tracking errors (or set HELLO_WORLD_LAG_COMPENSATION=1), see behaviors/tracking.py.
+    - --lag_gain: gain of the tracking error added to the goal positions (or set HELLO_WORLD_LAG_GAIN).
 
-To call this script:
+To call this script (play being the default command, it can be left out):
     cd ~/dev/hello-world
-    python3 -m hello_world.behavior_player behavior_you_want --ip_address ip_of_your_reachy
+    python3 -m hello_world.behavior_player play behavior_you_want --ip_address ip_of_your_reachy
 
 For example, to run the 'asleep' behavior on the robot with IP 192.168.1.28
 
     python3 -m hello_world.behavior_player asleep --ip_address 192.168.1.28
+
+The record subcommand records a new movement in the movements folder instead (see behaviors/recorder.py):
+the present positions of the given parts or joints, at a fixed rate, until Ctrl-C or for --duration seconds.
+An existing recording is only replaced with --force.
+
+    python3 -m hello_world.behavior_player record my_move --joints l_arm l_antenna r_antenna --rate 100
 """
 import asyncio
+import os
+import sys
 from grpc._channel import _InactiveRpcError
 from reachy_sdk import ReachySDK
-from .behaviors.asleep import Asleep
-from .behaviors.look import LookHand
-from .behaviors.moods import Lonely, Tshirt, SweatHead, Sneeze, Whistle, Hello
-from .behaviors.scratch import Scratch
+from .behaviors import tracing
+from .behaviors.audio import get_engine
+from .behaviors.gaze import GazeCache
+from .behaviors.recorder import DEFAULT_BUFFER_DURATION, DEFAULT_RATE, FLUSH_PERIOD, Recorder, resolve_joints
+from .behaviors.registry import BehaviorRegistry, available_behaviors
+from .behaviors.tracking import COMPENSATION_ENV, GAIN_ENV
+from .behaviors.trajectories import DEFAULT_DIRECTORY
+
+
+def record(args, parser):
+    """Record the present positions of the requested joints of Reachy in the movements folder."""
+    path = os.path.join(args.directory, f'{args.name}.npy')
+    if os.path.exists(path) and not args.force:
+        parser.error(f'{path} already exists, use --force to replace it.')
+    if args.buffer < 2 * FLUSH_PERIOD:
+        parser.error(f'--buffer should be at least {2 * FLUSH_PERIOD}s, the samples of two flushes.')
 
+    try:
+        reachy = ReachySDK(host=args.ip_address)
+    except _InactiveRpcError:
+        print('Could not connect to Reachy. \n \
+Make sure that reachy_sdk_server.service is running and that you entered the correct IP address.')
+        sys.exit(1)
 
-def main():
-    """Load the requested behavior and play it on Reachy."""
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        'behavior',
-        help="Reachy's recorded behavior that you want to play.",
-        choices=[
-            'asleep',
-            'look_hand',
-            'lonely',
-            'scratch',
-            'tshirt',
-            'sweat_head',
-            'sneeze',
-            'whistle',
-            'hello',
-        ]
-    )
-    parser.add_argument('--ip_address', help="Reachy's ip address, default is 'localhost'.", default='localhost')
+    try:
+        joints = resolve_joints(reachy, args.joints)
+    except ValueError as e:
+        parser.error(str(e))
+
+    recorder = Recorder(joints, path, rate=args.rate, buffer_duration=args.buffer, overwrite=args.force)
 
-    args = parser.parse_args()
+    print(f'Recording {", ".join(joint.name for joint in joints)} at {args.rate:g}Hz in {path}, Ctrl-C to stop.')
+    try:
+        asyncio.run(recorder.record(args.duration))
+    except KeyboardInterrupt:
+        pass
+    print(f'Done: {recorder.buffer.written} samples, {recorder.missed} missed deadlines.')
+
+
+def play(args, parser):
+    """Load the requested behavior and play it on Reachy."""
+    # The players of the behavior read them when it is instantiated.
+    if args.compensate_lag:
+        os.environ[COMPENSATION_ENV] = '1'
+    if args.lag_gain is not None:
+        os.environ[GAIN_ENV] = str(args.lag_gain)
+
+    if args.trace:
+        tracing.enable(args.trace)
+    else:
+        tracing.enable_from_env()
     requested_behavior = args.behavior
     reachy_ip_address = args.ip_address
 
@@ -57,19 +92,13 @@ def main():
     except _InactiveRpcError:
         print('Could not connect to Reachy. \n \
 Make sure that reachy_sdk_server.service is running and that you entered the correct IP address.')
-        exit()
-
-    behavior_arg_to_class = {
-        'asleep': Asleep(name='asleep', reachy=reachy),
-        'look_hand': LookHand(name='look_hand', reachy=reachy),
-        'lonely': Lonely(name='lonely', reachy=reachy),
-        'scratch': Scratch(name='scratch', reachy=reachy),
-        'tshirt': Tshirt(name='tshirt', reachy=reachy),
-        'sweat_head': SweatHead(name='sweat_head', reachy=reachy),
-        'sneeze': Sneeze(name='sneeze', reachy=reachy),
-        'whistle': Whistle(name='whistle', reachy=reachy),
-        'hello': Hello(name='hello', reachy=reachy),
-    }
+        sys.exit(1)
+
+    # Only the requested behavior is imported and instantiated.
+    behaviors = BehaviorRegistry(reachy)
+
+    # Solve the head positions of the behavior before playing it.
+    GazeCache.for_robot(reachy).warm(behaviors.gaze_targets([requested_behavior]), background=False)
 
     # Make sure that the torque are correctly set at 100, in case
     # the previous turn_off_smoothly did not finish properly
@@ -78,9 +107,14 @@ Make sure that reachy_sdk_server.service is running and that you entered the cor
 
     reachy.turn_on('reachy')
 
+    # The sounds are decoded before the behavior starts.
+    get_engine().start()
+
     async def behavior():
         print(f'Playing {requested_behavior} behavior.')
-        await behavior_arg_to_class[requested_behavior].run()
+        # Started as Idle starts its sub behaviors: its body parts are claimed, its run measured and torn down.
+        task = await behaviors[requested_behavior].start()
+        await task
 
     try:
         asyncio.run(behavior())
@@ -97,6 +131,50 @@ Make sure that reachy_sdk_server.service is running and that you entered the cor
     except KeyboardInterrupt:
         print(f'Ctrl-C received, stopping the {requested_behavior} behavior...')
 
+    tracing.disable()
+
+
+def main():
+    """Play a behavior on Reachy (the default command), or record a new movement."""
+    import argparse
+    parser = argparse.ArgumentParser(epilog='The play command is the default one: behavior_player asleep plays asleep.')
+    commands = parser.add_subparsers(title='commands')
+
+    play_parser = commands.add_parser('play', help='Play a behavior on Reachy.')
+    play_parser.add_argument(
+        'behavior',
+        help="Reachy's recorded behavior that you want to play.",
+        choices=available_behaviors(),
+    )
+    play_parser.add_argument('--ip_address', help="Reachy's ip address, default is 'localhost'.", default='localhost')
+    play_parser.add_argument('--trace', help='Record a Chrome trace (JSON) of the behavior in this file.')
+    play_parser.add_argument('--compensate_lag', help='Advance the goal positions by the tracking lag of the joints.',
+                             action='store_true')
+    play_parser.add_argument('--lag_gain', help='Gain of the tracking error added to the compensated goal positions.',
+                             type=float)
+    play_parser.set_defaults(run=play, parser=play_parser)
+
+    record_parser = commands.add_parser('record', help='Record a new movement in the movements folder.')
+    record_parser.add_argument('name', help='Name of the recording, saved as <name>.npy (and <name>.json) in the folder.')
+    record_parser.add_argument('--joints', help="Parts ('l_arm', 'head', 'reachy'...) or joints to record.", nargs='+',
+                               default=['l_arm', 'r_arm'])
+    record_parser.add_argument('--rate', help='Sampling rate (in Hz).', type=float, default=DEFAULT_RATE)
+    record_parser.add_argument('--duration', help='Duration (in seconds) of the recording, until Ctrl-C by default.',
+                               type=float)
+    record_parser.add_argument('--buffer', help='Samples (in seconds) buffered before being written.', type=float,
+                               default=DEFAULT_BUFFER_DURATION)
+    record_parser.add_argument('--directory', help='Folder of the recordings.', default=DEFAULT_DIRECTORY)
+    record_parser.add_argument('--ip_address', help="Reachy's ip address, default is 'localhost'.", default='localhost')
+    record_parser.add_argument('--force', help='Replace the recording if it already exists.', action='store_true')
+    record_parser.set_defaults(run=record, parser=record_parser)
+
+    # Without a command, the arguments are the ones of play.
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in {*commands.choices, '-h', '--help'}:
+        argv = ['play'] + argv
+    args = parser.parse_args(argv)
+    args.run(args, args.parser)
+
 
 if __name__ == '__main__':
     main()
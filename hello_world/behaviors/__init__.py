@@ -3,31 +3,80 @@ Behavior class.
 
 Define standard behaviors conception.
 Behaviors can be cancelled when running.
+Behaviors claim the body parts they use (resources), which are locked while they run.
+Behaviors reach their first pose with minimum jerk transitions, and can skip their homing, see transitions.py.
+Their runs are recorded in the metrics registry, see metrics.py.
 """
 import asyncio
+import time
+
+from . import metrics
+from .frames import JointMap, set_compliant, set_torque_limit
+from .gaze import GazeCache
+from .resources import ResourceArbiter
+from .tracing import span
+from .transitions import TransitionPlanner
+
+
+_runs = metrics.counter('behavior_runs', 'Runs of the behaviors, by outcome.')
+_run_seconds = metrics.histogram('behavior_run_seconds', 'Duration of the runs of the behaviors.')
+_setup_seconds = metrics.histogram('behavior_setup_seconds', 'Duration of the setup of the behaviors.')
+_teardown_seconds = metrics.histogram('behavior_teardown_seconds', 'Duration of the teardown of the behaviors.')
+_cancel_seconds = metrics.histogram('behavior_cancel_seconds', 'Delay between the cancellation of a behavior and its end.')
+_resources_wait_seconds = metrics.histogram(
+    'behavior_resources_wait_seconds',
+    'Time waited by the behaviors for the body parts they use.',
+)
 
 
 class Behavior:
     """Behavior class."""
 
+    # Body parts used by the behavior, see resources.py.
+    resources = frozenset()
+    # Points (x, y, z) the head looks at, solved before the behavior is played, see gaze.py.
+    gaze_targets = ()
+    # Relative probability of being picked by Idle, and number of Idle cycles before being picked again.
+    weight = 1.0
+    cooldown = 1
+    # Whether the behavior returns to its rest pose at its end, Idle blends into asleep instead.
+    homing = True
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Intialize the behavior."""
         self.name = name
         self._task = None
         self.sub_behavior = sub_behavior
         self.reachy = reachy
+        # Behavior which started this one, whose parts are shared.
+        self.parent = None
+        self._transitions = {}
+
+    @property
+    def arbiter(self) -> ResourceArbiter:
+        """Return the arbiter of the body parts of the robot."""
+        return ResourceArbiter.for_robot(self.reachy)
+
+    @property
+    def gaze(self) -> GazeCache:
+        """Return the cache of the head positions looking at points."""
+        return GazeCache.for_robot(self.reachy)
 
     async def start(self):
         """Create asynchronous task used tu run the behavior."""
+        tic = time.monotonic()
         await self.setup()
+        _setup_seconds.observe(time.monotonic() - tic, behavior=self.name)
         self._task = asyncio.create_task(self._run(), name=f'behavior_{self.name}')
         return self._task
 
     async def stop(self):
         """Cancel the behavior."""
         if self._task is not None:
+            tic = time.monotonic()
             self._task.cancel()
             await self._task
+            _cancel_seconds.observe(time.monotonic() - tic, behavior=self.name)
 
     async def setup(self):
         """Define setup method."""
@@ -37,18 +86,77 @@ class Behavior:
         """Run method."""
         pass
 
+    def prefetch(self):
+        """Load what the behavior needs before it is played, called from a worker thread."""
+        self.gaze.warm(self.gaze_targets, background=False)
+
     async def _run(self):
+        tic = time.monotonic()
+        with span('resources', behavior=self.name):
+            await self.arbiter.acquire(self, self.resources)
+        _resources_wait_seconds.observe(time.monotonic() - tic, behavior=self.name)
+
+        outcome = 'failed'
+        tic = time.monotonic()
         try:
-            await self.run()
-        except asyncio.CancelledError:
-            if self.sub_behavior:
-                raise
-        await self.teardown()
+            try:
+                with span(self.name):
+                    await self.run()
+                outcome = 'completed'
+            except asyncio.CancelledError:
+                outcome = 'cancelled'
+                if self.sub_behavior:
+                    raise
+            _run_seconds.observe(time.monotonic() - tic, behavior=self.name)
+
+            tic = time.monotonic()
+            with span('teardown', behavior=self.name):
+                await self.teardown()
+            _teardown_seconds.observe(time.monotonic() - tic, behavior=self.name)
+        finally:
+            self.arbiter.release(self)
+            _runs.inc(behavior=self.name, outcome=outcome)
 
     async def teardown(self):
         """Define teardown method."""
         pass
 
+    async def transition(self, goal_positions: dict, duration: float):
+        """Blend from the current goal state to the goal positions, in at most duration seconds."""
+        joints = tuple(goal_positions)
+        planner = self._transitions.get(joints)
+        if planner is None:
+            planner = TransitionPlanner(joints, name=self.name)
+            self._transitions[joints] = planner
+        return await planner.play(list(goal_positions.values()), max_duration=duration)
+
+    def joint_map(self, joints, columns=None) -> JointMap:
+        """Precompile the mapping from the columns of recorded frames to the joints."""
+        return JointMap(joints, columns=columns, name=self.name)
+
+    def commit_frame(self, joint_map: JointMap, frame) -> None:
+        """Send the goal positions of a whole frame as one batched update."""
+        joint_map.commit(frame)
+
+    def set_torque_limit(self, joints, torque_limit: float) -> None:
+        """Set the torque limit of the joints, skipping the ones which already have it."""
+        set_torque_limit(joints, torque_limit, name=self.name)
+
+    def set_compliant(self, joints, compliant: bool) -> None:
+        """Set the compliance of the joints, skipping the ones which are already in that mode."""
+        set_compliant(joints, compliant, name=self.name)
+
+    async def turn_off_smoothly(self, part: str, duration: float = 2.0) -> None:
+        """Turn the part compliant smoothly, as ReachySDK.turn_off_smoothly but without blocking the event loop."""
+        joints = list((self.reachy if part == 'reachy' else getattr(self.reachy, part)).joints.values())
+        self.set_torque_limit(joints, 0.0)
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            # Also when cancelled: the joints are not left without torque but stiff.
+            self.set_compliant(joints, True)
+            self.set_torque_limit(joints, 100.0)
+
     def is_running(self):
         """Return if the behavior is currently running."""
         return self._task is not None and not self._task.done()
@@ -4,16 +4,17 @@ Asleep behavior definition.
 Asleep behavior is used to wait between behaviors.
 """
 
-import asyncio
 import time
 from .breathing import ArmBreathing
 
 import numpy as np
 
-from reachy_sdk.trajectory import goto_async
-
 from . import Behavior
+from .oscillators import OscillatorBank
 from .player import playsound
+from .resources import HEAD, LEFT_ARM, RIGHT_ARM, SOUND
+from .timeline import Timeline
+from .tracing import gather
 
 
 class Asleep(Behavior):
@@ -24,69 +25,55 @@ class Asleep(Behavior):
     Dependencies to other behaviors: ArmBreathing
     """
 
+    resources = frozenset({RIGHT_ARM, LEFT_ARM, HEAD, SOUND})
+    gaze_targets = ((0.5, 0.0, -0.3),)
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the Asleep behavior."""
         super().__init__(name, reachy=reachy, sub_behavior=sub_behavior)
-        self.left_pos = [0, 0, 0, 0, 0, 0, 0]
-        self.right_pos = [0, 0, 0, 0, 0, 0, 0]
+        self.left_pos = [0, 0, 0, 0, 0, 0, 0, 0]
+        self.right_pos = [0, 0, 0, 0, 0, 0, 0, 0]
         self.joint_names = list(reachy.l_arm.joints.values()) + list(self.reachy.r_arm.joints.values())
 
-        self.inhale = 'sounds/inhaling.mp3'
+        self.inhale = 'sounds/inhaling.wav'
 
-        self.playsIsOk0 = True
-        self.playsIsOk = False
-        self.playsIsOk2 = False
+        self.breaths = Timeline(name='breaths')
+        for t in (1.2, 4.4, 7.8):
+            self.breaths.at(t, self._breathe_in, label='inhale')
 
-    async def run(self):
-        """Implement the behavior."""
-        self.reachy.turn_on('reachy')
-
-        breathing = ArmBreathing(name='arm_breathing', reachy=self.reachy, fundamental_frequency=0.3, phase=-np.pi/4)
-
-        goto = goto_async(
-            goal_positions={
-                joint_name: pos
-                for (joint_name, pos) in zip(self.joint_names, self.left_pos + self.right_pos)
-            },
-            duration=1.5,
+        # The arms breathing and the antennas share one tick, evaluated from a one-period table.
+        breathing = ArmBreathing(name=self.name, reachy=self.reachy, fundamental_frequency=0.3, phase=-np.pi/4)
+        antennas = OscillatorBank(
+            joints=[self.reachy.head.l_antenna, self.reachy.head.r_antenna],
+            amplitudes=[20, -20],
+            frequencies=0.3,
+            offsets=[70, -70],
         )
-        goto_antennas = goto_async({self.reachy.head.l_antenna: 70, self.reachy.head.r_antenna: -70}, duration=1.0)
-        look_at = self.reachy.head.look_at_async(x=0.5, y=0, z=-0.3, duration=1.0)
-        await asyncio.gather(goto, look_at, goto_antennas)
-        self.reachy.turn_off_smoothly('head')
-
-        self.reachy.head.l_antenna.compliant = False
-        self.reachy.head.r_antenna.compliant = False
+        self.oscillators = breathing.oscillators + antennas
+        self.oscillators.precompute()
 
-        tic = time.time()
-
-        await breathing.start()
-
-        while time.time() - tic < 10.0:
-            t = time.time() - tic
-
-            pos = 20 * np.sin(2 * np.pi * 0.3 * t)
-            self.reachy.head.l_antenna.goal_position = 70 + pos
-            self.reachy.head.r_antenna.goal_position = -70 - pos
-
-            if (time.time() - tic > 1.2) and self.playsIsOk0:
-                playsound(self.inhale, block=False)
-                self.playsIsOk0 = False
-                self.playsIsOk = True
+    async def run(self):
+        """Implement the behavior."""
+        self.set_compliant(self.reachy.joints.values(), False)
 
-            if (time.time() - tic > 4.4) and self.playsIsOk:
-                playsound(self.inhale, block=False)
-                self.playsIsOk = False
-                self.playsIsOk2 = True
+        self.set_torque_limit(self.reachy.r_arm.joints.values(), 100.0)
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
 
-            if (time.time() - tic > 7.8) and self.playsIsOk2:
-                playsound(self.inhale, block=False)
-                self.playsIsOk2 = False
+        # Blends from wherever the previous behavior left the arms.
+        goto = self.transition(dict(zip(self.joint_names, self.left_pos + self.right_pos)), duration=1.5)
+        goto_antennas = self.transition({self.reachy.head.l_antenna: 70, self.reachy.head.r_antenna: -70}, duration=1.0)
+        look_at = self.gaze.look_at_async(x=0.5, y=0, z=-0.3, duration=1.0)
+        await gather(goto, look_at, goto_antennas)
+        await self.turn_off_smoothly('head')
 
-            await asyncio.sleep(0.01)
+        self.set_compliant([self.reachy.head.l_antenna, self.reachy.head.r_antenna], False)
 
-        await breathing.stop()
+        # The motion and the breath sounds share the same clock.
+        t0 = time.monotonic()
+        await gather(
+            self.oscillators.drive(duration=10.0, t0=t0),
+            self.breaths.run(t0=t0),
+        )
 
-        self.playsIsOk0 = True
-        self.playsIsOk = False
-        self.playsIsOk2 = False
+    def _breathe_in(self) -> None:
+        playsound(self.inhale, block=False)
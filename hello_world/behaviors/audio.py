@@ -0,0 +1,300 @@
+"""
+Audio engine.
+
+A single long-lived worker thread plays the sounds of the behaviors. The sounds are decoded once
+into PCM buffers when the engine starts, and play/stop requests are sent to the worker over a
+queue, so playing a sound neither spawns a thread nor decodes a file. The applications start the
+engine before the first behavior (Idle does it in an executor, off the event loop). The delay
+between a request and the actual start of the sound is measured for every request, including the
+decoding when the engine had not been started.
+
+The sounds are sent to a sink, chosen with the HELLO_WORLD_AUDIO_SINK environment variable:
+    - 'device' (default): the sound card, through simpleaudio,
+    - 'null': nothing is played, the requests are only recorded,
+    - 'file:<directory>': each played sound is written as a .wav file in the directory.
+The sounds are shipped as PCM WAV files, decoded with the standard library. Other formats need
+pydub (the 'audio' extra): a sound which cannot be decoded is an error, not a silent fallback.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import wave
+from collections import deque
+
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+try:
+    import pydub
+except ImportError:
+    pydub = None
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = 'sounds'
+SINK_ENV = 'HELLO_WORLD_AUDIO_SINK'
+
+
+class Clip:
+    """Decoded sound, as a PCM buffer and its format."""
+
+    def __init__(self, path: str, pcm: bytes = None, channels: int = 1, sample_width: int = 2, frame_rate: int = 44100) -> None:
+        """Store the PCM buffer and its format."""
+        self.path = path
+        self.pcm = pcm
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frame_rate = frame_rate
+
+    @property
+    def duration(self) -> float:
+        """Return the duration of the sound (in seconds)."""
+        if self.pcm is None:
+            return 0.0
+        return len(self.pcm) / (self.channels * self.sample_width * self.frame_rate)
+
+    @classmethod
+    def decode(cls, path: str) -> 'Clip':
+        """Decode the sound file."""
+        if path.lower().endswith('.wav'):
+            try:
+                with wave.open(path, 'rb') as f:
+                    return cls(path, f.readframes(f.getnframes()), f.getnchannels(), f.getsampwidth(), f.getframerate())
+            except wave.Error as e:
+                # e.g. WAVE_FORMAT_EXTENSIBLE files, only supported by the wave module since Python 3.12.
+                if pydub is None:
+                    raise ValueError(f'Could not decode {path} ({e}), convert it to PCM WAV or install pydub.')
+
+        if pydub is None:
+            raise ValueError(f'Could not decode {path}, convert it to PCM WAV or install pydub.')
+        segment = pydub.AudioSegment.from_file(path)
+        return cls(path, segment.raw_data, segment.channels, segment.sample_width, segment.frame_rate)
+
+
+class _Playback:
+    """Handle on a sound played by a sink."""
+
+    def __init__(self, done: threading.Event = None, stop=None) -> None:
+        self._done = done
+        self._stop = stop
+
+    def is_playing(self) -> bool:
+        return self._done is not None and not self._done.is_set()
+
+    def wait_done(self) -> None:
+        if self._done is not None:
+            self._done.wait()
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop()
+
+
+class _Request:
+    """Request sent to the worker."""
+
+    def __init__(self, command: str, target, block: bool = False, requested_at: float = None) -> None:
+        self.command = command
+        self.target = target
+        self.requested_at = time.monotonic() if requested_at is None else requested_at
+        self.started = threading.Event() if block else None
+        self.playback = None
+
+
+class NullSink:
+    """Sink which only records the played clips."""
+
+    def __init__(self) -> None:
+        """Initialize the list of played clips."""
+        self.played = []
+
+    def play(self, clip: Clip):
+        """Record the clip."""
+        self.played.append((time.monotonic(), clip.path))
+        return _Playback()
+
+
+class FileSink:
+    """Sink writing each played clip as a .wav file."""
+
+    def __init__(self, directory: str) -> None:
+        """Write the clips in the given directory."""
+        self.directory = directory
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def play(self, clip: Clip):
+        """Write the clip."""
+        self.count += 1
+        name = os.path.splitext(os.path.basename(clip.path))[0]
+        if clip.pcm is not None:
+            with wave.open(os.path.join(self.directory, f'{self.count:04d}_{name}.wav'), 'wb') as f:
+                f.setnchannels(clip.channels)
+                f.setsampwidth(clip.sample_width)
+                f.setframerate(clip.frame_rate)
+                f.writeframes(clip.pcm)
+        return _Playback()
+
+
+class DeviceSink:
+    """Sink playing the clips on the sound card."""
+
+    def __init__(self) -> None:
+        """Check that the clips can be played without blocking."""
+        if simpleaudio is None:
+            raise RuntimeError(
+                'simpleaudio is needed to play the sounds, install it '
+                f'(or set {SINK_ENV}=null to run without sound).'
+            )
+
+    def play(self, clip: Clip):
+        """Start playing the clip, without blocking."""
+        return simpleaudio.play_buffer(clip.pcm, clip.channels, clip.sample_width, clip.frame_rate)
+
+
+def make_sink(description: str = None):
+    """Create the sink from its description, see the module documentation."""
+    description = description or os.environ.get(SINK_ENV, 'device')
+    if description == 'null':
+        return NullSink()
+    if description.startswith('file:'):
+        return FileSink(description[len('file:'):])
+    if description == 'device':
+        return DeviceSink()
+    raise ValueError(f'Unknown audio sink "{description}".')
+
+
+class AudioEngine:
+    """
+    AudioEngine class.
+
+    Plays the pre-decoded sounds from a single worker thread.
+    """
+
+    def __init__(self, sink=None, directory: str = DEFAULT_DIRECTORY) -> None:
+        """Initialize the engine, the sounds are decoded when it starts."""
+        self.sink = sink if sink is not None else make_sink()
+        self.directory = directory
+
+        self.clips = {}
+        self.latencies = deque(maxlen=1000)
+
+        self._requests = queue.Queue()
+        self._playing = {}
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Decode the sounds of the directory and start the worker.
+
+        Decoding takes a while: call it before playing, and from an executor within the event loop.
+        """
+        with self._lock:
+            if self._worker is not None:
+                return
+
+            tic = time.monotonic()
+            if os.path.isdir(self.directory):
+                for filename in sorted(os.listdir(self.directory)):
+                    self.load(os.path.join(self.directory, filename))
+            logger.info(f'Decoded {len(self.clips)} sounds in {1000 * (time.monotonic() - tic):.0f}ms.')
+
+            self._worker = threading.Thread(target=self._work, name='audio_engine', daemon=True)
+            self._worker.start()
+
+    def load(self, path: str) -> Clip:
+        """Return the decoded sound, decoding it if needed."""
+        path = os.path.normpath(path)
+        clip = self.clips.get(path)
+        if clip is None:
+            clip = Clip.decode(path)
+            self.clips[path] = clip
+        return clip
+
+    def play(self, path: str, block: bool = False) -> None:
+        """Request the sound to be played, optionally waiting until it is over."""
+        requested_at = time.monotonic()
+        if self._worker is None:
+            logger.warning(f'The audio engine was not started, decoding the sounds before playing {path}.')
+            self.start()
+
+        request = _Request('play', self.load(path), block=block, requested_at=requested_at)
+        self._requests.put(request)
+
+        if block:
+            request.started.wait()
+            if request.playback is not None:
+                request.playback.wait_done()
+
+    def stop(self, path: str = None) -> None:
+        """Stop the given sound, or all of them."""
+        self._requests.put(_Request('stop', os.path.normpath(path) if path else None))
+
+    def close(self) -> None:
+        """Stop all the sounds and the worker."""
+        if self._worker is None:
+            return
+        self.stop()
+        self._requests.put(None)
+        self._worker.join()
+        self._worker = None
+
+    @property
+    def mean_latency(self) -> float:
+        """Return the mean delay between the requests and the start of the sounds."""
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+    @property
+    def max_latency(self) -> float:
+        """Return the worst delay between the requests and the start of the sounds."""
+        return max(self.latencies, default=0.0)
+
+    def _work(self) -> None:
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+
+            try:
+                if request.command == 'play':
+                    self._play(request)
+                elif request.command == 'stop':
+                    self._stop(request.target)
+            except Exception:
+                logger.exception(f'Audio request {request.command} failed.')
+            finally:
+                if request.started is not None:
+                    request.started.set()
+
+    def _play(self, request: _Request) -> None:
+        clip = request.target
+        request.playback = self.sink.play(clip)
+
+        latency = time.monotonic() - request.requested_at
+        self.latencies.append(latency)
+        logger.debug(f'Playing {clip.path}, started {1000 * latency:.2f}ms after the request.')
+
+        self._playing = {path: p for path, p in self._playing.items() if p.is_playing()}
+        self._playing[clip.path] = request.playback
+
+    def _stop(self, path: str = None) -> None:
+        for playing_path, playback in list(self._playing.items()):
+            if path is None or playing_path == path:
+                playback.stop()
+                del self._playing[playing_path]
+
+
+_engine = None
+
+
+def get_engine() -> AudioEngine:
+    """Return the audio engine shared by all the behaviors of the process."""
+    global _engine
+    if _engine is None:
+        _engine = AudioEngine()
+    return _engine
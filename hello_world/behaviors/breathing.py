@@ -1,13 +1,9 @@
 """Implement the Breathing behavior where Reachy discreetly swings its arms at a given frequency."""
-import asyncio
-import time
-
 import numpy as np
 
-from reachy_sdk.trajectory import goto_async
-
-
 from . import Behavior
+from .oscillators import OscillatorBank
+from .resources import ARMS
 
 
 class ArmBreathing(Behavior):
@@ -20,6 +16,8 @@ class ArmBreathing(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = ARMS
+
     def __init__(
             self,
             name: str,
@@ -33,15 +31,32 @@ class ArmBreathing(Behavior):
         self.fundamental_frequency = fundamental_frequency
         self.phase = phase
 
+        self.oscillators = self.breathing_oscillators()
+
+    def breathing_oscillators(self) -> OscillatorBank:
+        """Return the oscillators of the arms, the left arm mirroring the right one."""
+        arms = self.reachy.r_arm, self.reachy.l_arm
+        f = self.fundamental_frequency
+        return OscillatorBank(
+            joints=[
+                arms[0].r_arm_yaw, arms[1].l_arm_yaw,
+                arms[0].r_shoulder_roll, arms[1].l_shoulder_roll,
+                arms[0].r_forearm_yaw, arms[1].l_forearm_yaw,
+                arms[0].r_gripper, arms[1].l_gripper,
+            ],
+            amplitudes=[4, -4, 1.5, -1.5, 3, -3, -4, 4],
+            frequencies=[f, f, f, f, f / 2, f / 2, f, f],
+            phases=self.phase + np.array([0, 0, np.pi, np.pi, np.pi, np.pi, np.pi, np.pi]),
+            name=self.name,
+        )
+
     async def run(self):
         """Implement the behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 100.0
+        self.set_torque_limit(self.reachy.r_arm.joints.values(), 100.0)
 
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 100.0
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
 
-        await goto_async({
+        await self.transition({
             self.reachy.l_arm.l_shoulder_pitch: 0.0,
             self.reachy.l_arm.l_shoulder_roll: 0.0,
             self.reachy.l_arm.l_arm_yaw: 0.0,
@@ -62,22 +77,7 @@ class ArmBreathing(Behavior):
             duration=1.0,
         )
 
-        t0 = time.time()
-
-        while True:
-            pos = 4 * np.sin(2 * np.pi * self.fundamental_frequency * (time.time()-t0) + self.phase)
-            self.reachy.r_arm.r_arm_yaw.goal_position = pos
-            self.reachy.l_arm.l_arm_yaw.goal_position = -pos
-            pos2 = 1.5 * np.sin(2 * np.pi * self.fundamental_frequency * (time.time()-t0) + np.pi + self.phase)
-            self.reachy.r_arm.r_shoulder_roll.goal_position = pos2
-            self.reachy.l_arm.l_shoulder_roll.goal_position = -pos2
-            pos3 = 3 * np.sin(2 * np.pi * self.fundamental_frequency/2 * (time.time()-t0) + np.pi + self.phase)
-            self.reachy.r_arm.r_forearm_yaw.goal_position = pos3
-            self.reachy.l_arm.l_forearm_yaw.goal_position = -pos3
-            pos4 = 4 * np.sin(2 * np.pi * self.fundamental_frequency * (time.time()-t0) + np.pi + self.phase)
-            self.reachy.r_arm.r_gripper.goal_position = -pos4
-            self.reachy.l_arm.l_gripper.goal_position = pos4
-            await asyncio.sleep(0.01)
+        await self.oscillators.drive()
 
     async def teardown(self):
         """Use the teardown method from parent class."""
@@ -0,0 +1,225 @@
+"""
+Movement bundle.
+
+All the clips of the movements folder packed in one file, so that loading them costs a single open
+and mmap instead of one per recording. The file starts with a header indexing the clips:
+    - the magic bytes b'HWBUNDLE' and the length of the header (little-endian uint64),
+    - the header itself, JSON encoded: for each clip, its offset (from the start of the data),
+      shape, dtype and metadata (joint order, played window and rate), and the scale and offset
+      of each joint for the int16 clips (see quantized.py),
+    - the data of the clips, each one aligned on ALIGNMENT bytes.
+The file is memory-mapped once, and each clip is a zero-copy read-only view on the mapping.
+The same layout can be placed in a shared memory block (Bundle.share), to which other processes
+attach (Bundle.attach) to get zero-copy views on the clips as well.
+
+The bundle is built from the clips the store would play (preprocessed clips, keyframes or raw
+windows), and has to be rebuilt when they change:
+    python3 -m hello_world.behaviors.bundle
+"""
+import json
+import logging
+import os
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .quantized import QuantizedFrames
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NAME = 'movements.bundle'
+
+MAGIC = b'HWBUNDLE'
+ALIGNMENT = 64
+
+_LENGTH = struct.Struct('<Q')
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class Bundle:
+    """
+    Bundle class.
+
+    Read-only views on the clips of a memory-mapped bundle file.
+    """
+
+    def __init__(self, path: str, buffer=None) -> None:
+        """Map the bundle file, or use the buffer holding its content, and read its index."""
+        self.path = path
+        if buffer is None:
+            self._buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        else:
+            self._buffer = np.frombuffer(buffer, dtype=np.uint8)
+            self._buffer.flags.writeable = False
+        self._memory = None
+
+        prefix = len(MAGIC) + _LENGTH.size
+        if bytes(self._buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f'{path} is not a movement bundle.')
+        header_length, = _LENGTH.unpack(bytes(self._buffer[len(MAGIC):prefix]))
+        header = json.loads(bytes(self._buffer[prefix:prefix + header_length]).decode())
+
+        self._data_offset = _aligned(prefix + header_length)
+        self.entries = header['entries']
+        self._views = {}
+
+    def __contains__(self, name: str) -> bool:
+        """Return if the bundle contains the clip."""
+        return name in self.entries
+
+    def __iter__(self):
+        """Iterate over the names of the clips."""
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        """Return the number of clips."""
+        return len(self.entries)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Return the read-only view on the clip."""
+        view = self._views.get(name)
+        if view is None:
+            entry = self.entries[name]
+            dtype = np.dtype(entry['dtype'])
+            start = self._data_offset + entry['offset']
+            stop = start + dtype.itemsize * int(np.prod(entry['shape']))
+            view = self._buffer[start:stop].view(dtype).reshape(entry['shape'])
+            if 'quantization' in entry:
+                view = QuantizedFrames(view, **entry['quantization'])
+            self._views[name] = view
+        return view
+
+    def metadata(self, name: str) -> dict:
+        """Return the metadata of the clip (joints, window, rate)."""
+        return self.entries[name]['metadata']
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the bundle file."""
+        return self._buffer.nbytes
+
+    @classmethod
+    def attach(cls, name: str) -> 'Bundle':
+        """Return the bundle held by the shared memory block, its clips being views on the block."""
+        memory = shared_memory.SharedMemory(name=name)
+        bundle = cls(f'shm://{name}', buffer=memory.buf)
+        # The block stays mapped as long as the bundle (and its views) are in use.
+        bundle._memory = memory
+        return bundle
+
+    def close(self) -> None:
+        """Release the clips and unmap the shared memory block of an attached bundle (its clips must not be used anymore)."""
+        self._views.clear()
+        self._buffer = None
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
+
+    @staticmethod
+    def write(path: str, clips: dict, metadata: dict = None) -> None:
+        """Write the clips (name: array or QuantizedFrames) and their metadata (name: dict) in a bundle file."""
+        prefix, entries, data, _ = _layout(clips, metadata)
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(prefix)
+            for name, clip in data.items():
+                f.seek(_aligned(len(prefix)) + entries[name]['offset'])
+                f.write(clip.tobytes())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def share(clips: dict, metadata: dict = None) -> shared_memory.SharedMemory:
+        """Copy the clips and their metadata in a new shared memory block, in the bundle layout, and return the block.
+
+        The block has to be unlinked by its creator once the processes using it are done.
+        """
+        prefix, entries, data, size = _layout(clips, metadata)
+
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        buffer = np.frombuffer(memory.buf, dtype=np.uint8)
+        buffer[:len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+        for name, clip in data.items():
+            start = _aligned(len(prefix)) + entries[name]['offset']
+            buffer[start:start + clip.nbytes] = clip.reshape(-1).view(np.uint8)
+        # The block cannot be closed while an array still exports its buffer.
+        del buffer
+        return memory
+
+
+def _layout(clips: dict, metadata: dict = None) -> tuple:
+    """Return the header prefix, the index, the contiguous data of the clips and the total size of their bundle."""
+    metadata = metadata or {}
+
+    entries, data, offset = {}, {}, 0
+    for name, clip in clips.items():
+        entry = {'offset': offset, 'metadata': metadata.get(name, {})}
+        if isinstance(clip, QuantizedFrames):
+            entry['quantization'] = {'scale': clip.scale.tolist(), 'offset': clip.offset.tolist()}
+            clip = clip.data
+
+        data[name] = np.ascontiguousarray(clip)
+        entry.update(shape=list(data[name].shape), dtype=data[name].dtype.str)
+        entries[name] = entry
+        offset = _aligned(offset + data[name].nbytes)
+
+    header = json.dumps({'entries': entries}).encode()
+    prefix = MAGIC + _LENGTH.pack(len(header)) + header
+    return prefix, entries, data, max(_aligned(len(prefix)) + offset, 1)
+
+
+def collect(names, directory: str = None) -> tuple:
+    """Return the clips the store plays for the recordings, and their metadata."""
+    from .trajectories import DEFAULT_DIRECTORY, PLAYBACK_WINDOWS, TrajectoryStore, recorded_joints, recorded_rate
+
+    directory = directory or DEFAULT_DIRECTORY
+    store = TrajectoryStore(directory, use_bundle=False)
+    clips, metadata = {}, {}
+    for name in names:
+        clips[name] = np.asarray(store.clip(name))
+        metadata[name] = store.metadata(name) or {
+            'source': f'{name}.npy',
+            'joints': recorded_joints(name, directory),
+            'window': list(PLAYBACK_WINDOWS.get(name, (None, None))),
+            'rate': recorded_rate(name, directory),
+        }
+    return clips, metadata
+
+
+def build(names, directory: str = None, path: str = None) -> Bundle:
+    """Pack the clips the store plays for the recordings in a bundle, return it."""
+    from .trajectories import DEFAULT_DIRECTORY
+
+    directory = directory or DEFAULT_DIRECTORY
+    path = path or os.path.join(directory, DEFAULT_NAME)
+
+    Bundle.write(path, *collect(names, directory))
+    return Bundle(path)
+
+
+def main():
+    """Pack the clips of the movements folder in a bundle."""
+    import argparse
+
+    from .trajectories import DEFAULT_DIRECTORY, PLAYBACK_WINDOWS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help='Recordings to pack, all of them by default.')
+    parser.add_argument('--directory', help='Folder of the recordings.', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--output', help=f'Path of the bundle, {DEFAULT_NAME} in the folder by default.')
+    args = parser.parse_args()
+
+    bundle = build(args.names or list(PLAYBACK_WINDOWS), directory=args.directory, path=args.output)
+    for name in bundle:
+        clip = bundle[name]
+        print(f'{name}: {clip.shape[0]}x{clip.shape[1]} {bundle.entries[name]["dtype"]} frames')
+    print(f'{bundle.path}: {len(bundle)} clips, {bundle.nbytes} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Frame commit tools.
+
+With the SDK, each ``joint.goal_position = pos`` is a blocking round trip to the SDK synchronisation
+thread, so writing a 15 joints frame costs 15 round trips. A JointMap commits a whole frame at once:
+the goal positions are stored on every joint first, then all the joints are flagged for
+synchronisation in a single round trip, so they also leave in the same joints command.
+This relies on the synchronisation internals of the SDK joints (reachy-sdk 0.7, see
+SYNC_ATTRIBUTES): when the joints lack them, the goal positions are written one joint at a time.
+
+Only the changes are sent: a JointMap remembers the goal positions it last sent (until reset, at
+the start of each played trajectory), and skips the joints which moved less than its epsilon (in
+degrees, HELLO_WORLD_WRITE_EPSILON environment variable, 0.01 by default). set_torque_limit and
+set_compliant likewise skip the joints whose register already holds the value. The skipped writes
+are counted in the writes_saved metric.
+"""
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from google.protobuf.wrappers_pb2 import FloatValue
+from reachy_sdk.joint import Joint
+
+from . import metrics
+from .tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+_goal_writes = metrics.counter('goal_writes', 'Goal positions sent through the joint maps, by behavior.')
+_writes_saved = metrics.counter('writes_saved', 'Joint writes skipped as the register already held the value, by register.')
+
+EPSILON_ENV = 'HELLO_WORLD_WRITE_EPSILON'
+DEFAULT_EPSILON = 0.01
+
+# Torque limits (in %) closer than this are the same.
+TORQUE_EPSILON = 0.5
+
+# Attributes of the SDK joints the batched commit relies on.
+SYNC_ATTRIBUTES = ('_state', '_register_needing_sync', '_need_sync', '_loop')
+
+
+def _default_epsilon() -> float:
+    epsilon = os.environ.get(EPSILON_ENV)
+    return float(epsilon) if epsilon else DEFAULT_EPSILON
+
+
+def set_torque_limit(joints, torque_limit: float, name: str = '') -> int:
+    """Set the torque limit of the joints which do not already have it, return the number of writes."""
+    joints = list(joints)
+    changed = [joint for joint in joints if abs(joint.torque_limit - torque_limit) > TORQUE_EPSILON]
+    for joint in changed:
+        joint.torque_limit = torque_limit
+    _writes_saved.inc(len(joints) - len(changed), register='torque_limit', behavior=name)
+    return len(changed)
+
+
+def set_compliant(joints, compliant: bool, name: str = '') -> int:
+    """Set the compliance of the joints which are not already in that mode, return the number of writes."""
+    joints = list(joints)
+    changed = [joint for joint in joints if joint.compliant != compliant]
+    for joint in changed:
+        joint.compliant = compliant
+    _writes_saved.inc(len(joints) - len(changed), register='compliant', behavior=name)
+    return len(changed)
+
+
+class JointMap:
+    """
+    JointMap class.
+
+    Precompiled mapping from the columns of a recorded frame to the joints they drive.
+    """
+
+    def __init__(self, joints, columns=None, name: str = '', epsilon=None) -> None:
+        """Map the given columns of the frames (all of them, in order, by default) to the joints.
+
+        Goal positions closer than epsilon (in degrees, one value or one per joint) to the last sent ones are skipped.
+        """
+        self.joints = list(joints)
+        self.name = name
+        self.epsilon = _default_epsilon() if epsilon is None else np.asarray(epsilon, dtype=float)
+        self.columns = None if columns is None else np.asarray(columns, dtype=np.intp)
+
+        if self.columns is not None and len(self.columns) != len(self.joints):
+            raise ValueError(f'columns should be length {len(self.joints)} (got {len(self.columns)} instead)!')
+
+        self._loop = None
+        self._batched = None
+        self._last = None
+
+    def __len__(self) -> int:
+        """Return the number of joints of the map."""
+        return len(self.joints)
+
+    def select(self, frame) -> np.ndarray:
+        """Return the values of the frame for the mapped joints, in degrees."""
+        values = np.asarray(frame, dtype=float)
+        if self.columns is not None:
+            values = values[self.columns]
+        return values
+
+    def reset(self) -> None:
+        """Forget the last sent goal positions, the next frame being sent whole."""
+        self._last = None
+
+    def commit(self, frame) -> None:
+        """Send the goal positions of a whole frame (the ones which changed) as one batched update."""
+        values = self.select(frame)
+
+        if self._last is None:
+            self._last = values.copy()
+            indices = np.arange(len(values))
+        else:
+            indices = np.flatnonzero(np.abs(values - self._last) > self.epsilon)
+            self._last[indices] = values[indices]
+            _writes_saved.inc(len(values) - len(indices), register='goal_position', behavior=self.name)
+            if not len(indices):
+                return
+
+        if self._batched is None:
+            self._batched = self._can_batch()
+
+        _goal_writes.inc(len(indices), behavior=self.name)
+        joints = [self.joints[i] for i in indices]
+
+        with span('commit', 'frames', behavior=self.name):
+            if not self._batched:
+                for joint, pos in zip(joints, values[indices].tolist()):
+                    joint.goal_position = pos
+                return
+
+            for joint, pos in zip(joints, np.deg2rad(values[indices]).tolist()):
+                joint._state['goal_position'] = FloatValue(value=pos)
+            asyncio.run_coroutine_threadsafe(self._flag_for_sync(joints), self._loop).result()
+
+    def _can_batch(self) -> bool:
+        """Check that all the joints are SDK joints synchronised by the same loop."""
+        if not all(isinstance(joint, Joint) for joint in self.joints):
+            return False
+        if not all(hasattr(joint, attribute) for joint in self.joints for attribute in SYNC_ATTRIBUTES):
+            logger.warning(
+                f'The SDK joints have no {", ".join(SYNC_ATTRIBUTES)}, the goal positions of {self.name or "the frames"} '
+                'are written joint by joint.'
+            )
+            return False
+
+        loops = {joint._loop for joint in self.joints}
+        if len(loops) != 1 or None in loops:
+            return False
+
+        self._loop = loops.pop()
+        return True
+
+    async def _flag_for_sync(self, joints):
+        for joint in joints:
+            joint._register_needing_sync.append('goal_position')
+            joint._need_sync.set()
@@ -0,0 +1,122 @@
+"""
+Gaze cache.
+
+Looking at a point requires the head inverse kinematics, solved by the robot (through gRPC) each
+time head.look_at_async is called. The behaviors look at the same handful of points over and over,
+so the neck positions of each point are only solved once per robot and then reused. The points
+used by a behavior are listed in its gaze_targets attribute, so that they can be solved (warmed)
+before the behavior is played. Behaviors looking at points picked at run time solve them in their
+prefetch, and a point still unknown when looked at is solved in an executor, off the event loop.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+
+from reachy_sdk.trajectory.interpolation import InterpolationMode
+
+from .tracing import goto_async, span
+
+
+logger = logging.getLogger(__name__)
+
+
+class GazeCache:
+    """
+    GazeCache class.
+
+    Neck goal positions of the points (x, y, z) looked at by the head of one robot.
+    """
+
+    _caches = weakref.WeakKeyDictionary()
+
+    def __init__(self, head) -> None:
+        """Initialize an empty cache for the head."""
+        self.head = head
+
+        self.solutions = {}
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_robot(cls, reachy) -> 'GazeCache':
+        """Return the cache shared by all the behaviors of the robot."""
+        cache = cls._caches.get(reachy)
+        if cache is None:
+            cache = cls(reachy.head)
+            cls._caches[reachy] = cache
+        return cache
+
+    @staticmethod
+    def key(x: float, y: float, z: float) -> tuple:
+        """Return the key of the point, rounded to the millimeter."""
+        return (round(x, 3), round(y, 3), round(z, 3))
+
+    def __contains__(self, point) -> bool:
+        """Return if the neck positions of the point are known."""
+        return self.key(*point) in self.solutions
+
+    def goal_positions(self, x: float, y: float, z: float) -> dict:
+        """Return the neck goal positions looking at the point, as head._look_at."""
+        key = self.key(x, y, z)
+        solution = self.solutions.get(key)
+        if solution is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            with span('head_ik', 'kinematics', target=list(key)):
+                solution = self._solve(key)
+        return dict(solution)
+
+    async def look_at_async(
+            self,
+            x: float, y: float, z: float,
+            duration: float,
+            starting_positions: dict = None,
+            sampling_freq: float = 100,
+            interpolation_mode: InterpolationMode = InterpolationMode.LINEAR,
+            ):
+        """Look at the point, as head.look_at_async."""
+        with span('look_at', 'trajectory', target=[x, y, z]):
+            if (x, y, z) in self:
+                goal_positions = self.goal_positions(x, y, z)
+            else:
+                # The robot solves the inverse kinematics through a blocking gRPC call.
+                goal_positions = await asyncio.get_running_loop().run_in_executor(None, self.goal_positions, x, y, z)
+            return await goto_async(
+                goal_positions=goal_positions,
+                duration=duration,
+                starting_positions=starting_positions,
+                sampling_freq=sampling_freq,
+                interpolation_mode=interpolation_mode,
+            )
+
+    def warm(self, points, background: bool = True):
+        """Solve the unknown points, in a background thread by default."""
+        missing = list(dict.fromkeys(self.key(*point) for point in points if point not in self))
+        if not missing:
+            return None
+
+        def _warm():
+            for key in missing:
+                try:
+                    self._solve(key)
+                except ValueError:
+                    logger.warning(f'No head inverse kinematics solution for {key}.')
+            logger.info(f'Gaze cache warmed, {len(self.solutions)} points.')
+
+        if not background:
+            _warm()
+            return None
+
+        thread = threading.Thread(target=_warm, name='gaze_cache_warmer', daemon=True)
+        thread.start()
+        return thread
+
+    def _solve(self, key) -> dict:
+        solution = self.head._look_at(*key)
+        with self._lock:
+            self.solutions[key] = solution
+        return solution
@@ -3,22 +3,39 @@ Idle mode definition.
 
 Idle acts as a main behavior, and calls randomly defined behaviors as sub-behaviors.
 Between each sub-behavior, awaits for the asleep behavior to be played.
+The next sub-behavior is picked by the scheduler when asleep starts, and prefetched while it plays.
+Sub-behaviors which leave the arms free are played over the arm breathing.
+Sub-behaviors skip their homing by default, the transition of asleep blending from their last pose.
 """
+import asyncio
 import logging
-import numpy as np
+import time
 
-from . import Behavior
+from . import Behavior, metrics
 from .asleep import Asleep
-from .look import LookHand
-from .moods import Lonely, Tshirt, SweatHead, Sneeze, Whistle, Hello
-from .scratch import Scratch
+from .audio import get_engine
+from .breathing import ArmBreathing
+from .registry import BehaviorRegistry
+from .resources import ARMS
+from .scheduler import BehaviorScheduler
+
+
+_cycle_seconds = metrics.histogram('idle_cycle_seconds', 'Duration of the Idle cycles (asleep then a sub behavior).')
 
 
 class Idle(Behavior):
     """Idle class."""
 
-    def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
-        """Initialize the behavior."""
+    def __init__(
+            self,
+            name: str,
+            reachy,
+            sub_behavior: bool = False,
+            scheduler=None,
+            seed: int = None,
+            blend_transitions: bool = True,
+            ) -> None:
+        """Initialize the behavior, the sub-behaviors being picked by a BehaviorScheduler by default."""
         super().__init__(name, reachy=reachy, sub_behavior=sub_behavior)
 
         logging.basicConfig(level=logging.INFO)
@@ -26,29 +43,57 @@ class Idle(Behavior):
 
         self.reachy = reachy
         self.asleep_behavior = Asleep(name='asleep', reachy=self.reachy, sub_behavior=True)
-        self.behaviors = {
-            'look_hand': LookHand(name='look_hand', reachy=self.reachy, sub_behavior=True),
-            'lonely': Lonely(name='lonely', reachy=self.reachy, sub_behavior=True),
-            'scratch': Scratch(name='scratch', reachy=self.reachy, sub_behavior=True),
-            'tshirt': Tshirt(name='tshirt', reachy=self.reachy, sub_behavior=True),
-            'sweat_head': SweatHead(name='sweat_head', reachy=self.reachy, sub_behavior=True),
-            'sneeze': Sneeze(name='sneeze', reachy=self.reachy, sub_behavior=True),
-            'whistle': Whistle(name='whistle', reachy=self.reachy, sub_behavior=True),
-            'hello': Hello(name='hello', reachy=self.reachy, sub_behavior=True)
-        }
+        self.arm_breathing = ArmBreathing(name='arm_breathing', reachy=self.reachy)
+        # Sub behaviors are only instantiated the first time they are picked.
+        self.behaviors = BehaviorRegistry(self.reachy, sub_behavior=True, exclude=('asleep',))
+        self.scheduler = scheduler if scheduler is not None else BehaviorScheduler(self.behaviors, seed=seed)
+        self.blend_transitions = blend_transitions
+
+        self.gaze.warm(self.asleep_behavior.gaze_targets + tuple(self.behaviors.gaze_targets()))
 
     async def run(self):
         """Implement the behavior."""
+        # The sounds are decoded once, before the first one is played, without blocking the loop.
+        await asyncio.get_running_loop().run_in_executor(None, get_engine().start)
+
         while True:
+            tic = time.monotonic()
             asleep = await self.asleep_behavior.start()
             self._logger.info('Playing asleep behavior.')
+
+            # The next sub behavior is prepared while Reachy is asleep.
+            next_behavior = self.scheduler.pick()
+            sub_behavior = self.behaviors[next_behavior]
+            sub_behavior.homing = not self.blend_transitions
+            prefetch = asyncio.get_running_loop().run_in_executor(None, sub_behavior.prefetch)
+
             await asleep
-            self.reachy.turn_on('reachy')
+            try:
+                await prefetch
+            except Exception:
+                self._logger.exception(f'Could not prefetch {next_behavior}.')
+            self.set_compliant(self.reachy.joints.values(), False)
+
+            self._logger.info(f'Playing sub behavior {next_behavior}')
+
+            breathing = None
+            if not sub_behavior.resources & ARMS:
+                breathing = await self.arm_breathing.start()
+
+            try:
+                await sub_behavior._run()
+            finally:
+                if breathing is not None:
+                    await self.arm_breathing.stop()
 
-            random_sub_behavior = np.random.choice(list(self.behaviors.keys()))
-            self._logger.info(f'Playing sub behavior {random_sub_behavior}')
-            await self.behaviors[random_sub_behavior]._run()
+            _cycle_seconds.observe(time.monotonic() - tic)
+            self._logger.info(f'Gaze cache: {self.gaze.hits} hits, {self.gaze.misses} misses.')
+            if self.arbiter.contentions:
+                self._logger.info(
+                    f'Body parts contentions: {dict(self.arbiter.contentions)}, '
+                    f'waited {self.arbiter.wait_time:.2f}s.'
+                )
 
     async def teardown(self):
         """Put Reachy's motor in compliant mode when the Idle behavior stops."""
-        self.reachy.turn_off_smoothly('reachy')
+        await self.turn_off_smoothly('reachy')
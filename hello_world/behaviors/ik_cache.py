@@ -0,0 +1,147 @@
+"""
+Inverse kinematics cache.
+
+The arm inverse kinematics is solved by the robot (through gRPC), which delays the start of the
+motions computing it. As the behaviors reach targets taken from small grids, the joint solution
+of a target is solved the first time it is needed (from the prefetch of the behavior, off the
+event loop) and kept in a table keyed by the target and the seed pose of the solver. No grid is
+solved ahead, which would compete with the motions of the robots for the gRPC channel.
+The table is saved to disk (HELLO_WORLD_IK_CACHE environment variable, by default
+hello_world/ik_cache.npz in the user cache directory, $XDG_CACHE_HOME or ~/.cache), so that
+the next runs start with the solutions already known.
+"""
+import logging
+import os
+import threading
+
+import numpy as np
+
+from .tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENV = 'HELLO_WORLD_IK_CACHE'
+DEFAULT_NAME = 'ik_cache.npz'
+
+# Targets are rounded to the resolution of the grids (in meters).
+RESOLUTION = 0.01
+
+
+def default_path() -> str:
+    """Return the path of the cache in the user cache directory."""
+    cache_directory = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_directory, 'hello_world', DEFAULT_NAME)
+
+
+def grid(xs, ys, zs) -> list:
+    """Return the (x, y, z) targets of the grid, the coordinates being given in centimeters."""
+    return [(x * RESOLUTION, y * RESOLUTION, z * RESOLUTION) for x in xs for y in ys for z in zs]
+
+
+class IKCache:
+    """
+    IKCache class.
+
+    Joint solutions of an arm for targets positions, its end effector keeping the orientation
+    it has in the seed pose.
+    """
+
+    def __init__(self, arm, path: str = None, save_every: int = 1) -> None:
+        """Initialize the cache of the arm, loading the solutions saved at path."""
+        self.arm = arm
+        self.path = path or os.environ.get(CACHE_ENV) or default_path()
+        self.save_every = save_every
+
+        self.solutions = {}
+        self.hits = 0
+        self.misses = 0
+
+        self._poses = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        self.load()
+
+    @staticmethod
+    def key(target, seed) -> tuple:
+        """Return the key of the target (rounded to the resolution) for the seed pose."""
+        return (
+            tuple(int(round(c / RESOLUTION)) for c in target),
+            tuple(round(float(q), 2) for q in seed),
+        )
+
+    def __contains__(self, item) -> bool:
+        """Return if the solution of the (target, seed) pair is known."""
+        target, seed = item
+        return self.key(target, seed) in self.solutions
+
+    def __len__(self) -> int:
+        """Return the number of known solutions."""
+        return len(self.solutions)
+
+    def solve(self, target, seed) -> list:
+        """Return the joint solution (in degrees) reaching the target from the seed pose."""
+        key = self.key(target, seed)
+        solution = self.solutions.get(key)
+        if solution is not None:
+            self.hits += 1
+            return list(solution)
+
+        self.misses += 1
+        with span('arm_ik', 'kinematics', target=list(target)):
+            return list(self._solve(key, target, seed))
+
+    def load(self) -> None:
+        """Load the solutions saved at path, if any."""
+        if not os.path.exists(self.path):
+            return
+
+        with np.load(self.path) as data:
+            for target, seed, solution in zip(data['targets'], data['seeds'], data['solutions']):
+                key = (tuple(int(c) for c in target), tuple(float(q) for q in seed))
+                self.solutions[key] = tuple(float(q) for q in solution)
+        logger.info(f'Loaded {len(self)} inverse kinematics solutions from {self.path}.')
+
+    def save(self) -> None:
+        """Save the solutions at path."""
+        with self._lock:
+            items = list(self.solutions.items())
+            self._unsaved = 0
+        if not items:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Several robots (and processes) may share the same cache file.
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                targets=np.array([target for (target, _), _ in items], dtype=np.int32),
+                seeds=np.array([seed for (_, seed), _ in items]),
+                solutions=np.array([solution for _, solution in items]),
+            )
+        os.replace(tmp_path, self.path)
+
+    def _pose(self, seed) -> np.ndarray:
+        # The forward kinematics of each seed pose is only computed once.
+        pose = self._poses.get(seed)
+        if pose is None:
+            pose = self.arm.forward_kinematics(joints_position=list(seed))
+            self._poses[seed] = pose
+        return pose
+
+    def _solve(self, key, target, seed) -> tuple:
+        pose = self._pose(key[1]).copy()
+        pose[:3, 3] = target
+
+        solution = tuple(float(q) for q in self.arm.inverse_kinematics(pose, q0=list(seed)))
+
+        with self._lock:
+            self.solutions[key] = solution
+            self._unsaved += 1
+            should_save = self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+        return solution
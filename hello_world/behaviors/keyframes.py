@@ -0,0 +1,249 @@
+"""
+Keyframe trajectories.
+
+Compact alternative to the dense recordings of the movements folder: only the playback window of
+a recording is kept, and each joint is stored as cubic Hermite keyframes (frame, position, slope),
+fitted so that the decoded frames stay within a tolerance (in degrees) of the recorded ones.
+Frames are decoded on demand, chunk by chunk, so that playing them in order only decodes each
+frame once.
+
+To convert the recordings of the movements folder:
+    python3 -m hello_world.behaviors.keyframes --tolerance 0.1
+"""
+import os
+
+import numpy as np
+
+
+EXTENSION = '.kf.npz'
+
+DEFAULT_TOLERANCE = 0.1
+
+
+def _hermite(knots: np.ndarray, values: np.ndarray, slopes: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Evaluate the cubic Hermite spline of one joint at the (fractional) frames x."""
+    if len(knots) == 1:
+        return np.full(len(x), values[0], dtype=float)
+
+    segment = np.clip(np.searchsorted(knots, x, side='right') - 1, 0, len(knots) - 2)
+    x0 = knots[segment]
+    h = knots[segment + 1] - x0
+    t = (x - x0) / h
+
+    t2 = t * t
+    t3 = t2 * t
+    return (
+        (2 * t3 - 3 * t2 + 1) * values[segment]
+        + (t3 - 2 * t2 + t) * h * slopes[segment]
+        + (-2 * t3 + 3 * t2) * values[segment + 1]
+        + (t3 - t2) * h * slopes[segment + 1]
+    )
+
+
+def fit_joint(samples: np.ndarray, tolerance: float = DEFAULT_TOLERANCE):
+    """Return the knots, values and slopes of the keyframes of one joint.
+
+    Keyframes are added at the worst approximated frame of each segment until all the frames are
+    within the tolerance.
+    """
+    samples = np.asarray(samples, dtype=float)
+    nb_frames = len(samples)
+    if nb_frames < 2:
+        return np.zeros(nb_frames, dtype=np.int32), samples.copy(), np.zeros(nb_frames)
+
+    x = np.arange(nb_frames)
+    gradient = np.gradient(samples)
+    knots = np.array([0, nb_frames - 1])
+
+    while True:
+        error = np.abs(_hermite(knots, samples[knots], gradient[knots], x) - samples)
+        segments_error = np.maximum.reduceat(error, knots[:-1])
+        worst_segments = np.flatnonzero(segments_error > tolerance)
+        if len(worst_segments) == 0:
+            break
+
+        new_knots = [
+            knots[i] + int(np.argmax(error[knots[i]:knots[i + 1] + 1]))
+            for i in worst_segments
+        ]
+        knots = np.union1d(knots, new_knots)
+
+    return knots.astype(np.int32), samples[knots], gradient[knots]
+
+
+class KeyframeTrajectory:
+    """
+    KeyframeTrajectory class.
+
+    Behaves as a read-only (nb_frames, nb_joints) array whose frames are decoded when accessed.
+    """
+
+    def __init__(
+            self,
+            nb_frames: int,
+            knots,
+            values,
+            slopes,
+            offsets,
+            rate: float = 100,
+            window=(None, None),
+            chunk_size: int = 100,
+            ) -> None:
+        """Initialize the trajectory, the keyframes of the joint j being at offsets[j]:offsets[j + 1]."""
+        self.nb_frames = int(nb_frames)
+        self.knots = np.asarray(knots, dtype=np.int32)
+        self.values = np.asarray(values, dtype=float)
+        self.slopes = np.asarray(slopes, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+        self.rate = rate
+        self.window = tuple(window)
+        self.chunk_size = chunk_size
+
+        # The (start index, frames) of the last decoded chunk, published as one tuple: the trajectory is
+        # read both by the players on the event loop and by touch() in the prefetch threads.
+        self._chunk = None
+
+        self._joints = [
+            (self.knots[start:stop], self.values[start:stop], self.slopes[start:stop])
+            for start, stop in zip(self.offsets[:-1], self.offsets[1:])
+        ]
+
+    @classmethod
+    def fit(cls, frames, tolerance: float = DEFAULT_TOLERANCE, rate: float = 100, window=(None, None)):
+        """Fit the keyframes of every joint of the frames."""
+        frames = np.asarray(frames, dtype=float)
+        joints = [fit_joint(frames[:, j], tolerance) for j in range(frames.shape[1])]
+
+        offsets = np.cumsum([0] + [len(knots) for knots, _, _ in joints])
+        return cls(
+            nb_frames=len(frames),
+            knots=np.concatenate([knots for knots, _, _ in joints]),
+            values=np.concatenate([values for _, values, _ in joints]),
+            slopes=np.concatenate([slopes for _, _, slopes in joints]),
+            offsets=offsets,
+            rate=rate,
+            window=window,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'KeyframeTrajectory':
+        """Load the keyframes from a .kf.npz file."""
+        with np.load(path) as data:
+            window = tuple(None if w < 0 else int(w) for w in data['window'])
+            return cls(
+                nb_frames=int(data['nb_frames']),
+                knots=data['knots'],
+                values=data['values'],
+                slopes=data['slopes'],
+                offsets=data['offsets'],
+                rate=float(data['rate']),
+                window=window,
+            )
+
+    def save(self, path: str) -> None:
+        """Save the keyframes to a .kf.npz file."""
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                nb_frames=self.nb_frames,
+                knots=self.knots,
+                values=self.values,
+                slopes=self.slopes,
+                offsets=self.offsets,
+                rate=self.rate,
+                window=np.array([-1 if w is None else w for w in self.window]),
+            )
+
+    @property
+    def shape(self):
+        """Return the shape of the decoded trajectory."""
+        return (self.nb_frames, len(self._joints))
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the keyframes."""
+        return self.knots.nbytes + self.values.nbytes + self.slopes.nbytes + self.offsets.nbytes
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return self.nb_frames
+
+    def decode(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """Decode the frames [start:stop]."""
+        start, stop, _ = slice(start, stop).indices(self.nb_frames)
+        x = np.arange(start, stop, dtype=float)
+
+        frames = np.empty((len(x), len(self._joints)))
+        for j, (knots, values, slopes) in enumerate(self._joints):
+            frames[:, j] = _hermite(knots, values, slopes, x)
+        return frames
+
+    def frame(self, index: int) -> np.ndarray:
+        """Return one frame, decoding the chunk it starts if it is not the current one."""
+        index = range(self.nb_frames)[index]
+        chunk = self._chunk
+        if chunk is None or not 0 <= index - chunk[0] < len(chunk[1]):
+            chunk = (index, self.decode(index, index + self.chunk_size))
+            self._chunk = chunk
+        start, frames = chunk
+        return frames[index - start]
+
+    def iter_frames(self):
+        """Yield the frames one by one, decoding them chunk by chunk."""
+        for start in range(0, self.nb_frames, self.chunk_size):
+            yield from self.decode(start, start + self.chunk_size)
+
+    def __getitem__(self, key):
+        """Decode a frame or a range of frames."""
+        if isinstance(key, slice) and key.step in (None, 1):
+            return self.decode(key.start if key.start is not None else 0, key.stop)
+        if isinstance(key, (int, np.integer)):
+            return self.frame(key)
+        return self.decode()[key]
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        """Decode all the frames."""
+        frames = self.decode()
+        return frames if dtype is None else frames.astype(dtype)
+
+
+def convert(path: str, window=(None, None), tolerance: float = DEFAULT_TOLERANCE, rate: float = 100):
+    """Convert the window of a .npy recording to keyframes, return them with the maximum error."""
+    frames = np.load(path)[slice(*window)]
+    keyframes = KeyframeTrajectory.fit(frames, tolerance=tolerance, rate=rate, window=window)
+    error = np.abs(np.asarray(keyframes) - frames).max()
+    return keyframes, error
+
+
+def main():
+    """Convert the recordings of the movements folder to keyframes."""
+    import argparse
+
+    from .trajectories import DEFAULT_DIRECTORY, PLAYBACK_WINDOWS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help='Recordings to convert, all of them by default.')
+    parser.add_argument('--directory', help='Folder of the recordings.', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--tolerance', help='Maximum error (in degrees).', type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    for name in args.names or PLAYBACK_WINDOWS:
+        source = os.path.join(args.directory, f'{name}.npy')
+        destination = os.path.join(args.directory, f'{name}{EXTENSION}')
+
+        window = PLAYBACK_WINDOWS.get(name, (None, None))
+        keyframes, _ = convert(source, window, args.tolerance)
+        keyframes.save(destination)
+
+        decoded = np.asarray(KeyframeTrajectory.load(destination))
+        error = np.abs(decoded - np.load(source)[slice(*window)]).max()
+
+        print(
+            f'{name}: {os.path.getsize(source)} -> {os.path.getsize(destination)} bytes, '
+            f'{len(keyframes.knots)} keyframes for {keyframes.shape[0]}x{keyframes.shape[1]} frames, '
+            f'max error {error:.3f} deg'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,10 @@ Behaviors making Reachy look at something.
 import asyncio
 import numpy as np
 
-from reachy_sdk.trajectory import goto_async, InterpolationMode
-
 from . import Behavior
+from .ik_cache import IKCache, grid
+from .resources import HEAD, RIGHT_ARM
+from .tracing import gather, goto_async
 
 
 class LookHand(Behavior):
@@ -22,36 +23,53 @@ class LookHand(Behavior):
     Dependencies to other behaviors: none
     """
 
-    async def run(self):
-        """Implement the LookHand behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 100.0
+    resources = frozenset({RIGHT_ARM, HEAD})
+    gaze_targets = ((0.5, 0.0, 0.0),)
 
-        base_pos_right = [-1.73, -3.67, -0.57, -68.44, 4.0, -29.67, -4.84]
+    base_pos_right = (-1.73, -3.67, -0.57, -68.44, 4.0, -29.67, -4.84)
+    # Targets of the gripper (in centimeters).
+    targets = grid(range(25, 35), range(-40, -10), range(-10, 0))
 
-        A = self.reachy.r_arm.forward_kinematics(joints_position=base_pos_right)
+    def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
+        """Initialize the LookHand behavior, its targets being solved as they are picked."""
+        super().__init__(name, reachy, sub_behavior=sub_behavior)
 
-        x = np.random.randint(25, 35) / 100
-        y = np.random.randint(-40, -10) / 100
-        z = np.random.randint(-10, 0) / 100
+        self.ik_cache = IKCache(self.reachy.r_arm)
+        # Target picked and solved by prefetch, with its solution.
+        self._next = None
 
-        pos = [x, y, z]
+    @staticmethod
+    def gaze_target(target) -> tuple:
+        """Return the point looked at by the head for the gripper target."""
+        x, y, z = target
+        return x, y, z - 0.1
 
-        B = A.copy()
-        for i in range(3):
-            B[i][3] = pos[i]
+    def pick_target(self) -> tuple:
+        """Pick a random target."""
+        return self.targets[np.random.randint(len(self.targets))]
 
-        JB = self.reachy.r_arm.inverse_kinematics(B, q0=base_pos_right)
+    def prefetch(self):
+        """Pick the next target and solve it, for the arm and for the head."""
+        super().prefetch()
+        target = self.pick_target()
+        self._next = target, self.ik_cache.solve(target, self.base_pos_right)
+        self.gaze.warm([self.gaze_target(target)], background=False)
 
-        traj_right = goto_async(
-            goal_positions={j: p for j, p in zip(self.reachy.r_arm.joints.values(), JB[:-2])},
-            duration=2.0,
-            interpolation_mode=InterpolationMode.MINIMUM_JERK,
-        )
-        traj_head = self.reachy.head.look_at_async(
-            x,
-            y,
-            z-0.1,
+    async def run(self):
+        """Implement the LookHand behavior."""
+        self.set_torque_limit(self.reachy.r_arm.joints.values(), 100.0)
+
+        if self._next is not None:
+            (x, y, z), JB = self._next
+            self._next = None
+        else:
+            x, y, z = self.pick_target()
+            # Not prefetched: a target not solved yet is solved off the event loop.
+            JB = await asyncio.get_running_loop().run_in_executor(None, self.ik_cache.solve, (x, y, z), self.base_pos_right)
+
+        traj_right = self.transition({j: p for j, p in zip(self.reachy.r_arm.joints.values(), JB[:-2])}, duration=2.0)
+        traj_head = self.gaze.look_at_async(
+            *self.gaze_target((x, y, z)),
             duration=1,
             starting_positions={
                 self.reachy.head.neck_roll: self.reachy.head.neck_roll.goal_position,
@@ -59,7 +77,7 @@ class LookHand(Behavior):
                 self.reachy.head.neck_yaw: self.reachy.head.neck_yaw.goal_position,
             })
 
-        await asyncio.gather(
+        await gather(
             traj_right,
             traj_head,
         )
@@ -83,7 +101,10 @@ class LookHand(Behavior):
 
         await asyncio.sleep(0.3)
 
-        look_back = self.reachy.head.look_at_async(
+        if not self.homing:
+            return
+
+        look_back = self.gaze.look_at_async(
             0.5,
             0.0,
             0.0,
@@ -105,9 +126,9 @@ class LookHand(Behavior):
             duration=2.0,
         )
 
-        await asyncio.gather(
+        await gather(
             look_back,
             hand_back,
         )
 
-        self.reachy.turn_off_smoothly('r_arm')
+        await self.turn_off_smoothly('r_arm')
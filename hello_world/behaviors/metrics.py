@@ -0,0 +1,274 @@
+"""
+Runtime metrics.
+
+The behaviors record counters (e.g. runs, goal positions sent) and latency histograms (e.g. run
+duration, setup and teardown time, cancellation latency, lateness of the played frames) in a
+process-wide registry. The registry can be exposed in the Prometheus text format or as JSON,
+either by a local HTTP endpoint (MetricsServer) or by a file rewritten periodically (MetricsFile):
+    python3 -m hello_world.hello --metrics_port 9100
+    python3 -m hello_world.hello --metrics_file metrics.prom
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the buckets of the histograms.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in items) + '}'
+
+
+class Counter:
+    """Monotonic counter, one value per set of labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        """Initialize the counter, without any value."""
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter of the labels."""
+        key = _labels_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """Return the value of the counter of the labels."""
+        return self.values.get(_labels_key(labels), 0)
+
+    def samples(self):
+        """Yield the (suffix, labels, extra labels, value) samples of the counter."""
+        for key, value in sorted(self.values.items()):
+            yield '_total', key, None, value
+
+    def as_dict(self) -> dict:
+        """Return the values, by labels."""
+        return {_format_labels(key) or '{}': value for key, value in sorted(self.values.items())}
+
+
+class Histogram:
+    """Distribution of durations (in seconds), one per set of labels."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS) -> None:
+        """Initialize the histogram with the upper bounds of its buckets."""
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        """Record a value for the labels."""
+        key = _labels_key(labels)
+        with self._lock:
+            counts, total, count, maximum = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0, 0, 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value, count + 1, max(maximum, value))
+
+    def count(self, **labels) -> int:
+        """Return the number of values recorded for the labels."""
+        return self.values.get(_labels_key(labels), (None, 0.0, 0, 0.0))[2]
+
+    def samples(self):
+        """Yield the (suffix, labels, extra labels, value) samples of the histogram."""
+        for key, (counts, total, count, _) in sorted(self.values.items()):
+            cumulated = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulated += bucket_count
+                yield '_bucket', key, {'le': repr(bound)}, cumulated
+            yield '_bucket', key, {'le': '+Inf'}, count
+            yield '_sum', key, None, total
+            yield '_count', key, None, count
+
+    def as_dict(self) -> dict:
+        """Return the count, mean and maximum of the values, by labels."""
+        return {
+            _format_labels(key) or '{}': {'count': count, 'sum': total, 'mean': total / count, 'max': maximum}
+            for key, (_, total, count, maximum) in sorted(self.values.items())
+        }
+
+
+class MetricsRegistry:
+    """
+    MetricsRegistry class.
+
+    Named counters and histograms, rendered in the Prometheus text format or as JSON.
+    """
+
+    def __init__(self, prefix: str = 'hello_world') -> None:
+        """Initialize an empty registry, the names of the metrics starting with the prefix."""
+        self.prefix = prefix
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str = '') -> Counter:
+        """Return the counter, creating it if needed."""
+        return self._get(Counter, name, documentation)
+
+    def histogram(self, name: str, documentation: str = '', buckets=DEFAULT_BUCKETS) -> Histogram:
+        """Return the histogram, creating it if needed."""
+        return self._get(Histogram, name, documentation, buckets)
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            name = f'{self.prefix}_{metric.name}'
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for suffix, key, extra, value in metric.samples():
+                lines.append(f'{name}{suffix}{_format_labels(key, extra)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self) -> str:
+        """Render the metrics as JSON."""
+        return json.dumps(
+            {f'{self.prefix}_{metric.name}': metric.as_dict() for metric in list(self.metrics.values())},
+            indent=2,
+        )
+
+    def _get(self, cls, name: str, *args):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args)
+                self.metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f'Metric {name} is already a {metric.kind}.')
+            return metric
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the registry shared by the whole process."""
+    return _registry
+
+
+def counter(name: str, documentation: str = '') -> Counter:
+    """Return the counter of the shared registry."""
+    return _registry.counter(name, documentation)
+
+
+def histogram(name: str, documentation: str = '', buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Return the histogram of the shared registry."""
+    return _registry.histogram(name, documentation, buckets)
+
+
+async def monitor_loop_lag(interval: float = 0.1) -> None:
+    """Record how late the event loop wakes up a task sleeping for interval, until cancelled."""
+    lag = histogram('event_loop_lag_seconds', 'Delay of the wake up of a sleeping task of the event loop.')
+    while True:
+        tic = time.monotonic()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, time.monotonic() - tic - interval))
+
+
+class MetricsServer:
+    """
+    MetricsServer class.
+
+    Local HTTP endpoint serving the metrics: /metrics in the Prometheus text format, /metrics.json as JSON.
+    """
+
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: MetricsRegistry = None) -> None:
+        """Initialize the server, started with start."""
+        registry = registry or _registry
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = registry.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = registry.to_json(), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        """Return the port the server listens to."""
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        """Serve the metrics from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics_server', daemon=True)
+        self._thread.start()
+        logger.info(f'Serving the metrics on http://127.0.0.1:{self.port}/metrics')
+
+    def close(self) -> None:
+        """Stop the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class MetricsFile:
+    """
+    MetricsFile class.
+
+    File rewritten periodically with the metrics, as JSON if its name ends with .json, in the
+    Prometheus text format otherwise.
+    """
+
+    def __init__(self, path: str, period: float = 5.0, registry: MetricsRegistry = None) -> None:
+        """Initialize the writer of the file."""
+        self.path = path
+        self.period = period
+        self.registry = registry or _registry
+
+    def write(self) -> None:
+        """Write the current metrics, replacing the file atomically."""
+        if self.path.endswith('.json'):
+            content = self.registry.to_json()
+        else:
+            content = self.registry.to_prometheus()
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+    async def run(self) -> None:
+        """Rewrite the file every period until cancelled, and a last time when cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(self.period)
+                self.write()
+        finally:
+            self.write()
@@ -7,11 +7,16 @@ Definiton of miscellaneous behaviors for Reachy.
 import asyncio
 import numpy as np
 
-from reachy_sdk.trajectory import goto_async
 from reachy_sdk.trajectory.interpolation import InterpolationMode
 
 from . import Behavior
+from .audio import get_engine
 from .player import playsound
+from .playback import TrajectoryPlayer
+from .resources import ARMS, HEAD, LEFT_ARM, RIGHT_ARM, SOUND
+from .timeline import Timeline
+from .tracing import gather, goto_async
+from .trajectories import load_clip, load_resampled, touch
 
 
 class Lonely(Behavior):
@@ -24,6 +29,16 @@ class Lonely(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = frozenset({HEAD})
+    gaze_targets = (
+        (0.5, -0.3, 0.1),
+        (0.5, -0.6, 0.1),
+        (0.5, 0.5, -0.1),
+        (0.5, 0.08, -0.4),
+        (0.5, -0.08, -0.4),
+        (0.5, 0.2, 0.0),
+    )
+
     async def run(self):
         """Implement the behavior."""
         traj_antennas = goto_async(
@@ -34,7 +49,7 @@ class Lonely(Behavior):
             duration=1.0,
             interpolation_mode=InterpolationMode.MINIMUM_JERK
         )
-        first_look_at = self.reachy.head.look_at_async(
+        first_look_at = self.gaze.look_at_async(
             x=0.5,
             y=-0.3,
             z=0.1,
@@ -47,10 +62,11 @@ class Lonely(Behavior):
                 }
             )
 
-        await asyncio.gather(first_look_at, traj_antennas)
+        await gather(first_look_at, traj_antennas)
 
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 0.0
+        # Relax the right arm, unless another behavior is using it.
+        if self.arbiter.is_free({RIGHT_ARM}, self):
+            self.set_torque_limit(self.reachy.r_arm.joints.values(), 0.0)
 
         await asyncio.sleep(0.2)
 
@@ -62,7 +78,7 @@ class Lonely(Behavior):
             duration=1.0,
             interpolation_mode=InterpolationMode.MINIMUM_JERK
         )
-        look_at_right = self.reachy.head.look_at_async(
+        look_at_right = self.gaze.look_at_async(
             x=0.5,
             y=-0.6,
             z=0.1,
@@ -74,7 +90,7 @@ class Lonely(Behavior):
                 self.reachy.head.neck_yaw: self.reachy.head.neck_yaw.goal_position,
                 }
             )
-        await asyncio.gather(traj_antennas, look_at_right)
+        await gather(traj_antennas, look_at_right)
         await asyncio.sleep(0.5)
 
         traj_antennas = goto_async(
@@ -85,7 +101,7 @@ class Lonely(Behavior):
             duration=0.7,
             interpolation_mode=InterpolationMode.MINIMUM_JERK
         )
-        look_at_left = self.reachy.head.look_at_async(
+        look_at_left = self.gaze.look_at_async(
             0.5,
             0.5,
             -0.1,
@@ -97,7 +113,7 @@ class Lonely(Behavior):
                 self.reachy.head.neck_yaw: self.reachy.head.neck_yaw.goal_position,
                 }
             )
-        await asyncio.gather(traj_antennas, look_at_left)
+        await gather(traj_antennas, look_at_left)
         await asyncio.sleep(0.5)
 
         traj_antennas = goto_async(
@@ -110,7 +126,7 @@ class Lonely(Behavior):
         )
 
         first_look_down = goto_async(
-            self.reachy.head._look_at(x=0.5, y=0.08, z=-0.4),
+            self.gaze.goal_positions(x=0.5, y=0.08, z=-0.4),
             duration=1.0,
             starting_positions={
                 self.reachy.head.neck_roll: self.reachy.head.neck_roll.goal_position,
@@ -120,13 +136,13 @@ class Lonely(Behavior):
             interpolation_mode=InterpolationMode.MINIMUM_JERK,
         )
 
-        await asyncio.gather(
+        await gather(
             traj_antennas,
             first_look_down,
         )
 
         await goto_async(
-            self.reachy.head._look_at(x=0.5, y=-0.08, z=-0.4),
+            self.gaze.goal_positions(x=0.5, y=-0.08, z=-0.4),
             duration=1.0,
             starting_positions={
                 self.reachy.head.neck_roll: self.reachy.head.neck_roll.goal_position,
@@ -137,7 +153,7 @@ class Lonely(Behavior):
         )
 
         await goto_async(
-            self.reachy.head._look_at(x=0.5, y=0.08, z=-0.4),
+            self.gaze.goal_positions(x=0.5, y=0.08, z=-0.4),
             duration=1.0,
             starting_positions={
                 self.reachy.head.neck_roll: self.reachy.head.neck_roll.goal_position,
@@ -158,7 +174,7 @@ class Lonely(Behavior):
         )
 
         look_straight = goto_async(
-            self.reachy.head._look_at(x=0.5, y=0.2, z=0.0),
+            self.gaze.goal_positions(x=0.5, y=0.2, z=0.0),
             duration=1.0,
             starting_positions={
                 self.reachy.head.neck_roll: self.reachy.head.neck_roll.goal_position,
@@ -168,7 +184,7 @@ class Lonely(Behavior):
             interpolation_mode=InterpolationMode.MINIMUM_JERK,
         )
 
-        await asyncio.gather(
+        await gather(
             traj_antennas,
             look_straight,
         )
@@ -184,12 +200,13 @@ class Tshirt(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = frozenset({LEFT_ARM, HEAD})
+    gaze_targets = ((0.5, 0.2, -0.5), (0.5, 0.0, 0.0))
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the Tshirt behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
-        self.touch_tshirt = np.load('movements/traj_tshirt.npy')
-
         self.sampling_frequency = 100
 
         self.recorded_joints = [
@@ -203,12 +220,21 @@ class Tshirt(Behavior):
             self.reachy.l_arm.l_gripper,
         ]
 
+        self.player = TrajectoryPlayer(self.joint_map(self.recorded_joints), self.sampling_frequency, name=name)
+
+    def prefetch(self):
+        """Load the trajectories of the behavior."""
+        super().prefetch()
+        touch(load_resampled('traj_tshirt', speed=1.5))
+
     async def run(self):
         """Implement the behavior."""
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 100.0
+        # The recording is played 1.5 times faster than it was recorded.
+        touch_tshirt = load_resampled('traj_tshirt', speed=1.5)
+
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
 
-        look_down = self.reachy.head.look_at_async(
+        look_down = self.gaze.look_at_async(
             0.5,
             0.2,
             -0.5,
@@ -219,21 +245,20 @@ class Tshirt(Behavior):
                 self.reachy.head.neck_yaw: self.reachy.head.neck_yaw.goal_position,
             })
 
-        first_point = dict(zip(self.recorded_joints, self.touch_tshirt[100]))
-        first_pos = goto_async(first_point, duration=1.0)
+        first_point = dict(zip(self.recorded_joints, touch_tshirt[0]))
+        first_pos = self.transition(first_point, duration=1.0)
 
-        await asyncio.gather(
+        await gather(
             look_down,
             first_pos,
         )
 
-        for jp_arms in self.touch_tshirt[100:]:
-            for joint, pos in zip(self.recorded_joints, jp_arms):
-                joint.goal_position = pos
+        await self.player.play(touch_tshirt)
 
-            await asyncio.sleep(1 / (self.sampling_frequency * 1.5))
+        if not self.homing:
+            return
 
-        look_back = self.reachy.head.look_at_async(
+        look_back = self.gaze.look_at_async(
             0.5,
             0.0,
             0.0,
@@ -254,12 +279,12 @@ class Tshirt(Behavior):
             duration=2.0,
         )
 
-        await asyncio.gather(
+        await gather(
             look_back,
             hand_back,
         )
 
-        self.reachy.turn_off_smoothly('l_arm')
+        await self.turn_off_smoothly('l_arm')
 
         await asyncio.sleep(0.3)
 
@@ -278,12 +303,13 @@ class SweatHead(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = frozenset({LEFT_ARM, HEAD})
+    gaze_targets = ((0.5, -0.2, -0.4), (0.5, 0.0, 0.0))
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the SweatHead behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
-        self.sweat_head = np.load('movements/sweat_head.npy')
-
         self.sampling_frequency = 100
 
         self.recorded_joints = [
@@ -296,15 +322,23 @@ class SweatHead(Behavior):
             self.reachy.l_arm.l_wrist_roll,
         ]
 
+        self.player = TrajectoryPlayer(self.joint_map(self.recorded_joints), self.sampling_frequency, name=name)
+
+    def prefetch(self):
+        """Load the trajectories of the behavior."""
+        super().prefetch()
+        touch(load_clip('sweat_head'))
+
     async def run(self):
         """Implement the behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 0.0
+        sweat_head = load_clip('sweat_head')
+
+        if self.arbiter.is_free({RIGHT_ARM}, self):
+            self.set_torque_limit(self.reachy.r_arm.joints.values(), 0.0)
 
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 100.0
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
 
-        look_down = self.reachy.head.look_at_async(
+        look_down = self.gaze.look_at_async(
             0.5,
             -0.2,
             -0.4,
@@ -324,22 +358,21 @@ class SweatHead(Behavior):
             interpolation_mode=InterpolationMode.MINIMUM_JERK,
         )
 
-        point110 = dict(zip(self.recorded_joints, self.sweat_head[300]))
-        first_pos = goto_async(point110, duration=2.5)
+        point110 = dict(zip(self.recorded_joints, sweat_head[0]))
+        first_pos = self.transition(point110, duration=2.5)
 
-        await asyncio.gather(
+        await gather(
             look_down,
             first_pos,
             traj_antennas,
         )
 
-        for jp_arms in self.sweat_head[300:700]:
-            for joint, pos in zip(self.recorded_joints, jp_arms):
-                joint.goal_position = pos
+        await self.player.play(sweat_head)
 
-            await asyncio.sleep(1 / self.sampling_frequency)
+        if not self.homing:
+            return
 
-        look_up = self.reachy.head.look_at_async(
+        look_up = self.gaze.look_at_async(
             0.5,
             0,
             0,
@@ -370,14 +403,13 @@ class SweatHead(Behavior):
             duration=2.0,
         )
 
-        await asyncio.gather(
+        await gather(
             look_up,
             traj_antennas,
             last_pos,
         )
 
-        for j in self.reachy.l_arm.joints.values():
-            j.compliant = True
+        self.set_compliant(self.reachy.l_arm.joints.values(), True)
 
     async def teardown(self):
         """Use the teardown method from parent class."""
@@ -394,13 +426,13 @@ class Hello(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = frozenset({LEFT_ARM, HEAD})
+    gaze_targets = ((0.5, 0.0, 0.0),)
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the Hello behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
-        self.move_antennas = np.load('movements/hello_move_antennas.npy')
-        self.move_arm = np.load('movements/hello_move.npy')
-
         self.sampling_frequency = 100
 
         self.recorded_joints_arm = [
@@ -418,13 +450,27 @@ class Hello(Behavior):
             self.reachy.head.r_antenna,
         ]
 
+        self.player = TrajectoryPlayer(
+            self.joint_map(self.recorded_joints_arm + self.recorded_joints_antennas),
+            self.sampling_frequency,
+            name=name,
+        )
+
+    def prefetch(self):
+        """Load the trajectories of the behavior."""
+        super().prefetch()
+        touch(load_clip('hello_move_antennas'))
+        touch(load_clip('hello_move'))
+
     async def run(self):
         """Implement the behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 0.0
+        move_antennas = load_clip('hello_move_antennas')
+        move_arm = load_clip('hello_move')
+
+        if self.arbiter.is_free({RIGHT_ARM}, self):
+            self.set_torque_limit(self.reachy.r_arm.joints.values(), 0.0)
 
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 100.0
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
 
         head_move = goto_async(
             {
@@ -435,24 +481,22 @@ class Hello(Behavior):
             duration=0.4,
         )
 
-        first_point = dict(zip(self.recorded_joints_arm, self.move_arm[150]))
-        arm_move = goto_async(first_point, duration=0.4)
-        first_point_antennas = dict(zip(self.recorded_joints_antennas, self.move_antennas[50]))
-        antennas_move = goto_async(first_point_antennas, duration=0.4)
+        first_point = dict(zip(
+            self.recorded_joints_arm + self.recorded_joints_antennas,
+            np.hstack((move_arm[0], move_antennas[0])),
+        ))
+        arm_move = self.transition(first_point, duration=0.4)
 
-        await asyncio.gather(
+        await gather(
             head_move,
             arm_move,
-            antennas_move
         )
 
-        for (jp_antennas, jp_arms) in zip(self.move_antennas[50:], self.move_arm[150:500]):
-            for joint, pos in zip(self.recorded_joints_arm, jp_arms):
-                joint.goal_position = pos
-            for joint, pos in zip(self.recorded_joints_antennas, jp_antennas):
-                joint.goal_position = pos
+        # The arm and antennas recordings are played together.
+        await self.player.play(np.hstack((move_arm, move_antennas)))
 
-            await asyncio.sleep(1 / self.sampling_frequency)
+        if not self.homing:
+            return
 
         last_pos = goto_async({
                 self.reachy.l_arm.l_shoulder_pitch: 0.0,
@@ -465,14 +509,14 @@ class Hello(Behavior):
                 duration=1.0,
         )
 
-        last_look_at = self.reachy.head.look_at_async(0.5, 0, 0, 0.5)
+        last_look_at = self.gaze.look_at_async(0.5, 0, 0, 0.5)
 
-        await asyncio.gather(
+        await gather(
             last_look_at,
             last_pos,
         )
 
-        self.reachy.turn_off_smoothly('l_arm')
+        await self.turn_off_smoothly('l_arm')
 
     async def teardown(self):
         """Use the teardown method from parent class."""
@@ -489,50 +533,56 @@ class Sneeze(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = frozenset({HEAD, SOUND})
+    gaze_targets = ((0.5, 0.0, 0.2), (0.5, 0.0, -0.2), (0.5, 0.0, 0.0))
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the Sneeze behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
         self.sneeze_sound = 'sounds/sneezing.wav'
 
+    def prefetch(self):
+        """Decode the sound of the behavior."""
+        super().prefetch()
+        get_engine().load(self.sneeze_sound)
+
     async def run(self):
         """Implement the behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 0.0
-
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 0.0
-
-        await self.reachy.head.look_at_async(0.5, 0.0, 0.2, 0.8)
-        await asyncio.sleep(0.7)
-        playsound(self.sneeze_sound, block=False)
-        await asyncio.sleep(0.3)
-        head_pos1 = self.reachy.head.look_at_async(0.5, 0.0, -0.2, 0.2)
-        traj_antennas = goto_async(
-            goal_positions={
-                self.reachy.head.r_antenna: -30.0,
-                self.reachy.head.l_antenna: 30.0,
-            },
-            duration=0.2,
-            interpolation_mode=InterpolationMode.MINIMUM_JERK
-        )
-        await asyncio.gather(
-            head_pos1,
-            traj_antennas,
-        )
-        head_pos2 = self.reachy.head.look_at_async(0.5, 0.0, 0.0, 1.0)
-        traj_antennas = goto_async(
-            goal_positions={
-                self.reachy.head.r_antenna: 0.0,
-                self.reachy.head.l_antenna: 0.0,
-            },
-            duration=0.5,
-            interpolation_mode=InterpolationMode.MINIMUM_JERK
-        )
-        await asyncio.gather(
-            head_pos2,
-            traj_antennas,
-        )
+        # Relax the arms, unless other behaviors are using them.
+        if self.arbiter.is_free({RIGHT_ARM}, self):
+            self.set_torque_limit(self.reachy.r_arm.joints.values(), 0.0)
+
+        if self.arbiter.is_free({LEFT_ARM}, self):
+            self.set_torque_limit(self.reachy.l_arm.joints.values(), 0.0)
+
+        sneeze = Timeline(name=self.name)
+        sneeze.at(0.0, lambda: self.gaze.look_at_async(0.5, 0.0, 0.2, 0.8), label='look_up')
+        sneeze.at(1.5, lambda: playsound(self.sneeze_sound, block=False), label='sneeze_sound')
+        sneeze.at(1.8, lambda: gather(
+            self.gaze.look_at_async(0.5, 0.0, -0.2, 0.2),
+            goto_async(
+                goal_positions={
+                    self.reachy.head.r_antenna: -30.0,
+                    self.reachy.head.l_antenna: 30.0,
+                },
+                duration=0.2,
+                interpolation_mode=InterpolationMode.MINIMUM_JERK
+            ),
+        ), label='sneeze_move')
+        sneeze.at(2.0, lambda: gather(
+            self.gaze.look_at_async(0.5, 0.0, 0.0, 1.0),
+            goto_async(
+                goal_positions={
+                    self.reachy.head.r_antenna: 0.0,
+                    self.reachy.head.l_antenna: 0.0,
+                },
+                duration=0.5,
+                interpolation_mode=InterpolationMode.MINIMUM_JERK
+            ),
+        ), label='look_back')
+
+        await sneeze.run()
 
     async def teardown(self):
         """Use the teardown method from parent class."""
@@ -549,14 +599,15 @@ class Whistle(Behavior):
     Dependencies to other behaviors: ArmRythm
     """
 
+    resources = frozenset({RIGHT_ARM, LEFT_ARM, HEAD, SOUND})
+    gaze_targets = ((0.5, 0.0, 0.0),)
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the Whistle behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
         self.whistle_sound = 'sounds/whistling.wav'
 
-        self.head_movement = np.load('movements/whistling.npy')
-
         self.sampling_frequency = 100
 
         self.recorded_head = [
@@ -582,31 +633,40 @@ class Whistle(Behavior):
             reachy.r_arm.r_wrist_roll,
         ]
 
+        self.player = TrajectoryPlayer(self.joint_map(self.recorded_head), self.sampling_frequency, name=name)
+
+    def prefetch(self):
+        """Load the trajectories and sounds of the behavior."""
+        super().prefetch()
+        touch(load_clip('whistling'))
+        touch(load_clip('whistle_arms'))
+        get_engine().load(self.whistle_sound)
+
     async def run(self):
         """Implement the behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 0.0
+        head_movement = load_clip('whistling')
+
+        self.set_torque_limit(self.reachy.r_arm.joints.values(), 0.0)
 
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 100.0
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
 
         arm_move = ArmRythm(name='arm_move', reachy=self.reachy)
+        arm_move.parent = self
         await arm_move.start()
 
-        await self.reachy.head.look_at_async(0.5, 0.0, 0.0, 1.0)
-
-        first_point = dict(zip(self.recorded_head, self.head_movement[40]))
-        # Goes to the start of the trajectory in 1s
-        await goto_async(first_point, duration=0.5)
+        first_point = dict(zip(self.recorded_head, head_movement[0]))
+        tune_duration = len(head_movement) / self.sampling_frequency
 
+        # The head movement is played three times in a row, each one with the whistle sound.
+        whistle = Timeline(name=self.name)
+        whistle.at(0.0, lambda: self.gaze.look_at_async(0.5, 0.0, 0.0, 1.0), label='look_at')
+        # Goes to the start of the trajectory in 0.5s
+        whistle.at(1.0, lambda: self.transition(first_point, duration=0.5), label='first_point')
+        whistle.at(1.5, lambda: self.player.play(np.vstack([head_movement] * 3)), label='head_movement')
         for i in range(3):
-            playsound(self.whistle_sound, block=False)
+            whistle.at(1.5 + i * tune_duration, lambda: playsound(self.whistle_sound, block=False), label='whistle_sound')
 
-            for jp_head in self.head_movement[40:180]:
-                for joint, pos in zip(self.recorded_head, jp_head):
-                    joint.goal_position = pos
-
-                await asyncio.sleep(1 / self.sampling_frequency)
+        await whistle.run()
 
         await arm_move.stop()
 
@@ -625,12 +685,12 @@ class ArmRythm(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = ARMS
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the ArmRythm behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
-        self.arm_movement = np.load('movements/whistle_arms.npy')
-
         self.sampling_frequency = 100
 
         self.recorded_joints = [
@@ -650,13 +710,18 @@ class ArmRythm(Behavior):
             reachy.r_arm.r_wrist_roll,
         ]
 
+        self.player = TrajectoryPlayer(self.joint_map(self.recorded_joints), self.sampling_frequency, name=name)
+
+    def prefetch(self):
+        """Load the trajectories of the behavior."""
+        super().prefetch()
+        touch(load_clip('whistle_arms'))
+
     async def run(self):
         """Implement the behavior."""
-        for jp_arm in self.arm_movement:
-            for joint, pos in zip(self.recorded_joints, jp_arm):
-                joint.goal_position = pos
+        arm_movement = load_clip('whistle_arms')
 
-            await asyncio.sleep(1 / self.sampling_frequency)
+        await self.player.play(arm_movement)
 
     async def teardown(self):
         """Use the teardown method from parent class."""
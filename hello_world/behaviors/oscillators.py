@@ -0,0 +1,117 @@
+"""
+Oscillator tools.
+
+An OscillatorBank holds the periodic targets of several joints,
+offset + amplitude * sin(2 * pi * frequency * t + phase), and evaluates all of them for a tick in a
+single vectorized expression, from a single timestamp. Banks can be added together so that
+several motions share the same tick and stay in phase.
+"""
+import asyncio
+import time
+from fractions import Fraction
+from functools import reduce
+from math import gcd
+
+import numpy as np
+
+from . import metrics
+from .frames import JointMap
+from .tracing import span
+
+
+_lateness_seconds = metrics.histogram('oscillator_tick_lateness_seconds', 'Delay of the ticks of the oscillator banks.')
+
+
+class OscillatorBank:
+    """
+    OscillatorBank class.
+
+    Sinusoidal targets of a set of joints, optionally sampled from a precomputed one-period table.
+    """
+
+    def __init__(self, joints, amplitudes, frequencies, phases=0.0, offsets=0.0, name: str = '') -> None:
+        """Initialize the bank, the parameters being either one value per joint or a value for all of them."""
+        self.joints = list(joints)
+        self.name = name
+
+        shape = (len(self.joints),)
+        self.amplitudes = np.broadcast_to(np.asarray(amplitudes, dtype=float), shape).copy()
+        self.frequencies = np.broadcast_to(np.asarray(frequencies, dtype=float), shape).copy()
+        self.phases = np.broadcast_to(np.asarray(phases, dtype=float), shape).copy()
+        self.offsets = np.broadcast_to(np.asarray(offsets, dtype=float), shape).copy()
+
+        self.joint_map = JointMap(self.joints, name=name)
+        self._pulsations = 2 * np.pi * self.frequencies
+        self._table = None
+        self._table_period = None
+
+    def __add__(self, other: 'OscillatorBank') -> 'OscillatorBank':
+        """Merge two banks so that they are evaluated together."""
+        return OscillatorBank(
+            self.joints + other.joints,
+            np.concatenate((self.amplitudes, other.amplitudes)),
+            np.concatenate((self.frequencies, other.frequencies)),
+            np.concatenate((self.phases, other.phases)),
+            np.concatenate((self.offsets, other.offsets)),
+            name=self.name or other.name,
+        )
+
+    @property
+    def period(self) -> float:
+        """Return the common period of all the oscillators."""
+        periods = [Fraction(1 / f).limit_denominator(1000) for f in self.frequencies if f != 0]
+        if not periods:
+            return 0.0
+        numerator = reduce(lambda a, b: a * b // gcd(a, b), (p.numerator for p in periods))
+        denominator = reduce(gcd, (p.denominator for p in periods))
+        return numerator / denominator
+
+    def precompute(self, rate: float = 100) -> None:
+        """Sample one common period at the given rate, later evaluations will read the table."""
+        self._table_period = self.period
+        nb_samples = max(1, int(round(self._table_period * rate)))
+        t = np.arange(nb_samples) * (self._table_period / nb_samples)
+        self._table = self.offsets + self.amplitudes * np.sin(np.outer(t, self._pulsations) + self.phases)
+
+    def evaluate(self, t: float) -> np.ndarray:
+        """Return the targets of all the joints at time t."""
+        if self._table is not None and self._table_period:
+            index = int((t % self._table_period) / self._table_period * len(self._table) + 0.5)
+            return self._table[index % len(self._table)]
+        return self.offsets + self.amplitudes * np.sin(self._pulsations * t + self.phases)
+
+    def apply(self, t: float) -> None:
+        """Send the targets at time t as one batched update."""
+        self.joint_map.commit(self.evaluate(t))
+
+    async def drive(self, duration: float = None, rate: float = 100, on_tick=None, t0: float = None) -> None:
+        """Apply the targets at the given rate for duration seconds (forever by default).
+
+        Ticks are scheduled on absolute deadlines from t0 (now by default), on_tick(t) is called after each of them.
+        """
+        with span('drive', 'oscillators', bank=self.name, duration=duration):
+            await self._drive(duration, rate, on_tick, t0)
+
+    async def _drive(self, duration: float, rate: float, on_tick, t0: float) -> None:
+        period = 1.0 / rate
+        self.joint_map.reset()
+        if t0 is None:
+            t0 = time.monotonic()
+        tick = 0
+
+        while True:
+            deadline = t0 + tick * period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            t = time.monotonic() - t0
+            _lateness_seconds.observe(max(0.0, t0 + t - deadline), bank=self.name)
+            if duration is not None and t >= duration:
+                break
+
+            self.apply(t)
+            if on_tick is not None:
+                on_tick(t)
+
+            tick = int(t * rate) + 1
@@ -0,0 +1,192 @@
+"""
+Playback tools.
+
+Recorded trajectories are played against absolute monotonic deadlines: the frame k of a
+recording is due at t0 + k / rate, whatever the time spent writing the previous frames.
+When the loop falls behind, late frames are either dropped or interpolated so that the
+motion keeps its recorded duration instead of stretching.
+With lag compensation (see tracking.py), the goal positions sent are advanced by the tracking lag
+measured on each joint during the playback (still dropping or interpolating the late frames), and
+the tracking errors are reported.
+"""
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from . import metrics
+from .frames import JointMap
+from .tracing import span
+from .tracking import LagCompensator, compensation_from_env, gain_from_env
+
+
+logger = logging.getLogger(__name__)
+
+_lateness_seconds = metrics.histogram('frame_lateness_seconds', 'Delay of the frames of the played trajectories.')
+_frames_dropped = metrics.counter('frames_dropped', 'Frames of the played trajectories skipped to catch up.')
+
+DROP = 'drop'
+INTERPOLATE = 'interpolate'
+
+
+class PlaybackReport:
+    """Timing statistics of one trajectory playback."""
+
+    def __init__(
+            self,
+            name: str,
+            nb_frames: int,
+            frames_written: int,
+            frames_dropped: int,
+            duration: float,
+            nominal_duration: float,
+            max_lateness: float,
+            mean_lateness: float,
+            ) -> None:
+        """Store the playback statistics."""
+        self.name = name
+        self.nb_frames = nb_frames
+        self.frames_written = frames_written
+        self.frames_dropped = frames_dropped
+        self.duration = duration
+        self.nominal_duration = nominal_duration
+        self.max_lateness = max_lateness
+        self.mean_lateness = mean_lateness
+
+    @property
+    def nominal_rate(self) -> float:
+        """Return the rate at which the frames should have been written."""
+        return self.nb_frames / self.nominal_duration if self.nominal_duration > 0 else 0.0
+
+    @property
+    def achieved_rate(self) -> float:
+        """Return the rate at which the frames were actually written."""
+        return self.frames_written / self.duration if self.duration > 0 else 0.0
+
+    def __repr__(self) -> str:
+        """Summarize the playback."""
+        return (
+            f'<PlaybackReport {self.name}: {self.frames_written}/{self.nb_frames} frames '
+            f'({self.frames_dropped} dropped) in {self.duration:.3f}s (nominal {self.nominal_duration:.3f}s), '
+            f'{self.achieved_rate:.1f}Hz (nominal {self.nominal_rate:.1f}Hz), '
+            f'max lateness {1000 * self.max_lateness:.2f}ms, mean lateness {1000 * self.mean_lateness:.2f}ms>'
+        )
+
+
+class TrajectoryPlayer:
+    """
+    TrajectoryPlayer class.
+
+    Commits the frames of a recorded trajectory on a fixed list of joints, each frame being
+    scheduled against its absolute deadline and sent as one batched update.
+    """
+
+    def __init__(
+            self,
+            joints,
+            sampling_frequency: float = 100,
+            catch_up: str = DROP,
+            name: str = '',
+            compensate_lag: bool = None,
+            lag_gain: float = None,
+            ) -> None:
+        """Initialize the player for the given joints (or JointMap), in the column order of the recordings.
+
+        The lag compensation (and its gain) are set from the environment by default (see tracking.py).
+        """
+        if catch_up not in (DROP, INTERPOLATE):
+            raise ValueError(f'catch_up should be either "{DROP}" or "{INTERPOLATE}" (got "{catch_up}").')
+
+        self.joint_map = joints if isinstance(joints, JointMap) else JointMap(joints)
+        self.sampling_frequency = sampling_frequency
+        self.catch_up = catch_up
+        self.name = name
+        self.last_report = None
+
+        if compensate_lag is None:
+            compensate_lag = compensation_from_env()
+        self.compensator = None
+        if compensate_lag:
+            gain = gain_from_env() if lag_gain is None else lag_gain
+            self.compensator = LagCompensator(self.joint_map, gain=gain, name=name)
+
+    def write(self, frame) -> None:
+        """Write one frame on the joints."""
+        self.joint_map.commit(frame)
+
+    async def play(self, frames, speed: float = 1.0) -> PlaybackReport:
+        """Play the frames at sampling_frequency * speed and return the timing report."""
+        with span('play', 'playback', trajectory=self.name, frames=len(frames), speed=speed):
+            return await self._play(frames, speed)
+
+    async def _play(self, frames, speed: float) -> PlaybackReport:
+        rate = self.sampling_frequency * speed
+        period = 1.0 / rate
+        nb_frames = len(frames)
+
+        written, dropped = 0, 0
+        max_lateness, total_lateness = 0.0, 0.0
+
+        # Other motions may have moved the joints since the last playback.
+        self.joint_map.reset()
+        if self.compensator is not None:
+            self.compensator.start(rate)
+
+        t0 = time.monotonic()
+        index = 0
+
+        while index < nb_frames:
+            deadline = t0 + index * period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            now = time.monotonic()
+            lateness = max(0.0, now - deadline)
+            max_lateness = max(max_lateness, lateness)
+            total_lateness += lateness
+            _lateness_seconds.observe(lateness, trajectory=self.name)
+
+            position = max((now - t0) * rate, index)
+            current = min(int(position), nb_frames - 1)
+
+            if self.compensator is not None:
+                frame = self.compensator.frame(
+                    frames, min(position, nb_frames - 1), now, interpolate=self.catch_up == INTERPOLATE,
+                )
+            elif self.catch_up == INTERPOLATE and current < nb_frames - 1:
+                alpha = position - current
+                frame = (1.0 - alpha) * np.asarray(frames[current]) + alpha * np.asarray(frames[current + 1])
+            else:
+                frame = frames[current]
+
+            self.write(frame)
+
+            written += 1
+            dropped += current - index
+            index = current + 1
+
+        # The last frame lasts one period, as it did in the recording.
+        delay = t0 + nb_frames * period - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        _frames_dropped.inc(dropped, trajectory=self.name)
+
+        report = PlaybackReport(
+            name=self.name,
+            nb_frames=nb_frames,
+            frames_written=written,
+            frames_dropped=dropped,
+            duration=time.monotonic() - t0,
+            nominal_duration=nb_frames * period,
+            max_lateness=max_lateness,
+            mean_lateness=total_lateness / written if written else 0.0,
+        )
+        self.last_report = report
+        logger.info(report)
+        if self.compensator is not None:
+            logger.info(self.compensator.report())
+
+        return report
@@ -1,12 +1,12 @@
 """Implement sound player tools."""
-from threading import Thread
-
-from playsound import playsound as _playsound
+from .audio import get_engine
+from .tracing import span
 
 
 def playsound(sound, block):
-    """Read sound without blocking and sound card saturation."""
-    t = Thread(target=lambda: _playsound(sound, block=True))
-    t.start()
-    if block:
-        t.join()
+    """Read sound without blocking and sound card saturation.
+
+    The sound is played by the shared audio engine, which decodes it only once.
+    """
+    with span('playsound', 'sound', sound=sound, block=block):
+        get_engine().play(sound, block=block)
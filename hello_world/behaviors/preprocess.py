@@ -0,0 +1,320 @@
+"""
+Trajectory preprocessing.
+
+The recordings of the movements folder are raw captures of the robot. Instead of checking and
+cutting them each time they are played, each recording is processed once, in one vectorized pass:
+    - its playback window (see PLAYBACK_WINDOWS) is checked against the joint limits and for
+      velocity spikes (errors) and acceleration spikes (warnings),
+    - the static frames at its head and tail are trimmed (recordings played side by side are
+      trimmed together, and recordings synchronized with a sound keep their timing),
+    - its noise is smoothed with a Savitzky-Golay filter. The noise of each joint is measured
+      (from the second differences of the frames), and the window is shrunk until the smoothing
+      removes no more than the noise (NOISE_FACTOR times its RMS), rather than the motion (the
+      recording is kept as it is when even the shortest window removes more),
+and the ready-to-play clip is written next to the recording (<name>.opt.npy), along with its
+metadata (<name>.opt.json: played window in the recording, joint order, rate, trimming and
+smoothing). The recordings played side by side are written together, or not at all.
+The trajectory store plays these clips in place of the keyframes and raw recordings.
+The checks of every recording are gathered in a report (preprocess_report.json).
+
+To preprocess the recordings of the movements folder:
+    python3 -m hello_world.behaviors.preprocess
+"""
+import json
+import logging
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+logger = logging.getLogger(__name__)
+
+EXTENSION = '.opt.npy'
+METADATA_EXTENSION = '.opt.json'
+REPORT = 'preprocess_report.json'
+
+ERROR = 'error'
+WARNING = 'warning'
+
+# Approximate position limits of the joints of Reachy (in degrees).
+JOINT_LIMITS = {
+    'r_shoulder_pitch': (-180, 90), 'l_shoulder_pitch': (-180, 90),
+    'r_shoulder_roll': (-180, 20), 'l_shoulder_roll': (-20, 180),
+    'r_arm_yaw': (-90, 90), 'l_arm_yaw': (-90, 90),
+    'r_elbow_pitch': (-140, 5), 'l_elbow_pitch': (-140, 5),
+    'r_forearm_yaw': (-100, 100), 'l_forearm_yaw': (-100, 100),
+    'r_wrist_pitch': (-60, 60), 'l_wrist_pitch': (-60, 60),
+    'r_wrist_roll': (-70, 70), 'l_wrist_roll': (-70, 70),
+    'r_gripper': (-70, 70), 'l_gripper': (-70, 70),
+    'neck_roll': (-45, 45), 'neck_pitch': (-45, 45), 'neck_yaw': (-180, 180),
+    'r_antenna': (-180, 180), 'l_antenna': (-180, 180),
+}
+
+# Velocity (deg/s) above which a frame is a glitch, and acceleration (deg/s^2) reported as a spike.
+MAX_VELOCITY = 1000.0
+MAX_ACCELERATION = 50000.0
+
+# Frames within this distance (in degrees) of the first (last) one are static.
+STATIC_TOLERANCE = 0.5
+
+DEFAULT_SMOOTHING_WINDOW = 9
+DEFAULT_SMOOTHING_ORDER = 3
+# Largest RMS deviation of the smoothed frames from the recording, relative to the RMS of the noise of each joint.
+NOISE_FACTOR = 1.0
+# Deviation (in degrees) always accepted, for the joints without noise.
+MIN_SMOOTHING_TOLERANCE = 0.01
+
+# Recordings played side by side, which keep the same number of frames.
+PLAYED_TOGETHER = (('hello_move', 'hello_move_antennas'),)
+# Recordings whose timing follows a sound, which are not trimmed.
+KEEP_TIMING = ('whistling', 'whistle_arms')
+
+
+def savgol_coefficients(window: int, order: int) -> np.ndarray:
+    """Return the coefficients of the Savitzky-Golay filter smoothing the center of the window."""
+    if window % 2 == 0 or window <= order:
+        raise ValueError(f'window should be odd and greater than order (got {window} and {order}).')
+    x = np.arange(window) - window // 2
+    return np.linalg.pinv(np.vander(x, order + 1, increasing=True))[0]
+
+
+def smooth(frames, window: int = DEFAULT_SMOOTHING_WINDOW, order: int = DEFAULT_SMOOTHING_ORDER) -> np.ndarray:
+    """Return the frames smoothed joint by joint, the ends being extended by odd reflection."""
+    frames = np.asarray(frames, dtype=float)
+    half = window // 2
+    if len(frames) <= half:
+        return frames.copy()
+
+    padded = np.pad(frames, ((half, half), (0, 0)), mode='reflect', reflect_type='odd')
+    return sliding_window_view(padded, window, axis=0) @ savgol_coefficients(window, order)
+
+
+def noise(frames) -> np.ndarray:
+    """Return the RMS of the noise of each joint, estimated from the second differences of the frames.
+
+    The second differences of a white noise of RMS sigma have a variance of 6 * sigma ** 2, the ones of a smooth
+    motion are small in comparison.
+    """
+    frames = np.asarray(frames, dtype=float)
+    if len(frames) < 3:
+        return np.zeros(frames.shape[1:])
+    return np.sqrt(np.mean(np.diff(frames, n=2, axis=0) ** 2, axis=0) / 6)
+
+
+def smooth_within(
+        frames,
+        window: int = DEFAULT_SMOOTHING_WINDOW,
+        order: int = DEFAULT_SMOOTHING_ORDER,
+        noise_factor: float = NOISE_FACTOR,
+        ) -> tuple:
+    """Return the frames smoothed with the longest window (up to window) removing only their noise, and the window.
+
+    The RMS deviation of each joint should stay within noise_factor times the RMS of its noise. The window is None
+    (and the frames are returned as they are) when no window is within this tolerance.
+    """
+    frames = np.asarray(frames, dtype=float)
+    tolerance = np.maximum(noise_factor * noise(frames), MIN_SMOOTHING_TOLERANCE)
+    for length in range(window, order, -2):
+        smoothed = smooth(frames, length, order)
+        if len(frames) == 0 or np.all(np.sqrt(np.mean((smoothed - frames) ** 2, axis=0)) <= tolerance):
+            return smoothed, length
+    return frames.copy(), None
+
+
+def static_ends(frames, tolerance: float = STATIC_TOLERANCE) -> tuple:
+    """Return the number of static frames to trim at the head and at the tail, one of each being kept."""
+    frames = np.asarray(frames, dtype=float)
+    moving_from_start = np.flatnonzero(np.abs(frames - frames[0]).max(axis=1) > tolerance)
+    moving_to_end = np.flatnonzero(np.abs(frames - frames[-1]).max(axis=1) > tolerance)
+    if len(moving_from_start) == 0:
+        return len(frames) - 1, 0
+
+    head = max(moving_from_start[0] - 1, 0)
+    tail = max(len(frames) - 2 - moving_to_end[-1], 0)
+    return int(head), int(tail)
+
+
+def check(frames, joints, rate: float = 100, max_velocity: float = MAX_VELOCITY,
+          max_acceleration: float = MAX_ACCELERATION) -> list:
+    """Return the issues of the frames, with the worst frame of each check."""
+    frames = np.asarray(frames, dtype=float)
+    limits = np.array([JOINT_LIMITS.get(joint, (-np.inf, np.inf)) for joint in joints], dtype=float)
+    velocity = np.diff(frames, axis=0) * rate
+    acceleration = np.diff(frames, n=2, axis=0) * rate ** 2
+
+    checks = (
+        ('joint_limits', ERROR, frames, np.maximum(limits[:, 0] - frames, frames - limits[:, 1])),
+        ('velocity', ERROR, velocity, np.abs(velocity) - max_velocity),
+        ('acceleration', WARNING, acceleration, np.abs(acceleration) - max_acceleration),
+    )
+
+    issues = []
+    for name, level, values, excess in checks:
+        indices, columns = np.nonzero(excess > 0)
+        if len(indices) == 0:
+            continue
+        worst = np.argmax(excess[indices, columns])
+        issues.append({
+            'check': name,
+            'level': level,
+            'frames': len(indices),
+            'joint': joints[columns[worst]],
+            'frame': int(indices[worst]),
+            'value': round(float(values[indices[worst], columns[worst]]), 2),
+        })
+    return issues
+
+
+def preprocess(
+        names,
+        directory: str = None,
+        rate: float = None,
+        smoothing_window: int = DEFAULT_SMOOTHING_WINDOW,
+        smoothing_order: int = DEFAULT_SMOOTHING_ORDER,
+        static_tolerance: float = STATIC_TOLERANCE,
+        noise_factor: float = NOISE_FACTOR,
+        force: bool = False,
+        ) -> dict:
+    """Process the recordings and write their clips, return the report of each recording.
+
+    The recordings are checked at rate, the one saved with each recording by default.
+    The clip of a recording with errors (or played side by side with a recording with errors) is only written with force.
+    """
+    from .trajectories import DEFAULT_DIRECTORY, PLAYBACK_WINDOWS, recorded_joints, recorded_rate
+
+    directory = directory or DEFAULT_DIRECTORY
+    # The recordings played side by side are always processed together.
+    names = list(dict.fromkeys(
+        partner for name in names
+        for partner in next((group for group in PLAYED_TOGETHER if name in group), (name,))
+    ))
+
+    windows, clips, rates, reports = {}, {}, {}, {}
+    for name in names:
+        recording = np.load(os.path.join(directory, f'{name}.npy'))
+        start, stop, _ = slice(*PLAYBACK_WINDOWS.get(name, (None, None))).indices(len(recording))
+        joints = recorded_joints(name, directory) or [f'joint_{j}' for j in range(recording.shape[1])]
+
+        windows[name] = (start, stop)
+        clips[name] = recording[start:stop]
+        rates[name] = rate or recorded_rate(name, directory)
+
+        issues = check(clips[name], joints, rates[name])
+        for issue in issues:
+            issue['frame'] += start
+        reports[name] = {'source': f'{name}.npy', 'joints': joints, 'issues': issues}
+
+    trims = {
+        name: (0, 0) if name in KEEP_TIMING else static_ends(clip, static_tolerance)
+        for name, clip in clips.items()
+    }
+    for group in PLAYED_TOGETHER:
+        group = [name for name in group if name in trims]
+        if group:
+            trim = tuple(min(trims[name][i] for name in group) for i in (0, 1))
+            trims.update({name: trim for name in group})
+
+    smoothed = {}
+    for name, clip in clips.items():
+        head, tail = trims[name]
+        clip = clip[head:len(clip) - tail]
+        smoothed[name], window = smooth_within(clip, smoothing_window, smoothing_order, noise_factor)
+        if window is None:
+            logger.warning(f'{name} not smoothed: even the shortest window removes more than its noise.')
+
+        report = reports[name]
+        report.update({
+            'window': [windows[name][0] + head, windows[name][1] - tail],
+            'nb_frames': len(clip),
+            'rate': rates[name],
+            'trimmed': [head, tail],
+            'smoothing': {'window': window, 'order': smoothing_order},
+            'noise': round(float(noise(clip).max(initial=0.0)), 3),
+            'max_smoothing_error': round(float(np.abs(smoothed[name] - clip).max(initial=0.0)), 3),
+        })
+
+        errors = [issue for issue in report['issues'] if issue['level'] == ERROR]
+        report['written'] = not errors or force
+        if not report['written']:
+            logger.error(f'{name} not written: {errors}')
+
+    # The recordings played side by side would not match anymore if only some of them were written.
+    for group in PLAYED_TOGETHER:
+        group = [name for name in group if name in reports]
+        if not all(reports[name]['written'] for name in group):
+            for name in group:
+                if reports[name]['written']:
+                    logger.error(f'{name} not written: it is played with {", ".join(n for n in group if n != name)}.')
+                reports[name]['written'] = False
+
+    for name in clips:
+        report = reports[name]
+        if not report['written']:
+            continue
+
+        path = os.path.join(directory, f'{name}{EXTENSION}')
+        np.save(path, np.ascontiguousarray(smoothed[name]))
+        metadata = {key: value for key, value in report.items() if key not in ('issues', 'written')}
+        with open(os.path.join(directory, f'{name}{METADATA_EXTENSION}'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    return reports
+
+
+def main():
+    """Preprocess the recordings of the movements folder."""
+    import argparse
+    import sys
+
+    from .trajectories import DEFAULT_DIRECTORY, PLAYBACK_WINDOWS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help='Recordings to preprocess, all of them by default.')
+    parser.add_argument('--directory', help='Folder of the recordings.', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--window', help='Length of the smoothing window (odd, in frames).', type=int,
+                        default=DEFAULT_SMOOTHING_WINDOW)
+    parser.add_argument('--order', help='Order of the smoothing polynomials.', type=int, default=DEFAULT_SMOOTHING_ORDER)
+    parser.add_argument('--noise_factor', help='Largest RMS deviation of the smoothed frames, relative to their noise.',
+                        type=float, default=NOISE_FACTOR)
+    parser.add_argument('--static_tolerance', help='Motion (in degrees) under which frames are static.', type=float,
+                        default=STATIC_TOLERANCE)
+    parser.add_argument('--force', help='Write the clips of the recordings with errors.', action='store_true')
+    args = parser.parse_args()
+
+    reports = preprocess(
+        args.names or list(PLAYBACK_WINDOWS),
+        directory=args.directory,
+        smoothing_window=args.window,
+        smoothing_order=args.order,
+        static_tolerance=args.static_tolerance,
+        noise_factor=args.noise_factor,
+        force=args.force,
+    )
+
+    for name, report in reports.items():
+        smoothing = (
+            f'smoothed over {report["smoothing"]["window"]} frames (noise {report["noise"]:.2f} deg, '
+            f'max error {report["max_smoothing_error"]:.2f} deg)'
+            if report['smoothing']['window'] else 'not smoothed'
+        )
+        print(
+            f'{name}: frames {report["window"][0]}:{report["window"][1]} ({report["nb_frames"]} frames, '
+            f'trimmed {report["trimmed"][0]}+{report["trimmed"][1]}), {smoothing}, '
+            f'{"written" if report["written"] else "NOT WRITTEN"}'
+        )
+        for issue in report['issues']:
+            print(
+                f'    {issue["level"]}: {issue["check"]} on {issue["frames"]} frames, '
+                f'worst {issue["value"]} on {issue["joint"]} at frame {issue["frame"]}'
+            )
+
+    with open(os.path.join(args.directory, REPORT), 'w') as f:
+        json.dump(reports, f, indent=2)
+
+    if not all(report['written'] for report in reports.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Quantized trajectories.
+
+The recordings are float64 degrees, while the useful precision of the joints is about 0.1 degree.
+Two compact representations of the clips can be packed in the bundle (see bundle.py) instead:
+    - float32, played as is,
+    - int16, each joint being scaled on the int16 range between its extreme positions. These
+      clips are QuantizedFrames, whose frames are dequantized (q * scale + offset) when accessed.
+The behaviors play both representations like the float64 clips.
+
+To pack the clips of the movements folder in a quantized bundle, checking that the reconstruction
+error of every joint stays within the tolerance (in degrees):
+    python3 -m hello_world.behaviors.quantized --dtype int16 --tolerance 0.1
+"""
+import numpy as np
+
+
+FLOAT32 = 'float32'
+INT16 = 'int16'
+
+DEFAULT_TOLERANCE = 0.1
+
+_INT16_MAX = np.iinfo(np.int16).max
+
+
+class QuantizedFrames:
+    """
+    QuantizedFrames class.
+
+    Behaves as a read-only (nb_frames, nb_joints) float array stored as int16, with a scale and an offset per joint.
+    """
+
+    def __init__(self, data, scale, offset) -> None:
+        """Initialize the frames from their int16 data and the scale and offset of each joint."""
+        self.data = data
+        self.scale = np.asarray(scale, dtype=float)
+        self.offset = np.asarray(offset, dtype=float)
+
+    @classmethod
+    def quantize(cls, frames) -> 'QuantizedFrames':
+        """Quantize the frames, the extreme positions of each joint being mapped to the ends of the int16 range."""
+        frames = np.asarray(frames, dtype=float)
+        if len(frames):
+            low, high = frames.min(axis=0), frames.max(axis=0)
+        else:
+            low = high = np.zeros(frames.shape[1:])
+
+        offset = (high + low) / 2
+        # Static joints keep a non-zero scale, their frames all being quantized to 0.
+        scale = np.maximum((high - low) / (2 * _INT16_MAX), np.finfo(float).eps)
+        data = np.round((frames - offset) / scale).astype(np.int16)
+        return cls(data, scale, offset)
+
+    @property
+    def shape(self):
+        """Return the shape of the frames."""
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the quantized data."""
+        return self.data.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return len(self.data)
+
+    def __getitem__(self, key):
+        """Dequantize a frame or a range of frames."""
+        return self.data[key] * self.scale + self.offset
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        """Dequantize all the frames."""
+        frames = self[:]
+        return frames if dtype is None else frames.astype(dtype)
+
+
+def quantize(frames, dtype: str):
+    """Return the frames in the compact representation: a float32 array or QuantizedFrames."""
+    if dtype == FLOAT32:
+        return np.asarray(frames, dtype=np.float32)
+    if dtype == INT16:
+        return QuantizedFrames.quantize(frames)
+    raise ValueError(f'dtype should be either "{FLOAT32}" or "{INT16}" (got "{dtype}").')
+
+
+def reconstruction_error(frames, compact) -> np.ndarray:
+    """Return the maximum error (in degrees) of each joint of the compact representation of the frames."""
+    error = np.abs(np.asarray(compact, dtype=float) - np.asarray(frames, dtype=float))
+    return error.max(axis=0, initial=0.0)
+
+
+def main():
+    """Pack the clips of the movements folder in a quantized bundle and report the reconstruction errors."""
+    import argparse
+    import os
+    import sys
+
+    from .bundle import DEFAULT_NAME, Bundle, collect
+    from .trajectories import DEFAULT_DIRECTORY, PLAYBACK_WINDOWS
+    # When run with python -m, this module is __main__: the bundle only knows the QuantizedFrames of the package.
+    from .quantized import quantize
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help='Recordings to pack, all of them by default.')
+    parser.add_argument('--directory', help='Folder of the recordings.', default=DEFAULT_DIRECTORY)
+    parser.add_argument('--output', help=f'Path of the bundle, {DEFAULT_NAME} in the folder by default.')
+    parser.add_argument('--dtype', help='Representation of the frames.', choices=(INT16, FLOAT32), default=INT16)
+    parser.add_argument('--tolerance', help='Maximum error (in degrees).', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--force', help='Write the bundle even if the tolerance is exceeded.', action='store_true')
+    args = parser.parse_args()
+
+    clips, metadata = collect(args.names or list(PLAYBACK_WINDOWS), directory=args.directory)
+
+    compact_clips, within_tolerance = {}, True
+    for name, frames in clips.items():
+        compact = quantize(frames, args.dtype)
+        error = reconstruction_error(frames, compact)
+        worst = int(np.argmax(error)) if len(error) else 0
+        joints = metadata[name].get('joints') or []
+
+        compact_clips[name] = compact
+        within_tolerance &= bool(error.max(initial=0.0) <= args.tolerance)
+        print(
+            f'{name}: {frames.nbytes} -> {compact.nbytes} bytes, max error {error.max(initial=0.0):.4f} deg'
+            + (f' ({joints[worst]})' if worst < len(joints) else '')
+        )
+
+    if not within_tolerance and not args.force:
+        print(f'The reconstruction error exceeds {args.tolerance} deg, the bundle is not written.')
+        sys.exit(1)
+
+    path = args.output or os.path.join(args.directory, DEFAULT_NAME)
+    Bundle.write(path, compact_clips, metadata)
+    print(f'{path}: {len(compact_clips)} {args.dtype} clips, {os.path.getsize(path)} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Movement recorder.
+
+Records the present positions of a set of joints into a .npy file of the movements folder, at a
+fixed rate and in a known joint order (written next to it, in <name>.json), so that new recordings
+can be played (and preprocessed) like the existing ones.
+
+The sampling runs on the event loop against absolute monotonic deadlines: the sample k is due at
+t0 + k / rate. A sample whose deadline was missed by more than one period holds the last positions
+read, so that the recording keeps its duration, and is counted as missed.
+The samples go into a preallocated ring buffer, which a background thread flushes incrementally to
+the .npy file (whose header is completed when the recording stops): long takes neither fill the
+memory nor stall the sampling on disk writes. The ring buffer holds buffer_duration seconds of
+samples (at least two flush periods), a flush falling that far behind loses samples (counted as
+overruns).
+An existing recording (such as the ones the behaviors play) is never replaced, unless asked to
+(--force).
+
+To record the left arm at 100 Hz until Ctrl-C (or for --duration seconds):
+    python3 -m hello_world.behavior_player record my_move --joints l_arm --rate 100
+"""
+import asyncio
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 100.0
+DEFAULT_BUFFER_DURATION = 10.0
+FLUSH_PERIOD = 0.25
+
+METADATA_EXTENSION = '.json'
+
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# Size of the .npy header, large enough for any shape, so that it can be rewritten in place.
+_NPY_HEADER_SIZE = 128
+
+
+def resolve_joints(reachy, names) -> list:
+    """Return the joints of the parts (e.g. 'l_arm', 'head', 'reachy') or joint names, in the given order."""
+    joints = []
+    for name in names:
+        if name == 'reachy':
+            joints.extend(reachy.joints.values())
+        elif name in reachy.joints.keys():
+            joints.append(getattr(reachy.joints, name))
+        elif hasattr(getattr(reachy, name, None), 'joints'):
+            joints.extend(getattr(reachy, name).joints.values())
+        else:
+            raise ValueError(f'{name} is neither a part nor a joint of Reachy.')
+    return list(dict.fromkeys(joints))
+
+
+class RingBuffer:
+    """
+    RingBuffer class.
+
+    Preallocated buffer of the samples, written by the sampling loop and read by the flushing thread.
+    """
+
+    def __init__(self, capacity: int, nb_joints: int, dtype=np.float32) -> None:
+        """Allocate the buffer of capacity samples."""
+        self.samples = np.zeros((capacity, nb_joints), dtype=dtype)
+        self.capacity = capacity
+        # Number of samples pushed (written) and read since the start.
+        self.written = 0
+        self.read = 0
+        self.overruns = 0
+
+    def push(self, sample) -> None:
+        """Store the sample, overwriting the oldest one when the buffer is full."""
+        self.samples[self.written % self.capacity] = sample
+        # Only published once the sample is stored.
+        self.written += 1
+
+    def pop(self) -> np.ndarray:
+        """Return a copy of the samples pushed since the last pop, the overwritten ones being lost."""
+        written = self.written
+        if written - self.read > self.capacity:
+            self.overruns += written - self.read - self.capacity
+            self.read = written - self.capacity
+
+        start, stop = self.read % self.capacity, written % self.capacity
+        if written - self.read == 0:
+            samples = self.samples[:0].copy()
+        elif start < stop:
+            samples = self.samples[start:stop].copy()
+        else:
+            samples = np.concatenate([self.samples[start:], self.samples[:stop]])
+        self.read = written
+        return samples
+
+
+class NpyWriter:
+    """
+    NpyWriter class.
+
+    Appends rows to a .npy file, whose header is updated with the final shape when closed.
+    """
+
+    def __init__(self, path: str, nb_columns: int, dtype=np.float32, overwrite: bool = False) -> None:
+        """Create the file, with an empty array, raise FileExistsError if it exists unless overwrite."""
+        self.path = path
+        self.nb_columns = nb_columns
+        self.dtype = np.dtype(dtype)
+        self.nb_rows = 0
+
+        self._file = open(path, 'wb' if overwrite else 'xb')
+        self._write_header()
+
+    def _write_header(self) -> None:
+        header = repr({'descr': self.dtype.str, 'fortran_order': False, 'shape': (self.nb_rows, self.nb_columns)})
+        length = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+        self._file.seek(0)
+        self._file.write(_NPY_MAGIC + struct.pack('<H', length) + header.ljust(length - 1).encode() + b'\n')
+        self._file.seek(0, os.SEEK_END)
+
+    def append(self, rows) -> None:
+        """Append the rows at the end of the file."""
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        self._file.write(rows.tobytes())
+        self.nb_rows += len(rows)
+
+    def close(self) -> None:
+        """Write the final shape in the header and close the file."""
+        self._write_header()
+        self._file.close()
+
+
+class Recorder:
+    """
+    Recorder class.
+
+    Samples the present positions of the joints at a fixed rate into a .npy file.
+    """
+
+    def __init__(
+            self,
+            joints,
+            path: str,
+            rate: float = DEFAULT_RATE,
+            buffer_duration: float = DEFAULT_BUFFER_DURATION,
+            dtype=np.float64,
+            overwrite: bool = False,
+            ) -> None:
+        """Initialize the recorder of the joints (in the column order of the recording).
+
+        Recording to an existing path raises FileExistsError, unless overwrite. The buffer should hold at least two
+        flushes (2 * FLUSH_PERIOD seconds) of samples.
+        """
+        if buffer_duration < 2 * FLUSH_PERIOD:
+            raise ValueError(f'buffer_duration should be at least {2 * FLUSH_PERIOD}s (got {buffer_duration}s).')
+        self.joints = list(joints)
+        self.path = path
+        self.rate = rate
+        self.dtype = np.dtype(dtype)
+        self.overwrite = overwrite
+
+        self.buffer = RingBuffer(max(1, int(buffer_duration * rate)), len(self.joints), self.dtype)
+        self.missed = 0
+        self.max_lateness = 0.0
+
+        self._writer = None
+        self._stop = threading.Event()
+
+    def sample(self) -> np.ndarray:
+        """Return the present positions of the joints."""
+        return np.array([joint.present_position for joint in self.joints], dtype=self.dtype)
+
+    def _flush(self) -> None:
+        """Write the buffered samples to the file until stopped, then the last ones."""
+        while not self._stop.wait(FLUSH_PERIOD):
+            self._writer.append(self.buffer.pop())
+        self._writer.append(self.buffer.pop())
+
+    async def record(self, duration: float = None) -> dict:
+        """Record until the duration (in seconds) elapses or the task is cancelled, return the recording summary."""
+        self._writer = NpyWriter(self.path, len(self.joints), self.dtype, overwrite=self.overwrite)
+        flusher = threading.Thread(target=self._flush, name='recorder_flush', daemon=True)
+        flusher.start()
+
+        period = 1.0 / self.rate
+        nb_samples = None if duration is None else int(round(duration * self.rate))
+        t0 = time.monotonic()
+        index = 0
+        try:
+            with span('record', 'recorder', path=self.path, joints=len(self.joints), rate=self.rate):
+                while nb_samples is None or index < nb_samples:
+                    deadline = t0 + index * period
+                    delay = deadline - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                    now = time.monotonic()
+                    self.max_lateness = max(self.max_lateness, now - deadline)
+                    sample = self.sample()
+
+                    # The deadlines missed meanwhile hold the positions read now.
+                    current = int((now - t0) * self.rate)
+                    if nb_samples is not None:
+                        current = min(current, nb_samples - 1)
+                    for _ in range(index, max(current, index) + 1):
+                        self.buffer.push(sample)
+                    self.missed += max(current - index, 0)
+                    index = max(current, index) + 1
+        finally:
+            # Also when cancelled (Ctrl-C): the samples taken so far make a valid recording.
+            self._stop.set()
+            # Joined from a thread: the last flush may take a while on a slow disk.
+            await asyncio.get_running_loop().run_in_executor(None, flusher.join)
+            self._writer.close()
+
+            summary = self.summary(index)
+            with open(os.path.splitext(self.path)[0] + METADATA_EXTENSION, 'w') as f:
+                json.dump(summary, f, indent=2)
+            logger.info(
+                f'Recorded {summary["samples"]} samples of {len(self.joints)} joints at {self.rate:g}Hz in {self.path} '
+                f'({summary["missed"]} missed, {summary["overruns"]} lost, max lateness {1000 * self.max_lateness:.2f}ms).'
+            )
+        return summary
+
+    def summary(self, nb_samples: int = None) -> dict:
+        """Return the metadata of the recording: joints, rate, samples, missed deadlines and lost samples."""
+        return {
+            'joints': [joint.name for joint in self.joints],
+            'rate': self.rate,
+            'samples': self._writer.nb_rows if self._writer is not None else 0,
+            'duration': (nb_samples or 0) / self.rate,
+            'missed': self.missed,
+            'overruns': self.buffer.overruns,
+            'max_lateness': round(self.max_lateness, 6),
+        }
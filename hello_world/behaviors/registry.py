@@ -0,0 +1,139 @@
+"""
+Behavior registry.
+
+Maps the names of the behaviors to their factories, which are only imported and called when a
+behavior is first requested. The built-in behaviors are listed in BUILTIN_BEHAVIORS, and other
+packages can add their own through the 'hello_world.behaviors' entry point group, e.g. in setup.py:
+
+    entry_points={
+        'hello_world.behaviors': ['my_behavior = my_package.my_module:MyBehavior'],
+    }
+"""
+import logging
+from collections.abc import Mapping
+from importlib import import_module
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python < 3.8
+    entry_points = None
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = 'hello_world.behaviors'
+
+BUILTIN_BEHAVIORS = {
+    'asleep': 'hello_world.behaviors.asleep:Asleep',
+    'look_hand': 'hello_world.behaviors.look:LookHand',
+    'lonely': 'hello_world.behaviors.moods:Lonely',
+    'scratch': 'hello_world.behaviors.scratch:Scratch',
+    'tshirt': 'hello_world.behaviors.moods:Tshirt',
+    'sweat_head': 'hello_world.behaviors.moods:SweatHead',
+    'sneeze': 'hello_world.behaviors.moods:Sneeze',
+    'whistle': 'hello_world.behaviors.moods:Whistle',
+    'hello': 'hello_world.behaviors.moods:Hello',
+}
+
+
+def discover_behaviors() -> dict:
+    """Return the behaviors registered by the installed packages, without loading them."""
+    if entry_points is None:
+        return {}
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        group = eps.select(group=ENTRY_POINT_GROUP)
+    else:
+        group = eps.get(ENTRY_POINT_GROUP, [])
+
+    return {ep.name: ep for ep in group}
+
+
+def available_behaviors(discover: bool = True) -> list:
+    """Return the names of the built-in and discovered behaviors."""
+    names = dict(BUILTIN_BEHAVIORS)
+    if discover:
+        names.update(discover_behaviors())
+    return list(names)
+
+
+def resolve_factory(factory):
+    """Import the factory if it is given as a 'module:attribute' reference or an entry point."""
+    if isinstance(factory, str):
+        module_name, _, attribute = factory.partition(':')
+        return getattr(import_module(module_name), attribute)
+    if hasattr(factory, 'load'):
+        return factory.load()
+    return factory
+
+
+class BehaviorRegistry(Mapping):
+    """
+    BehaviorRegistry class.
+
+    Read-only mapping from names to behaviors, instantiated on first access and then cached.
+    """
+
+    def __init__(
+            self,
+            reachy,
+            sub_behavior: bool = False,
+            factories: dict = None,
+            discover: bool = True,
+            exclude=(),
+            ) -> None:
+        """Initialize the registry with the built-in behaviors and the discovered ones."""
+        self.reachy = reachy
+        self.sub_behavior = sub_behavior
+
+        self._factories = dict(BUILTIN_BEHAVIORS if factories is None else factories)
+        if discover:
+            self._factories.update(discover_behaviors())
+        for name in exclude:
+            self._factories.pop(name, None)
+
+        self._behaviors = {}
+
+    def register(self, name: str, factory) -> None:
+        """Register a factory (a Behavior class, a callable or a 'module:attribute' reference)."""
+        self._factories[name] = factory
+        self._behaviors.pop(name, None)
+
+    def factory(self, name: str):
+        """Return the resolved factory of the behavior."""
+        factory = resolve_factory(self._factories[name])
+        self._factories[name] = factory
+        return factory
+
+    def gaze_targets(self, names=None) -> list:
+        """Return the points looked at by the behaviors (all of them by default), without instantiating them."""
+        targets = []
+        for name in self if names is None else names:
+            targets.extend(getattr(self.factory(name), 'gaze_targets', ()))
+        return targets
+
+    def is_loaded(self, name: str) -> bool:
+        """Return if the behavior has already been instantiated."""
+        return name in self._behaviors
+
+    def __getitem__(self, name: str):
+        """Return the behavior, instantiating it on first access."""
+        behavior = self._behaviors.get(name)
+        if behavior is None:
+            behavior = self.factory(name)(name=name, reachy=self.reachy, sub_behavior=self.sub_behavior)
+            self._behaviors[name] = behavior
+            logger.debug(f'Instantiated behavior {name}.')
+        return behavior
+
+    def __iter__(self):
+        """Iterate over the names of the registered behaviors."""
+        return iter(self._factories)
+
+    def __len__(self) -> int:
+        """Return the number of registered behaviors."""
+        return len(self._factories)
+
+    def __contains__(self, name) -> bool:
+        """Return if the behavior is registered, without instantiating it."""
+        return name in self._factories
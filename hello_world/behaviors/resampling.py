@@ -0,0 +1,69 @@
+"""
+Resampling tools.
+
+Changes the playback speed of a recording by interpolating it at the rate of the controller,
+instead of writing its frames faster or slower: a recording played twice as fast still
+streams one frame per controller period, and a slowed down one is smooth instead of steppy.
+"""
+import numpy as np
+
+
+LINEAR = 'linear'
+CUBIC = 'cubic'
+
+# The SDK streams the joints commands to the robot at 100Hz.
+CONTROLLER_RATE = 100
+
+
+def resample(
+        frames: np.ndarray,
+        source_rate: float,
+        target_rate: float = CONTROLLER_RATE,
+        speed: float = 1.0,
+        duration: float = None,
+        kind: str = LINEAR,
+        ) -> np.ndarray:
+    """Return the frames interpolated at target_rate, played speed times faster or within duration seconds."""
+    if kind not in (LINEAR, CUBIC):
+        raise ValueError(f'kind should be either "{LINEAR}" or "{CUBIC}" (got "{kind}").')
+
+    frames = np.asarray(frames, dtype=float)
+    nb_frames = len(frames)
+    if nb_frames < 2:
+        return frames.copy()
+
+    if duration is not None:
+        speed = (nb_frames / source_rate) / duration
+    if speed <= 0:
+        raise ValueError(f'speed should be positive (got {speed}).')
+
+    if speed == 1 and target_rate == source_rate:
+        return frames.copy()
+
+    # Fractional indices of the recording to sample, one per controller period.
+    nb_samples = max(2, int(round(nb_frames * target_rate / (source_rate * speed))))
+    positions = np.linspace(0, nb_frames - 1, nb_samples)
+
+    index = np.minimum(positions.astype(np.intp), nb_frames - 2)
+    alpha = (positions - index)[:, np.newaxis]
+
+    p1 = frames[index]
+    p2 = frames[index + 1]
+
+    if kind == LINEAR:
+        return p1 + alpha * (p2 - p1)
+
+    # Catmull-Rom spline, the end points being duplicated.
+    p0 = frames[np.maximum(index - 1, 0)]
+    p3 = frames[np.minimum(index + 2, nb_frames - 1)]
+    m1 = (p2 - p0) / 2
+    m2 = (p3 - p1) / 2
+
+    alpha2 = alpha * alpha
+    alpha3 = alpha2 * alpha
+    return (
+        (2 * alpha3 - 3 * alpha2 + 1) * p1
+        + (alpha3 - 2 * alpha2 + alpha) * m1
+        + (-2 * alpha3 + 3 * alpha2) * p2
+        + (alpha3 - alpha2) * m2
+    )
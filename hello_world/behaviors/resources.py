@@ -0,0 +1,107 @@
+"""
+Resource arbitration.
+
+Each behavior claims the body parts it uses (its `resources`, see the "Uses:" line of its
+documentation). The arbiter of a robot grants a claim only when none of the parts is held by
+another behavior, so that behaviors using different parts can run together without fighting
+over the goal positions. A behavior started by another one (its parent) shares its parts.
+"""
+import asyncio
+import logging
+import time
+import weakref
+from collections import Counter
+
+
+logger = logging.getLogger(__name__)
+
+RIGHT_ARM = 'right_arm'
+LEFT_ARM = 'left_arm'
+HEAD = 'head'
+SOUND = 'sound'
+
+ARMS = frozenset({RIGHT_ARM, LEFT_ARM})
+
+
+class ResourceArbiter:
+    """
+    ResourceArbiter class.
+
+    Grants and locks the body parts of one robot.
+    """
+
+    _arbiters = weakref.WeakKeyDictionary()
+
+    def __init__(self) -> None:
+        """Initialize the arbiter with all the parts free."""
+        self.owners = {}
+        self.contentions = Counter()
+        self.wait_time = 0.0
+
+        self._waiters = []
+
+    @classmethod
+    def for_robot(cls, reachy) -> 'ResourceArbiter':
+        """Return the arbiter shared by all the behaviors of the robot."""
+        arbiter = cls._arbiters.get(reachy)
+        if arbiter is None:
+            arbiter = cls()
+            cls._arbiters[reachy] = arbiter
+        return arbiter
+
+    def holders(self, parts, behavior=None) -> set:
+        """Return the behaviors, other than the given one and its parents, holding some of the parts."""
+        lineage = set()
+        while behavior is not None:
+            lineage.add(behavior)
+            behavior = getattr(behavior, 'parent', None)
+
+        return {
+            owner for part, owner in self.owners.items()
+            if part in parts and owner not in lineage
+        }
+
+    def is_free(self, parts, behavior=None) -> bool:
+        """Return if the parts can be granted to the behavior."""
+        return not self.holders(parts, behavior)
+
+    def try_acquire(self, behavior, parts) -> bool:
+        """Grant the parts to the behavior if they are free, without waiting."""
+        if not self.is_free(parts, behavior):
+            return False
+        for part in parts:
+            self.owners.setdefault(part, behavior)
+        return True
+
+    async def acquire(self, behavior, parts) -> None:
+        """Wait until the parts are free and grant them to the behavior."""
+        if self.try_acquire(behavior, parts):
+            return
+
+        holders = self.holders(parts, behavior)
+        contended = {part for part in parts if self.owners.get(part) in holders}
+        self.contentions.update(contended)
+        logger.info(
+            f'{behavior.name} waits for {", ".join(sorted(contended))} '
+            f'held by {", ".join(sorted(holder.name for holder in holders))}.'
+        )
+
+        tic = time.monotonic()
+        while not self.try_acquire(behavior, parts):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.wait_time += time.monotonic() - tic
+
+    def release(self, behavior) -> None:
+        """Release the parts held by the behavior."""
+        self.owners = {part: owner for part, owner in self.owners.items() if owner is not behavior}
+
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
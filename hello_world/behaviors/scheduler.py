@@ -0,0 +1,87 @@
+"""
+Behavior scheduler.
+
+Picks the sub behaviors played by Idle. Each behavior is picked with a probability proportional
+to its weight, and cannot be picked again before its cooldown (a number of Idle cycles) is over,
+so that the same behavior is never played twice in a row by default. The weights and cooldowns
+are read from the `weight` and `cooldown` attributes of the behaviors and can be overridden.
+A weight of 0 disables a behavior, at least one of them must have a positive weight.
+
+The random generator can be seeded (HELLO_WORLD_SEED environment variable, or --seed option of
+hello_world.hello) to replay the same sequence of behaviors.
+
+Any object with a pick() method returning a behavior name can be given to Idle as its scheduler.
+"""
+import logging
+import os
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+SEED_ENV = 'HELLO_WORLD_SEED'
+
+DEFAULT_WEIGHT = 1.0
+DEFAULT_COOLDOWN = 1
+
+
+class BehaviorScheduler:
+    """
+    BehaviorScheduler class.
+
+    Weighted random choice of the next behavior, among the ones whose cooldown is over.
+    """
+
+    def __init__(self, registry, weights: dict = None, cooldowns: dict = None, seed: int = None) -> None:
+        """Initialize the scheduler of the behaviors of the registry, overriding their weights and cooldowns."""
+        self.names = list(registry)
+
+        weights = weights or {}
+        cooldowns = cooldowns or {}
+        self.weights = {
+            name: float(weights.get(name, getattr(registry.factory(name), 'weight', DEFAULT_WEIGHT)))
+            for name in self.names
+        }
+        negative = [name for name, weight in self.weights.items() if not weight >= 0]
+        if negative:
+            raise ValueError(f'The weights of the behaviors must be positive or zero, not the ones of {", ".join(negative)}.')
+        if self.names and not any(self.weights.values()):
+            raise ValueError('At least one behavior must have a positive weight to be picked.')
+
+        self.cooldowns = {
+            name: int(cooldowns.get(name, getattr(registry.factory(name), 'cooldown', DEFAULT_COOLDOWN)))
+            for name in self.names
+        }
+
+        if seed is None and os.environ.get(SEED_ENV):
+            seed = int(os.environ[SEED_ENV])
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        self.history = []
+        self._last_cycle = {}
+
+    def candidates(self) -> list:
+        """Return the behaviors which can be picked now."""
+        cycle = len(self.history)
+        candidates = [
+            name for name in self.names
+            if self.weights[name] > 0 and cycle - self._last_cycle.get(name, -np.inf) > self.cooldowns[name]
+        ]
+        if not candidates:
+            # Every behavior is cooling down, fall back on the least recently played ones.
+            oldest = min(self._last_cycle.get(name, -np.inf) for name in self.names if self.weights[name] > 0)
+            candidates = [name for name in self.names if self.weights[name] > 0 and self._last_cycle.get(name) == oldest]
+        return candidates
+
+    def pick(self) -> str:
+        """Pick the next behavior."""
+        candidates = self.candidates()
+        weights = np.array([self.weights[name] for name in candidates])
+        name = candidates[self.rng.choice(len(candidates), p=weights / weights.sum())]
+
+        self._last_cycle[name] = len(self.history)
+        self.history.append(name)
+        logger.debug(f'Picked {name} among {candidates}.')
+        return name
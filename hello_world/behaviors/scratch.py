@@ -1,10 +1,13 @@
 """Implement scratch behavior where Reachy use its left arm to scratch its right forearm."""
 import asyncio
-import numpy as np
 
-from reachy_sdk.trajectory import goto_async, InterpolationMode
+from reachy_sdk.trajectory import InterpolationMode
 
 from . import Behavior
+from .playback import TrajectoryPlayer
+from .resources import HEAD, LEFT_ARM, RIGHT_ARM
+from .tracing import gather, goto_async
+from .trajectories import load_resampled, touch
 
 
 class Scratch(Behavior):
@@ -17,12 +20,13 @@ class Scratch(Behavior):
     Dependencies to other behaviors: none
     """
 
+    resources = frozenset({RIGHT_ARM, LEFT_ARM, HEAD})
+    gaze_targets = ((0.5, -0.1, -0.5), (0.5, -0.1, -0.3), (0.5, 0.0, 0.0))
+
     def __init__(self, name: str, reachy, sub_behavior: bool = False) -> None:
         """Initialize the behavior."""
         super().__init__(name, reachy, sub_behavior=sub_behavior)
 
-        self.scratch_arm = np.load('movements/scratch.npy')
-
         self.sampling_frequency = 100
 
         self.recorded_joints = [
@@ -43,14 +47,22 @@ class Scratch(Behavior):
             self.reachy.l_arm.l_gripper,
         ]
 
+        self.player = TrajectoryPlayer(self.joint_map(self.recorded_joints), self.sampling_frequency, name=name)
+
+    def prefetch(self):
+        """Load the trajectories of the behavior."""
+        super().prefetch()
+        touch(load_resampled('scratch', speed=2.0))
+
     async def run(self):
         """Implement the Scratch behavior."""
-        for j in self.reachy.r_arm.joints.values():
-            j.torque_limit = 100.0
-        for j in self.reachy.l_arm.joints.values():
-            j.torque_limit = 100.0
+        # The recording is played twice as fast as it was recorded.
+        scratch_arm = load_resampled('scratch', speed=2.0)
 
-        look_down = self.reachy.head.look_at_async(
+        self.set_torque_limit(self.reachy.r_arm.joints.values(), 100.0)
+        self.set_torque_limit(self.reachy.l_arm.joints.values(), 100.0)
+
+        look_down = self.gaze.look_at_async(
             0.5,
             -0.1,
             -0.5,
@@ -70,21 +82,17 @@ class Scratch(Behavior):
             interpolation_mode=InterpolationMode.MINIMUM_JERK
         )
 
-        first_point = dict(zip(self.recorded_joints, self.scratch_arm[50]))
+        first_point = dict(zip(self.recorded_joints, scratch_arm[0]))
         # Goes to the start of the trajectory in 1s
-        first_pos = goto_async(first_point, duration=1.0)
+        first_pos = self.transition(first_point, duration=1.0)
 
-        await asyncio.gather(
+        await gather(
             look_down,
             first_pos,
             traj_antennas,
         )
 
-        for jp_arms in self.scratch_arm[50:]:
-            for joint, pos in zip(self.recorded_joints, jp_arms):
-                joint.goal_position = pos
-
-            await asyncio.sleep(1 / (self.sampling_frequency*2))
+        await self.player.play(scratch_arm)
 
         traj_antennas = goto_async(
             goal_positions={
@@ -104,7 +112,7 @@ class Scratch(Behavior):
             self.reachy.l_arm.l_wrist_roll: 0.0},
             duration=1.2,
         )
-        watch_arm_head = self.reachy.head.look_at_async(
+        watch_arm_head = self.gaze.look_at_async(
             0.5,
             -0.1,
             -0.3,
@@ -118,7 +126,7 @@ class Scratch(Behavior):
         goto_dic = {j: pos for j, pos in zip(self.reachy.r_arm.joints.values(), pose_watch_right_arm)}
         watch_arm_arm = goto_async(goal_positions=goto_dic, duration=0.5)
 
-        await asyncio.gather(
+        await gather(
             watch_arm_head,
             watch_arm_arm,
             hands_back,
@@ -127,6 +135,9 @@ class Scratch(Behavior):
 
         await asyncio.sleep(0.3)
 
+        if not self.homing:
+            return
+
         traj_antennas = goto_async(
             goal_positions={
                 self.reachy.head.r_antenna: 0,
@@ -136,7 +147,7 @@ class Scratch(Behavior):
             interpolation_mode=InterpolationMode.MINIMUM_JERK
         )
 
-        look_back = self.reachy.head.look_at_async(
+        look_back = self.gaze.look_at_async(
             0.5,
             0.0,
             0.0,
@@ -157,14 +168,14 @@ class Scratch(Behavior):
             duration=1.2,
         )
 
-        await asyncio.gather(
+        await gather(
             traj_antennas,
             look_back,
             hands_back,
         )
 
-        self.reachy.turn_off_smoothly('r_arm')
-        self.reachy.turn_off_smoothly('l_arm')
+        await self.turn_off_smoothly('r_arm')
+        await self.turn_off_smoothly('l_arm')
 
     async def teardown(self):
         """Use the teardown method from parent class."""
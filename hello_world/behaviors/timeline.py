@@ -0,0 +1,86 @@
+"""
+Timeline tools.
+
+A behavior declares timestamped events (play a sound at 1.2s, move the antennas at 2.0s, start
+a trajectory...) on a Timeline, which fires them against a single monotonic clock. The delay
+between the planned time of an event and the moment it actually fires (its skew) is measured,
+so the alignment of sounds and motions can be checked under load.
+"""
+import asyncio
+import inspect
+import logging
+import time
+
+from . import metrics
+from .tracing import instant, span
+
+
+logger = logging.getLogger(__name__)
+
+_skew_seconds = metrics.histogram('timeline_skew_seconds', 'Delay of the events of the timelines.')
+
+
+class Timeline:
+    """
+    Timeline class.
+
+    Actions are callables. When they return an awaitable (e.g. a goto_async coroutine), it is
+    run as a task and the timeline waits for it before finishing.
+    """
+
+    def __init__(self, name: str = '') -> None:
+        """Initialize an empty timeline."""
+        self.name = name
+        self.events = []
+        self.skews = []
+
+    def at(self, t: float, action, label: str = None) -> 'Timeline':
+        """Add an event t seconds after the start of the timeline."""
+        self.events.append((t, len(self.events), label or getattr(action, '__name__', 'event'), action))
+        return self
+
+    @property
+    def duration(self) -> float:
+        """Return the time of the last event."""
+        return max((t for t, _, _, _ in self.events), default=0.0)
+
+    @property
+    def max_skew(self) -> float:
+        """Return the worst delay of the last run."""
+        return max((skew for _, skew in self.skews), default=0.0)
+
+    async def run(self, t0: float = None) -> None:
+        """Fire the events, t0 being the monotonic time of the start of the timeline (now by default)."""
+        with span('timeline', 'timeline', timeline=self.name):
+            await self._run(t0)
+
+    async def _run(self, t0: float) -> None:
+        if t0 is None:
+            t0 = time.monotonic()
+
+        self.skews = []
+        tasks = []
+
+        try:
+            for t, _, label, action in sorted(self.events):
+                delay = t0 + t - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                skew = max(0.0, time.monotonic() - t0 - t)
+                self.skews.append((label, skew))
+                _skew_seconds.observe(skew, timeline=self.name)
+                instant(label, 'timeline', timeline=self.name, skew=skew)
+
+                result = action()
+                if inspect.isawaitable(result):
+                    tasks.append(asyncio.ensure_future(result))
+
+            await asyncio.gather(*tasks)
+
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        logger.info(f'Timeline {self.name}: {len(self.events)} events, max skew {1000 * self.max_skew:.2f}ms.')
@@ -0,0 +1,165 @@
+"""
+Execution tracing.
+
+When tracing is enabled, spans are recorded for the runs of the behaviors and for what they wait
+for: trajectories (goto_async, look_at), gathers, played trajectories and their frame writes,
+sounds and inverse kinematics. The spans are written as a Chrome trace (JSON), which can be
+opened in chrome://tracing or https://ui.perfetto.dev, each asyncio task (or thread) being a row.
+
+Tracing is enabled with the HELLO_WORLD_TRACE environment variable (path of the trace file), or
+with the --trace option of hello_world.hello and hello_world.behavior_player. When it is disabled,
+span() returns a shared no-op context manager and the wrappers directly call the wrapped functions.
+
+The behaviors import goto_async and gather from this module instead of reachy_sdk and asyncio.
+"""
+import asyncio
+import atexit
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+from reachy_sdk.trajectory import goto_async as _goto_async
+
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = 'HELLO_WORLD_TRACE'
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """
+    Tracer class.
+
+    Records complete events ("ph": "X") of the Chrome trace event format.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize an empty trace, saved at path."""
+        self.path = path
+        self.events = []
+
+        self._t0 = time.perf_counter()
+        self._pid = os.getpid()
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        """Return the current trace time, in microseconds."""
+        return (time.perf_counter() - self._t0) * 1e6
+
+    def lane(self) -> int:
+        """Return the row of the current asyncio task, or of the current thread outside of the event loop."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        name = task.get_name() if task is not None else threading.current_thread().name
+
+        lane = self._lanes.get(name)
+        if lane is None:
+            with self._lock:
+                lane = self._lanes.setdefault(name, len(self._lanes) + 1)
+        return lane
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, args: dict = None):
+        """Record the duration of the enclosed block."""
+        lane = self.lane()
+        start = self.now()
+        try:
+            yield
+        finally:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start, 'dur': self.now() - start,
+                     'pid': self._pid, 'tid': lane}
+            if args:
+                event['args'] = args
+            self.events.append(event)
+
+    def instant(self, name: str, category: str, args: dict = None) -> None:
+        """Record an instant event."""
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': self.now(), 'pid': self._pid, 'tid': self.lane()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def save(self) -> None:
+        """Write the trace file."""
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': lane, 'args': {'name': name}}
+            for name, lane in list(self._lanes.items())
+        ]
+        with open(self.path, 'w') as f:
+            json.dump({'traceEvents': metadata + list(self.events), 'displayTimeUnit': 'ms'}, f)
+        logger.info(f'Wrote {len(self.events)} trace events to {self.path}.')
+
+
+_tracer = None
+
+
+def enable(path: str) -> Tracer:
+    """Start tracing, the trace being written at path when the process exits (or with disable)."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(path)
+        atexit.register(disable)
+    return _tracer
+
+
+def enable_from_env() -> Tracer:
+    """Start tracing if the HELLO_WORLD_TRACE environment variable is set."""
+    path = os.environ.get(TRACE_ENV)
+    return enable(path) if path else None
+
+
+def disable() -> None:
+    """Stop tracing and write the trace."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.save()
+
+
+def is_enabled() -> bool:
+    """Return if tracing is enabled."""
+    return _tracer is not None
+
+
+def span(name: str, category: str = 'behavior', **args):
+    """Return a context manager recording the duration of the enclosed block."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, category, args)
+
+
+def instant(name: str, category: str = 'behavior', **args) -> None:
+    """Record an instant event."""
+    if _tracer is not None:
+        _tracer.instant(name, category, args)
+
+
+async def _traced(awaitable, name: str, category: str, args: dict):
+    with _tracer.span(name, category, args):
+        return await awaitable
+
+
+async def goto_async(goal_positions, duration: float, *args, **kwargs):
+    """Traced reachy_sdk.trajectory.goto_async."""
+    if _tracer is None:
+        return await _goto_async(goal_positions, duration, *args, **kwargs)
+
+    joints = [joint.name for joint in goal_positions]
+    with _tracer.span('goto', 'trajectory', {'joints': joints, 'duration': duration}):
+        return await _goto_async(goal_positions, duration, *args, **kwargs)
+
+
+def gather(*awaitables, name: str = 'gather'):
+    """Traced asyncio.gather."""
+    future = asyncio.gather(*awaitables)
+    if _tracer is None:
+        return future
+    return _traced(future, name, 'gather', {'size': len(awaitables)})
@@ -0,0 +1,182 @@
+"""
+Tracking lag compensation.
+
+The players stream the goal positions open-loop, while the motors follow them with a lag (their
+position loop, plus the state stream): fast recordings, such as Scratch played twice as fast,
+visibly undershoot. A LagCompensator closes the loop around the played trajectory:
+    - at each frame, it compares the present position of each joint with the trajectory, and
+      estimates the lag of the joint by least squares against the velocity of the trajectory (a
+      joint lagging by lag seconds, whose goals are advanced by advance seconds, is
+      error = velocity * (lag - advance) behind), with an exponential forgetting of the past
+      frames. The velocity is the one of the trajectory, not of the goals sent, which jump when
+      the advance changes. The lags are kept from one playback to the next, so that the next
+      playbacks start compensated,
+    - the goal positions sent are the ones of the trajectory lag seconds ahead (feed-forward time
+      advance), plus an optional correction gain * tracking error, bounded to MAX_CORRECTION.
+      They are interpolated between the frames, unless the player drops the late frames (see
+      playback.py), in which case recorded frames are sent as they are,
+    - the tracking error (frame due vs present position) of each joint is summed up, for each
+      playback, in a TrackingReport.
+
+The compensation is enabled for every player with HELLO_WORLD_LAG_COMPENSATION=1 (the gain being
+set with HELLO_WORLD_LAG_GAIN, 0 by default), or with --compensate_lag (and --lag_gain) in the
+behavior player.
+"""
+import os
+
+import numpy as np
+
+
+COMPENSATION_ENV = 'HELLO_WORLD_LAG_COMPENSATION'
+GAIN_ENV = 'HELLO_WORLD_LAG_GAIN'
+
+# Longest lag (in seconds) compensated.
+MAX_LAG = 0.25
+# Largest correction (in degrees) added to the goal positions by the gain.
+MAX_CORRECTION = 5.0
+# Weight of the previous frames in the lag estimates, at each frame.
+FORGETTING = 0.98
+# Squared velocity (in (deg/s)^2, summed over the remembered frames) needed to update the lag of a joint.
+MIN_EXCITATION = 1000.0
+
+
+def compensation_from_env() -> bool:
+    """Return if the lag compensation is enabled by the HELLO_WORLD_LAG_COMPENSATION environment variable."""
+    return os.environ.get(COMPENSATION_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def gain_from_env() -> float:
+    """Return the gain set by the HELLO_WORLD_LAG_GAIN environment variable, 0 by default."""
+    gain = os.environ.get(GAIN_ENV)
+    return float(gain) if gain else 0.0
+
+
+class TrackingReport:
+    """Tracking statistics of one compensated trajectory playback."""
+
+    def __init__(self, name: str, joints, lag, rms_error, max_error, nb_frames: int) -> None:
+        """Store the statistics, per joint."""
+        self.name = name
+        self.joints = list(joints)
+        self.lag = np.asarray(lag)
+        self.rms_error = np.asarray(rms_error)
+        self.max_error = np.asarray(max_error)
+        self.nb_frames = nb_frames
+
+    def as_dict(self) -> dict:
+        """Return the lag (in seconds) and the RMS and maximum tracking errors (in degrees) of each joint."""
+        return {
+            joint: {'lag': round(float(lag), 4), 'rms_error': round(float(rms), 3), 'max_error': round(float(worst), 3)}
+            for joint, lag, rms, worst in zip(self.joints, self.lag, self.rms_error, self.max_error)
+        }
+
+    def __repr__(self) -> str:
+        """Summarize the tracking, with the worst tracked joint."""
+        if not len(self.joints) or not self.nb_frames:
+            return f'<TrackingReport {self.name}: no frame>'
+        worst = int(np.argmax(self.rms_error))
+        return (
+            f'<TrackingReport {self.name}: {self.nb_frames} frames, mean lag {1000 * self.lag.mean():.1f}ms, '
+            f'worst joint {self.joints[worst]} (lag {1000 * self.lag[worst]:.1f}ms, '
+            f'rms error {self.rms_error[worst]:.2f}deg, max error {self.max_error[worst]:.2f}deg)>'
+        )
+
+
+class LagCompensator:
+    """
+    LagCompensator class.
+
+    Estimates the tracking lag of the joints of a JointMap, and advances the goal positions sent accordingly.
+    """
+
+    def __init__(self, joint_map, gain: float = 0.0, max_lag: float = MAX_LAG, name: str = '') -> None:
+        """Initialize the compensator of the joints of the map, without any lag."""
+        self.joint_map = joint_map
+        self.gain = gain
+        self.max_lag = max_lag
+        self.name = name
+
+        self.lag = np.zeros(len(joint_map))
+        self.last_report = None
+        self.start(100)
+
+    def start(self, rate: float) -> None:
+        """Prepare the playback of a trajectory at rate (in frames per second), keeping the lag estimates."""
+        self.rate = rate
+        nb_joints = len(self.joint_map)
+
+        self._error_velocity = np.zeros(nb_joints)
+        self._velocity_squared = np.zeros(nb_joints)
+        # Lags the goal positions are advanced by.
+        self._advance = self.lag.copy()
+
+        self._squared_error = np.zeros(nb_joints)
+        self._max_error = np.zeros(nb_joints)
+        self._nb_frames = 0
+
+    def _columns(self, nb_columns: int) -> np.ndarray:
+        columns = self.joint_map.columns
+        return np.arange(nb_columns) if columns is None else columns
+
+    def frame(self, frames, position: float, now: float, interpolate: bool = True) -> np.ndarray:
+        """Return the frame to send at now, position being the (fractional) index of the frame due.
+
+        Without interpolate, the frames are sent as they are recorded, the last one due (or lag ahead) being sent.
+        """
+        nb_frames = len(frames)
+        present = np.array([joint.present_position for joint in self.joint_map.joints], dtype=float)
+
+        # The trajectory at now, and its velocity.
+        due = min(int(position), nb_frames - 1)
+        pair = np.asarray(frames[due:due + 2], dtype=float)
+        columns = self._columns(pair.shape[1])
+        if len(pair) > 1:
+            alpha = position - due
+            reference = (1 - alpha) * pair[0] + alpha * pair[1]
+            velocity = (pair[1, columns] - pair[0, columns]) * self.rate
+        else:
+            reference, velocity = pair[0], np.zeros(len(columns))
+        tracking_error = reference[columns] - present
+
+        # Joints lagging by lag, whose goals are advanced by advance: tracking error = velocity * (lag - advance).
+        self._error_velocity = FORGETTING * self._error_velocity + velocity * (tracking_error + velocity * self._advance)
+        self._velocity_squared = FORGETTING * self._velocity_squared + velocity ** 2
+        excited = self._velocity_squared > MIN_EXCITATION
+        self.lag[excited] = np.clip(self._error_velocity[excited] / self._velocity_squared[excited], 0.0, self.max_lag)
+
+        # Each joint is sent the trajectory lag seconds ahead.
+        indices = np.minimum(position + self.lag * self.rate, nb_frames - 1)
+        if not interpolate:
+            indices = np.floor(indices)
+        low = np.floor(indices).astype(int)
+        high = np.minimum(low + 1, nb_frames - 1)
+        first = low.min()
+        block = np.asarray(frames[first:high.max() + 1], dtype=float)
+
+        alpha = indices - low
+        goal = (1 - alpha) * block[low - first, columns] + alpha * block[high - first, columns]
+
+        self._squared_error += tracking_error ** 2
+        self._max_error = np.maximum(self._max_error, np.abs(tracking_error))
+        self._nb_frames += 1
+
+        if self.gain:
+            goal += np.clip(self.gain * tracking_error, -MAX_CORRECTION, MAX_CORRECTION)
+        self._advance = self.lag.copy()
+
+        frame = (reference if interpolate else pair[0]).copy()
+        frame[columns] = goal
+        return frame
+
+    def report(self) -> TrackingReport:
+        """Return the tracking report of the playback."""
+        nb_frames = max(self._nb_frames, 1)
+        self.last_report = TrackingReport(
+            name=self.name,
+            joints=[joint.name for joint in self.joint_map.joints],
+            lag=self.lag.copy(),
+            rms_error=np.sqrt(self._squared_error / nb_frames),
+            max_error=self._max_error.copy(),
+            nb_frames=self._nb_frames,
+        )
+        return self.last_report
@@ -0,0 +1,320 @@
+"""
+Trajectory store.
+
+The recordings of the movements folder are only loaded when a behavior asks for them, and they
+are memory-mapped read-only: every behavior instance gets a view on the same buffer, and the
+processes of the same host share the pages of the file through the OS page cache.
+The recordings which have not been used recently are evicted when the size of the mapped (and
+cached) recordings exceeds the budget (in bytes), set with the HELLO_WORLD_TRAJECTORY_BUDGET
+environment variable. This caps the mapped size, not the resident memory: a mapping stays alive as
+long as a player holds a view on it. The resident pages of an evicted mapping are given back to the
+OS (madvise), and read again from the file if a player still uses it.
+The store also caches the resampled versions of the recordings, within the same budget (these are
+in-memory copies, freed once no player holds them anymore).
+
+Behaviors play the clip of a recording, its PLAYBACK_WINDOWS part, the rest being static. When a
+preprocessed clip of the recording exists (see preprocess.py), it is played as is (memory-mapped
+too). Otherwise, when a keyframe version of the recording exists (see keyframes.py), the clip is
+decoded from it.
+When the movements folder contains a bundle (see bundle.py), it is mapped once, the first time a
+clip is asked for, and the clips it contains are views on it. The worker processes of the fleet
+mode play the bundle the supervisor placed in shared memory instead (see attach).
+"""
+import json
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .bundle import Bundle, DEFAULT_NAME as BUNDLE_NAME
+from .keyframes import EXTENSION as KEYFRAMES_EXTENSION, KeyframeTrajectory
+from .preprocess import EXTENSION as OPTIMIZED_EXTENSION, METADATA_EXTENSION
+from .quantized import QuantizedFrames
+from .recorder import DEFAULT_RATE as RECORDING_RATE, METADATA_EXTENSION as RECORDING_METADATA_EXTENSION
+from .resampling import CONTROLLER_RATE, LINEAR, resample
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = 'movements'
+BUDGET_ENV = 'HELLO_WORLD_TRAJECTORY_BUDGET'
+
+# Played (start, stop) frames of each recording.
+PLAYBACK_WINDOWS = {
+    'scratch': (50, None),
+    'traj_tshirt': (100, None),
+    'sweat_head': (300, 700),
+    'hello_move': (150, 500),
+    'hello_move_antennas': (50, 400),
+    'whistling': (40, 180),
+    'whistle_arms': (None, None),
+}
+
+_LEFT_ARM = [
+    'l_shoulder_pitch', 'l_shoulder_roll', 'l_arm_yaw', 'l_elbow_pitch', 'l_forearm_yaw', 'l_wrist_pitch', 'l_wrist_roll',
+]
+_RIGHT_ARM = [
+    'r_shoulder_pitch', 'r_shoulder_roll', 'r_arm_yaw', 'r_elbow_pitch', 'r_forearm_yaw', 'r_wrist_pitch', 'r_wrist_roll',
+]
+
+# Joints of the columns of each recording (the ones made with the recorder list them in their metadata).
+RECORDED_JOINTS = {
+    'scratch': _RIGHT_ARM + _LEFT_ARM + ['l_gripper'],
+    'traj_tshirt': _LEFT_ARM + ['l_gripper'],
+    'sweat_head': _LEFT_ARM,
+    'hello_move': _LEFT_ARM,
+    'hello_move_antennas': ['l_antenna', 'r_antenna'],
+    'whistling': ['neck_roll', 'neck_pitch', 'neck_yaw'],
+    'whistle_arms': _LEFT_ARM + _RIGHT_ARM,
+}
+
+
+def recording_metadata(name: str, directory: str = DEFAULT_DIRECTORY) -> dict:
+    """Return the metadata the recorder saved with the recording (joints, rate...), or an empty dict."""
+    path = os.path.join(directory, f'{name}{RECORDING_METADATA_EXTENSION}')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def recorded_joints(name: str, directory: str = DEFAULT_DIRECTORY) -> list:
+    """Return the joints of the columns of the recording, from RECORDED_JOINTS or from its recorder metadata."""
+    if name in RECORDED_JOINTS:
+        return RECORDED_JOINTS[name]
+    return recording_metadata(name, directory).get('joints')
+
+
+def recorded_rate(name: str, directory: str = DEFAULT_DIRECTORY) -> float:
+    """Return the rate (in frames per second) of the recording, from its recorder metadata (100 by default)."""
+    return float(recording_metadata(name, directory).get('rate', RECORDING_RATE))
+
+
+class TrajectoryStore:
+    """
+    TrajectoryStore class.
+
+    Lazily memory-maps the recordings of a folder and keeps the most recently used ones
+    within the mapped size budget.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY, budget: int = None, use_bundle: bool = True) -> None:
+        """Initialize the store for the given folder, without any budget by default."""
+        self.directory = directory
+        self.budget = budget
+        self.use_bundle = use_bundle
+
+        self._bundle = None
+
+        self._trajectories = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, name: str, extension: str = '.npy') -> str:
+        """Return the path of the recording."""
+        return os.path.join(self.directory, f'{name}{extension}')
+
+    def load(self, name: str) -> np.ndarray:
+        """Return the read-only recording, mapping it if needed."""
+        with self._lock:
+            trajectory = self._trajectories.get(name)
+            if trajectory is not None:
+                self._trajectories.move_to_end(name)
+                self.hits += 1
+                return trajectory
+
+            self.misses += 1
+            trajectory = np.load(self.path(name), mmap_mode='r')
+            self._trajectories[name] = trajectory
+            self._evict(keep=name)
+
+            return trajectory
+
+    @property
+    def bundle(self) -> Bundle:
+        """Return the bundle of the folder, mapping it the first time, or None."""
+        if self._bundle is None and self.use_bundle:
+            path = os.path.join(self.directory, BUNDLE_NAME)
+            with self._lock:
+                if self._bundle is None and os.path.exists(path):
+                    self._bundle = Bundle(path)
+                    logger.info(f'Mapped {len(self._bundle)} clips from {path}.')
+                self.use_bundle = self._bundle is not None
+        return self._bundle
+
+    def attach(self, bundle: Bundle) -> None:
+        """Play the clips of the bundle (e.g. a shared memory one) in place of the bundle of the folder, None to detach it."""
+        with self._lock:
+            self._bundle = bundle
+            self.use_bundle = bundle is not None
+        if bundle is not None:
+            logger.info(f'Attached {len(bundle)} clips from {bundle.path}.')
+
+    def clip(self, name: str):
+        """Return the played window of the recording, from the bundle, preprocessed or from its keyframes if they exist."""
+        bundle = self.bundle
+        if bundle is not None and name in bundle:
+            with self._lock:
+                self.hits += 1
+            return bundle[name]
+
+        path = self.path(name, OPTIMIZED_EXTENSION)
+        if os.path.exists(path):
+            return self._cached((name, OPTIMIZED_EXTENSION), lambda: np.load(path, mmap_mode='r'))
+
+        path = self.path(name, KEYFRAMES_EXTENSION)
+        if os.path.exists(path):
+            return self._cached((name, KEYFRAMES_EXTENSION), lambda: KeyframeTrajectory.load(path))
+
+        return self.load(name)[slice(*PLAYBACK_WINDOWS.get(name, (None, None)))]
+
+    def metadata(self, name: str) -> dict:
+        """Return the metadata of the preprocessed clip of the recording (window, joints, rate...), if any."""
+        bundle = self.bundle
+        if bundle is not None and name in bundle:
+            return bundle.metadata(name)
+
+        path = self.path(name, METADATA_EXTENSION)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def rate(self, name: str) -> float:
+        """Return the rate (in frames per second) of the clip of the recording."""
+        metadata = self.metadata(name) or {}
+        return float(metadata['rate']) if metadata.get('rate') else recorded_rate(name, self.directory)
+
+    def resampled(
+            self,
+            name: str,
+            speed: float = 1.0,
+            duration: float = None,
+            kind: str = LINEAR,
+            source_rate: float = None,
+            target_rate: float = CONTROLLER_RATE,
+            ) -> np.ndarray:
+        """Return the clip of the recording, resampled at target_rate for the given speed or duration.
+
+        The clip is sampled at source_rate, the rate of the recording by default. At normal speed and rate,
+        the clip is returned as is.
+        """
+        source_rate = source_rate or self.rate(name)
+        if duration is None and speed == 1 and source_rate == target_rate:
+            return self.clip(name)
+
+        key = (name, speed, duration, kind, source_rate, target_rate)
+        with self._lock:
+            trajectory = self._trajectories.get(key)
+            if trajectory is not None:
+                self._trajectories.move_to_end(key)
+                self.hits += 1
+                return trajectory
+
+        frames = resample(
+            self.clip(name),
+            source_rate=source_rate,
+            target_rate=target_rate,
+            speed=speed,
+            duration=duration,
+            kind=kind,
+        )
+        frames.flags.writeable = False
+
+        with self._lock:
+            self.misses += 1
+            self._trajectories[key] = frames
+            self._evict(keep=key)
+
+        return frames
+
+    def __contains__(self, name: str) -> bool:
+        """Return if the recording is currently mapped."""
+        return name in self._trajectories
+
+    @property
+    def mapped_size(self) -> int:
+        """Return the size (in bytes) of the mapped and cached recordings, resident or not."""
+        return sum(trajectory.nbytes for trajectory in self._trajectories.values())
+
+    def clear(self) -> None:
+        """Release all the recordings."""
+        with self._lock:
+            self._trajectories.clear()
+
+    def _cached(self, key, loader):
+        with self._lock:
+            trajectory = self._trajectories.get(key)
+            if trajectory is not None:
+                self._trajectories.move_to_end(key)
+                self.hits += 1
+                return trajectory
+
+            self.misses += 1
+            trajectory = loader()
+            self._trajectories[key] = trajectory
+            self._evict(keep=key)
+
+            return trajectory
+
+    def _evict(self, keep) -> None:
+        if self.budget is None:
+            return
+
+        while self.mapped_size > self.budget and len(self._trajectories) > 1:
+            name = next(iter(self._trajectories))
+            if name == keep:
+                break
+            _release(self._trajectories.pop(name))
+            self.evictions += 1
+            logger.debug(f'Evicted trajectory {name} from the store.')
+
+
+def _release(trajectory) -> None:
+    """Give the resident pages of a mapped trajectory back to the OS, they are read again from the file if needed."""
+    mapping = getattr(trajectory, '_mmap', None)
+    if mapping is not None and hasattr(mmap, 'MADV_DONTNEED'):
+        mapping.madvise(mmap.MADV_DONTNEED)
+
+
+_store = None
+
+
+def get_store() -> TrajectoryStore:
+    """Return the store shared by all the behaviors of the process."""
+    global _store
+    if _store is None:
+        budget = os.environ.get(BUDGET_ENV)
+        _store = TrajectoryStore(budget=int(budget) if budget else None)
+    return _store
+
+
+def load_trajectory(name: str) -> np.ndarray:
+    """Return the read-only recording from the shared store."""
+    return get_store().load(name)
+
+
+def load_clip(name: str):
+    """Return the played window of the recording from the shared store."""
+    return get_store().clip(name)
+
+
+def touch(trajectory) -> None:
+    """Read the trajectory so that its pages are resident (its first chunk decoded for keyframes) before it is played."""
+    if isinstance(trajectory, KeyframeTrajectory):
+        trajectory.frame(0)
+    elif isinstance(trajectory, QuantizedFrames):
+        trajectory.data.sum()
+    else:
+        np.asarray(trajectory).sum()
+
+
+def load_resampled(name: str, **kwargs) -> np.ndarray:
+    """Return the clip of the recording resampled at the controller rate, from the shared store."""
+    return get_store().resampled(name, **kwargs)
@@ -0,0 +1,100 @@
+"""
+Transition planning.
+
+The behaviors used to start with a goto to the first frame of their recording, and to end with a
+goto back to the rest pose (arms at zero, looking straight ahead) before asleep went to its own pose.
+A TransitionPlanner blends from the current goal state of the joints to the next pose in a single
+minimum jerk move, whose duration is given by the distance to cover (so that its peak velocity
+stays under max_speed), up to the duration of the goto it replaces. Close poses are reached in a
+fraction of the fixed goto duration, and a behavior played by Idle skips its own homing
+(Behavior.homing is False) as the next transition goes straight from its last pose to asleep.
+"""
+import logging
+
+import numpy as np
+
+from reachy_sdk.trajectory.interpolation import minimum_jerk
+
+from .playback import TrajectoryPlayer
+from .tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+# Peak velocity of the transitions (in degrees per second), and their shortest duration.
+MAX_SPEED = 90.0
+MIN_DURATION = 0.3
+
+# Joints further than this (in degrees) from their goal position are not tracking it (relaxed, or pushed).
+TRACKING_TOLERANCE = 5.0
+
+# Ratio between the peak and the mean velocity of a minimum jerk move.
+_MIN_JERK_PEAK = 1.875
+
+
+def start_positions(joints) -> np.ndarray:
+    """Return the positions the joints start from: their goal position, or where they are when they do not track it."""
+    positions = []
+    for joint in joints:
+        present, goal = joint.present_position, joint.goal_position
+        tracking = not joint.compliant and abs(goal - present) <= TRACKING_TOLERANCE
+        positions.append(goal if tracking else present)
+    return np.array(positions)
+
+
+def blend_duration(start, goal, max_speed: float = MAX_SPEED, min_duration: float = MIN_DURATION,
+                   max_duration: float = None) -> float:
+    """Return the duration of the minimum jerk move from start to goal, its peak velocity being at most max_speed."""
+    distance = float(np.max(np.abs(np.asarray(goal) - np.asarray(start)), initial=0.0))
+    duration = max(min_duration, _MIN_JERK_PEAK * distance / max_speed)
+    if max_duration is not None:
+        duration = min(duration, max_duration)
+    return duration
+
+
+def blend(start, goal, duration: float, sampling_frequency: float = 100) -> np.ndarray:
+    """Return the frames of the minimum jerk move from start to goal, ending exactly on goal."""
+    start = np.asarray(start, dtype=float)
+    goal = np.asarray(goal, dtype=float)
+    nb_frames = max(1, int(round(duration * sampling_frequency)))
+
+    trajectory = minimum_jerk(start, goal, duration)
+    times = np.arange(1, nb_frames + 1) / sampling_frequency
+    return np.array([trajectory(t) for t in times])
+
+
+class TransitionPlanner:
+    """
+    TransitionPlanner class.
+
+    Plans and plays the minimum jerk transitions of a fixed list of joints.
+    """
+
+    def __init__(
+            self,
+            joints,
+            sampling_frequency: float = 100,
+            max_speed: float = MAX_SPEED,
+            min_duration: float = MIN_DURATION,
+            name: str = '',
+            ) -> None:
+        """Initialize the planner of the joints."""
+        self.joints = list(joints)
+        self.sampling_frequency = sampling_frequency
+        self.max_speed = max_speed
+        self.min_duration = min_duration
+        self.name = name
+
+        self.player = TrajectoryPlayer(self.joints, sampling_frequency, name=f'{name}_transition')
+
+    def plan(self, goal, max_duration: float = None) -> np.ndarray:
+        """Return the frames of the transition from the current goal state to the goal positions (in joints order)."""
+        start = start_positions(self.joints)
+        duration = blend_duration(start, goal, self.max_speed, self.min_duration, max_duration)
+        return blend(start, goal, duration, self.sampling_frequency)
+
+    async def play(self, goal, max_duration: float = None):
+        """Plan and play the transition to the goal positions, returning the playback report."""
+        frames = self.plan(goal, max_duration)
+        with span('transition', 'trajectory', behavior=self.name, duration=len(frames) / self.sampling_frequency):
+            return await self.player.play(frames)
@@ -0,0 +1,217 @@
+"""
+Behavior benchmark.
+
+Plays each behavior against an in-process FakeReachy, which timestamps every goal position sent
+to its joints, and reports for each behavior:
+    - the number of frames sent (goal positions sent together) and the achieved frame rate,
+    - the jitter of the interval between frames (deviation from the median interval, percentiles),
+    - the total duration, and the duration of the recorded trajectories played vs their nominal one,
+    - the CPU time of the thread playing the behavior (the fake robot is stopped after each run).
+
+To benchmark all the behaviors, or only some of them:
+    python3 -m hello_world.benchmark
+    python3 -m hello_world.benchmark sneeze hello --repeat 3
+
+The results can be saved with --output, and compared with saved results with --baseline to spot
+the regressions.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .behaviors import tracing
+from .behaviors.audio import SINK_ENV, get_engine
+from .behaviors.gaze import GazeCache
+from .behaviors.ik_cache import CACHE_ENV as IK_CACHE_ENV
+from .behaviors.playback import TrajectoryPlayer
+from .behaviors.registry import BehaviorRegistry, available_behaviors
+from .fake_reachy import DEFAULT_KINEMATICS_LATENCY, FakeReachy
+
+
+logger = logging.getLogger(__name__)
+
+# Goal positions sent less than FRAME_GAP apart belong to the same frame.
+FRAME_GAP = 0.002
+# Frames sent more than STREAM_GAP apart belong to different motions.
+STREAM_GAP = 0.1
+# Relative change from the baseline reported as a regression.
+DEFAULT_TOLERANCE = 0.1
+
+
+class BenchmarkResult:
+    """Measures of one run of a behavior."""
+
+    def __init__(
+            self,
+            name: str,
+            duration: float,
+            cpu_time: float,
+            goal_writes: int,
+            frame_times,
+            playback_duration: float = 0.0,
+            playback_nominal_duration: float = 0.0,
+            ) -> None:
+        """Compute the frame statistics from the start times of the frames."""
+        self.name = name
+        self.duration = duration
+        self.cpu_time = cpu_time
+        self.goal_writes = goal_writes
+        self.nb_frames = len(frame_times)
+        self.playback_duration = playback_duration
+        self.playback_nominal_duration = playback_nominal_duration
+
+        intervals = np.diff(frame_times)
+        intervals = intervals[intervals < STREAM_GAP]
+        if len(intervals):
+            self.frame_rate = 1.0 / intervals.mean()
+            jitter = np.abs(intervals - np.median(intervals))
+            self.jitter_p50, self.jitter_p95, self.jitter_p99 = np.percentile(jitter, [50, 95, 99])
+        else:
+            self.frame_rate = 0.0
+            self.jitter_p50 = self.jitter_p95 = self.jitter_p99 = 0.0
+
+    def as_dict(self) -> dict:
+        """Return the measures as a JSON serializable dict."""
+        return {key: float(value) if isinstance(value, np.floating) else value for key, value in vars(self).items()}
+
+    def __repr__(self) -> str:
+        """Summarize the measures."""
+        return (
+            f'{self.name:>12}: {self.duration:7.2f}s, cpu {self.cpu_time:6.2f}s, '
+            f'{self.nb_frames:5d} frames ({self.goal_writes} goal writes) at {self.frame_rate:6.1f}Hz, '
+            f'jitter p50/p95/p99 {1000 * self.jitter_p50:.2f}/{1000 * self.jitter_p95:.2f}/{1000 * self.jitter_p99:.2f}ms, '
+            f'playback {self.playback_duration:.2f}s (nominal {self.playback_nominal_duration:.2f}s)'
+        )
+
+
+def frame_times(writes: dict) -> np.ndarray:
+    """Return the start time of each frame, from the timestamped goal positions of the joints."""
+    timestamps = np.sort([t for joint_writes in writes.values() for t, _ in joint_writes])
+    if len(timestamps) == 0:
+        return timestamps
+    starts = np.concatenate(([True], np.diff(timestamps) > FRAME_GAP))
+    return timestamps[starts]
+
+
+async def _play(behavior) -> None:
+    await behavior._run()
+
+
+def run_behavior(name: str, kinematics_latency: float = DEFAULT_KINEMATICS_LATENCY) -> BenchmarkResult:
+    """Play the behavior once on a new fake robot and return its measures."""
+    reachy = FakeReachy(host=f'fake_{name}', kinematics_latency=kinematics_latency)
+    for joint in reachy.joints.values():
+        joint.torque_limit = 100
+    reachy.turn_on('reachy')
+
+    behaviors = BehaviorRegistry(reachy)
+    behavior = behaviors[name]
+    GazeCache.for_robot(reachy).warm(behaviors.gaze_targets([name]), background=False)
+
+    reachy.clear_writes()
+    # CPU time of the thread playing the behavior only, not of the fake robot's synchronisation thread.
+    cpu = time.thread_time()
+    tic = time.monotonic()
+    try:
+        asyncio.run(_play(behavior))
+    finally:
+        duration = time.monotonic() - tic
+        cpu = time.thread_time() - cpu
+        reachy.close()
+
+    writes = reachy.writes()
+    reports = [
+        player.last_report for player in vars(behavior).values()
+        if isinstance(player, TrajectoryPlayer) and player.last_report is not None
+    ]
+
+    return BenchmarkResult(
+        name=name,
+        duration=duration,
+        cpu_time=cpu,
+        goal_writes=sum(len(joint_writes) for joint_writes in writes.values()),
+        frame_times=frame_times(writes),
+        playback_duration=sum(report.duration for report in reports),
+        playback_nominal_duration=sum(report.nominal_duration for report in reports),
+    )
+
+
+def compare(results: list, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Return the regressions of the results compared to the baseline ones."""
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if reference is None:
+            continue
+        for key, worse in (('duration', 1), ('cpu_time', 1), ('jitter_p95', 1), ('frame_rate', -1)):
+            value, expected = getattr(result, key), reference[key]
+            if expected > 0 and worse * (value - expected) > tolerance * expected:
+                regressions.append(f'{result.name} {key}: {value:.4f} (baseline {expected:.4f})')
+    return regressions
+
+
+def main():
+    """Benchmark the behaviors and print their measures."""
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('names', nargs='*', help='Behaviors to benchmark, all of them by default.')
+    parser.add_argument('--repeat', help='Number of runs of each behavior.', type=int, default=1)
+    parser.add_argument(
+        '--kinematics_latency',
+        help='Time taken by the fake robot to solve a kinematics request (in seconds).',
+        type=float,
+        default=DEFAULT_KINEMATICS_LATENCY,
+    )
+    parser.add_argument('--output', help='Save the results (JSON) to this file.')
+    parser.add_argument('--baseline', help='Compare the results with the ones saved in this file.')
+    parser.add_argument('--tolerance', help='Relative change reported as a regression.', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--trace', help='Record a Chrome trace (JSON) of the runs in this file.')
+    args = parser.parse_args()
+
+    if args.trace:
+        tracing.enable(args.trace)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    # No sound is played and the solved kinematics are not saved with the ones of the robot.
+    os.environ.setdefault(SINK_ENV, 'null')
+    os.environ.setdefault(IK_CACHE_ENV, os.path.join(tempfile.mkdtemp(), 'ik_cache.npz'))
+    # The sounds are decoded once before the runs, as Idle does at startup.
+    get_engine().start()
+
+    results = []
+    for name in args.names or available_behaviors():
+        for _ in range(args.repeat):
+            result = run_behavior(name, kinematics_latency=args.kinematics_latency)
+            results.append(result)
+            print(result)
+    tracing.disable()
+
+    # With several runs, the run of median duration is kept.
+    runs = {}
+    for result in results:
+        runs.setdefault(result.name, []).append(result)
+    results = [sorted(named, key=lambda r: r.duration)[len(named) // 2] for named in runs.values()]
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({result.name: result.as_dict() for result in results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'Regression: {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
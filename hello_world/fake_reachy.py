@@ -0,0 +1,245 @@
+"""
+In-process stand-in for ReachySDK.
+
+FakeReachy exposes the same joints, parts and methods as ReachySDK, built on the SDK's own Joint
+class and synchronised by the same kind of background loop, but without any robot: the commands
+are applied at once (the present position of a joint becomes its goal position) and the
+kinematics are simple approximations. Every goal position sent to a joint is timestamped, so that
+the behaviors can be played and measured without a physical Reachy.
+With motor_lag (in seconds), the joints follow their goal positions as first order systems of that
+time constant instead, like motors lagging behind fast trajectories.
+
+    reachy = FakeReachy()
+    ...
+    reachy.writes()  # {joint name: [(monotonic time, goal position), ...]}
+    reachy.close()  # stops the synchronisation thread
+"""
+import asyncio
+import threading
+import time
+
+import grpc
+import numpy as np
+
+from google.protobuf.wrappers_pb2 import BoolValue, FloatValue, UInt32Value
+
+from reachy_sdk import ReachySDK
+from reachy_sdk.arm import LeftArm, RightArm
+from reachy_sdk.device_holder import DeviceHolder
+from reachy_sdk.head import Head
+from reachy_sdk.joint import Joint
+from reachy_sdk_api.joint_pb2 import JointState
+
+
+JOINT_NAMES = RightArm._required_joints + LeftArm._required_joints + Head._required_joints
+
+# Time taken by the robot to solve a kinematics request (in seconds).
+DEFAULT_KINEMATICS_LATENCY = 0.005
+
+
+class _SyncRequests(list):
+    """Registers of a joint needing synchronisation, timestamping the goal positions."""
+
+    def __init__(self, joint: 'FakeJoint') -> None:
+        super().__init__()
+        self.joint = joint
+
+    def append(self, field: str) -> None:
+        if field == 'goal_position':
+            self.joint.goal_writes.append((time.monotonic(), self.joint.goal_position))
+        super().append(field)
+
+
+class FakeJoint(Joint):
+    """SDK joint whose goal positions are timestamped."""
+
+    def __init__(self, name: str, uid: int) -> None:
+        """Initialize the joint, compliant at its zero position."""
+        super().__init__(JointState(
+            name=name,
+            uid=UInt32Value(value=uid),
+            present_position=FloatValue(value=0.0),
+            present_speed=FloatValue(value=0.0),
+            present_load=FloatValue(value=0.0),
+            temperature=FloatValue(value=30.0),
+            compliant=BoolValue(value=True),
+            goal_position=FloatValue(value=0.0),
+            speed_limit=FloatValue(value=0.0),
+            torque_limit=FloatValue(value=100.0),
+        ))
+        self.goal_writes = []
+
+    def _setup_sync_loop(self):
+        super()._setup_sync_loop()
+        self._register_needing_sync = _SyncRequests(self)
+
+
+class _FakeKinematics:
+    """Approximated kinematics, answered after a fixed latency."""
+
+    kinematics_latency = DEFAULT_KINEMATICS_LATENCY
+
+    def _wait(self) -> None:
+        if self.kinematics_latency > 0:
+            time.sleep(self.kinematics_latency)
+
+
+class _FakeArm(_FakeKinematics):
+    def forward_kinematics(self, joints_position=None) -> np.ndarray:
+        self._wait()
+        if joints_position is None:
+            joints_position = [j.present_position for j in self.kinematics_chain.values()]
+
+        pose = np.eye(4)
+        pose[:3, 3] = [0.3, -0.2 if self._side == 'right' else 0.2, -0.1]
+        pose[:3, 3] += 1e-3 * np.asarray(joints_position[:3])
+        return pose
+
+    def inverse_kinematics(self, target: np.ndarray, q0=None) -> list:
+        self._wait()
+        if q0 is None:
+            q0 = [j.present_position for j in self.kinematics_chain.values()]
+        return [float(q) for q in q0]
+
+
+class FakeRightArm(_FakeArm, RightArm):
+    """Right arm of the fake robot."""
+
+
+class FakeLeftArm(_FakeArm, LeftArm):
+    """Left arm of the fake robot."""
+
+
+class FakeHead(_FakeKinematics, Head):
+    """Head of the fake robot."""
+
+    def forward_kinematics(self, joints_position=None):
+        """Return the identity quaternion."""
+        self._wait()
+        return (0.0, 0.0, 0.0, 1.0)
+
+    def inverse_kinematics(self, target, q0=None) -> list:
+        """Return the (roll, pitch, yaw) angles of the quaternion, in degrees."""
+        self._wait()
+        x, y, z, w = target
+        roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+        pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1, 1))
+        yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+        return [float(a) for a in np.rad2deg([roll, pitch, yaw])]
+
+
+class FakeReachy(ReachySDK):
+    """
+    FakeReachy class.
+
+    ReachySDK without robot, see the module documentation.
+    """
+
+    def __init__(
+            self,
+            host: str = 'fake',
+            command_frequency: float = 100,
+            kinematics_latency: float = DEFAULT_KINEMATICS_LATENCY,
+            motor_lag: float = 0.0,
+            ) -> None:
+        """Set up the joints and start their synchronisation loop."""
+        self._host = host
+        self.command_frequency = command_frequency
+        self.motor_lag = motor_lag
+        self._targets = {}
+        self.commands_sent = 0
+
+        # The kinematics stubs are created by the SDK parts but never used, no connection is made.
+        self._grpc_channel = grpc.insecure_channel(f'{host}:0')
+
+        self._joints = [FakeJoint(name, uid) for uid, name in enumerate(JOINT_NAMES)]
+        self._fans = []
+        self._force_sensors = []
+
+        self.r_arm = FakeRightArm(self._joints, self._grpc_channel)
+        self.l_arm = FakeLeftArm(self._joints, self._grpc_channel)
+        self.head = FakeHead(self._joints, self._grpc_channel)
+        for part in (self.r_arm, self.l_arm, self.head):
+            part.kinematics_latency = kinematics_latency
+
+        self.fans = DeviceHolder(self._fans)
+        self.force_sensors = DeviceHolder(self._force_sensors)
+        self.joints = DeviceHolder(self._joints)
+
+        self._ready = threading.Event()
+        self._pushed_command = threading.Event()
+
+        self._sync_thread = threading.Thread(target=self._start_sync_in_bg, name=f'{host}_sync', daemon=True)
+        self._sync_thread.start()
+        self._ready.wait()
+
+    def writes(self) -> dict:
+        """Return the timestamped goal positions sent to each joint."""
+        return {joint.name: list(joint.goal_writes) for joint in self._joints}
+
+    def clear_writes(self) -> None:
+        """Forget the goal positions sent so far."""
+        for joint in self._joints:
+            joint.goal_writes.clear()
+
+    def close(self) -> None:
+        """Stop the synchronisation loop and wait for its thread to end."""
+        # The loop may be waiting for a command: it is cancelled rather than asked to stop.
+        self._sync_event_loop.call_soon_threadsafe(self._sync_task.cancel)
+        self._sync_thread.join()
+
+    def _start_sync_in_bg(self):
+        loop = asyncio.new_event_loop()
+        self._sync_event_loop = loop
+        self._sync_task = loop.create_task(self._sync_loop())
+        try:
+            loop.run_until_complete(self._sync_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            # The waits on the joints left pending by the last poll of the commands.
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    async def _sync_loop(self):
+        for joint in self._joints:
+            joint._setup_sync_loop()
+
+        self._ready.set()
+
+        dt = 1.0 / self.command_frequency
+        last = time.monotonic()
+        while True:
+            commands = await self._poll_waiting_commands()
+            self._apply(commands)
+            now = time.monotonic()
+            self._follow(now - last)
+            last = now
+            self.commands_sent += 1
+            self._pushed_command.set()
+            self._pushed_command.clear()
+            await asyncio.sleep(dt)
+
+    def _apply(self, commands) -> None:
+        """Move the joints to their goal positions, as a perfectly stiff robot would (or set them as targets with motor_lag)."""
+        for command in commands.commands:
+            if command.HasField('goal_position'):
+                joint = self._joints[command.id.uid]
+                if self.motor_lag > 0:
+                    self._targets[command.id.uid] = command.goal_position.value
+                    continue
+                joint._state['present_position'] = FloatValue(value=command.goal_position.value)
+
+    def _follow(self, dt: float) -> None:
+        """Move the joints towards their targets for dt seconds, as first order systems of time constant motor_lag."""
+        if not self._targets:
+            return
+        alpha = 1.0 - np.exp(-dt / self.motor_lag)
+        for uid, target in self._targets.items():
+            joint = self._joints[uid]
+            present = joint._state['present_position'].value
+            joint._state['present_position'] = FloatValue(value=present + alpha * (target - present))
@@ -0,0 +1,174 @@
+"""
+Fleet mode.
+
+Runs the Idle mode on several robots from one process: one ReachySDK (and one Idle) per robot,
+all on the same asyncio event loop, the read-only trajectories being shared by all of them (see
+behaviors/trajectories.py). The behaviors never block the event loop for long, so that the robots
+do not slow each other down.
+
+Each robot is driven by a RobotRunner, which isolates its failures: when its Idle fails (or the
+robot cannot be reached), the error is logged and the robot is reconnected and restarted after a
+backoff delay, while the other robots keep on playing.
+
+Hosts starting with 'fake' are FakeReachy robots (see fake_reachy.py), to try the fleet mode
+without any robot:
+    python3 -m hello_world.hello --hosts fake1 fake2 fake3
+"""
+import asyncio
+import contextlib
+import logging
+import time
+
+from reachy_sdk import ReachySDK
+
+from .behaviors import metrics
+from .behaviors.idle import Idle
+from .fake_reachy import FakeReachy
+
+
+logger = logging.getLogger(__name__)
+
+_failures = metrics.counter('robot_failures', 'Failures of the Idle mode of the robots, by host.')
+
+FAKE_PREFIX = 'fake'
+
+# Delay (in seconds) before restarting a failed robot, doubled at each consecutive failure.
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 60.0
+
+CONNECTING = 'connecting'
+RUNNING = 'running'
+FAILED = 'failed'
+STOPPED = 'stopped'
+
+
+def connect(host: str):
+    """Return the SDK of the robot, a FakeReachy for the hosts starting with 'fake'."""
+    if host.startswith(FAKE_PREFIX):
+        return FakeReachy(host=host)
+    return ReachySDK(host=host)
+
+
+def disconnect(reachy) -> None:
+    """Release the connection to the robot, which may already be lost."""
+    with contextlib.suppress(Exception):
+        if isinstance(reachy, FakeReachy):
+            reachy.close()
+        else:
+            # ReachySDK has no close method: its streams end with its channel.
+            reachy._grpc_channel.close()
+
+
+class RobotRunner:
+    """
+    RobotRunner class.
+
+    Runs the Idle mode on one robot, restarting it when it fails.
+    """
+
+    def __init__(self, host: str, seed: int = None, blend_transitions: bool = True) -> None:
+        """Initialize the runner of the robot."""
+        self.host = host
+        self.seed = seed
+        self.blend_transitions = blend_transitions
+
+        self.reachy = None
+        self.idle = None
+        self.status = STOPPED
+        self.failures = 0
+        self.last_error = None
+        self.started_at = None
+
+    async def run(self) -> None:
+        """Run the Idle mode until cancelled, restarting it after each failure."""
+        delay = RESTART_DELAY
+        while True:
+            task = None
+            try:
+                if self.reachy is None:
+                    self.status = CONNECTING
+                    # Connecting blocks until the robot answers.
+                    self.reachy = await asyncio.get_running_loop().run_in_executor(None, connect, self.host)
+                    for joint in self.reachy.joints.values():
+                        joint.torque_limit = 100
+
+                self.idle = Idle(name='idle', reachy=self.reachy, seed=self.seed, blend_transitions=self.blend_transitions)
+                self.status = RUNNING
+                self.started_at = time.monotonic()
+                logger.info(f'{self.host}: running the Idle mode.')
+
+                task = await self.idle.start()
+                await task
+                self.status = STOPPED
+                return
+
+            except asyncio.CancelledError:
+                # The cancellation reaches the Idle task, whose teardown turns the robot off.
+                if task is not None:
+                    await asyncio.gather(task, return_exceptions=True)
+                self.status = STOPPED
+                raise
+
+            except Exception as e:
+                self.status = FAILED
+                self.failures += 1
+                self.last_error = repr(e)
+                _failures.inc(host=self.host)
+                logger.exception(f'{self.host}: Idle mode failed, reconnecting in {delay:.0f}s.')
+
+                # The connection may be the one which failed: the next attempt opens a new one and sets the robot up again.
+                if self.reachy is not None:
+                    reachy, self.reachy = self.reachy, None
+                    await asyncio.get_running_loop().run_in_executor(None, disconnect, reachy)
+
+                # A robot which ran for a while before failing starts over with the shortest delay.
+                if self.started_at is not None and time.monotonic() - self.started_at > MAX_RESTART_DELAY:
+                    delay = RESTART_DELAY
+                await asyncio.sleep(delay)
+                delay = min(2 * delay, MAX_RESTART_DELAY)
+
+    def summary(self) -> dict:
+        """Return the status of the robot."""
+        return {
+            'host': self.host,
+            'status': self.status,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'uptime': time.monotonic() - self.started_at if self.status == RUNNING else 0.0,
+        }
+
+
+class Fleet:
+    """
+    Fleet class.
+
+    Runs one RobotRunner per host on the current event loop.
+    """
+
+    def __init__(self, hosts, seed: int = None, blend_transitions: bool = True, status_period: float = 60.0) -> None:
+        """Initialize the runners of the robots, each one with its own seed derived from seed."""
+        self.runners = [
+            RobotRunner(host, seed=None if seed is None else seed + i, blend_transitions=blend_transitions)
+            for i, host in enumerate(hosts)
+        ]
+        self.status_period = status_period
+
+    def summary(self) -> list:
+        """Return the status of each robot."""
+        return [runner.summary() for runner in self.runners]
+
+    async def run(self) -> None:
+        """Run all the robots until cancelled, logging their status periodically."""
+        tasks = [asyncio.create_task(runner.run(), name=f'robot_{runner.host}') for runner in self.runners]
+        try:
+            while not all(task.done() for task in tasks):
+                await asyncio.wait(tasks, timeout=self.status_period)
+                for status in self.summary():
+                    logger.info(
+                        f'{status["host"]}: {status["status"]}, {status["failures"]} failures'
+                        + (f', last error {status["last_error"]}' if status['last_error'] else '')
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
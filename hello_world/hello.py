@@ -2,6 +2,16 @@
 Helloworld application for Reachy2021.
 
 This package defines an idle mode for Reachy, in which defined behaviors can be played randomly.
+
+ Args:
+    - --ip_address: ip_address of the robot. Default is 'localhost'.
+    - --hosts: fleet mode, runs the Idle mode on each of these robots from this process (see fleet.py).
+    - --workers: shards the robots of the fleet across this number of worker processes (see workers.py).
+    - --metrics_port: serve the runtime metrics on http://127.0.0.1:<port>/metrics (and /metrics.json).
+    - --metrics_file: periodically write the runtime metrics to this file (JSON if it ends with .json).
+    - --homing: let the behaviors return to their rest pose before asleep, instead of blending into it.
+    - --seed: seed of the random choice of the behaviors, to replay the same sequence.
+    - --trace: record a Chrome trace of the behaviors in this file (or set HELLO_WORLD_TRACE).
 """
 
 import asyncio
@@ -9,7 +19,11 @@ import logging
 
 from reachy_sdk import ReachySDK
 
+from .behaviors import tracing
 from .behaviors.idle import Idle
+from .behaviors.metrics import MetricsFile, MetricsServer, monitor_loop_lag
+from .fleet import Fleet
+from .workers import WorkerPool
 
 
 logging.basicConfig(level=logging.INFO)
@@ -18,23 +32,76 @@ logger = logging.getLogger()
 REACHY_IP = 'localhost'
 
 
-if __name__ == '__main__':
-    reachy = ReachySDK(host=REACHY_IP)
-    logger.info('Connected to Reachy')
+def main():
+    """Run the Idle mode on Reachy."""
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ip_address', help="Reachy's ip address, default is 'localhost'.", default=REACHY_IP)
+    parser.add_argument('--hosts', help="Ip addresses of the robots of the fleet ('fake...' for fake robots).", nargs='+')
+    parser.add_argument('--workers', help='Number of worker processes running the robots of the fleet.', type=int)
+    parser.add_argument('--metrics_port', help='Serve the runtime metrics on this local port.', type=int)
+    parser.add_argument('--metrics_file', help='Periodically write the runtime metrics to this file.')
+    parser.add_argument('--metrics_period', help='Period (in seconds) of the metrics file writes.', type=float, default=5.0)
+    parser.add_argument('--trace', help='Record a Chrome trace (JSON) of the behaviors in this file.')
+    parser.add_argument('--seed', help='Seed of the random choice of the behaviors.', type=int)
+    parser.add_argument('--homing', help='Let the behaviors return to their rest pose before asleep.', action='store_true')
+    args = parser.parse_args()
+    if args.workers and not args.hosts:
+        parser.error('--workers needs the robots of the fleet (--hosts).')
+
+    if args.trace:
+        tracing.enable(args.trace)
+    else:
+        tracing.enable_from_env()
+
+    if args.workers:
+        pool = WorkerPool(args.hosts, args.workers, seed=args.seed, blend_transitions=not args.homing)
+        run = pool.run
+    elif args.hosts:
+        fleet = Fleet(args.hosts, seed=args.seed, blend_transitions=not args.homing)
+        run = fleet.run
+    else:
+        reachy = ReachySDK(host=args.ip_address)
+        logger.info('Connected to Reachy')
+
+        # Make sure that the torque are correctly set at 100, in case
+        # the previous turn_off_smoothly did not finish properly
+        for joint in reachy.joints.values():
+            joint.torque_limit = 100
 
-    # Make sure that the torque are correctly set at 100, in case
-    # the previous turn_off_smoothly did not finish properly
-    for joint in reachy.joints.values():
-        joint.torque_limit = 100
+        idle = Idle(name='idle', reachy=reachy, seed=args.seed, blend_transitions=not args.homing)
 
-    idle = Idle(name='idle', reachy=reachy)
+        async def run():
+            idle_behav = await idle.start()
+            await idle_behav
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(args.metrics_port)
+        metrics_server.start()
 
     async def behavior():
         """Need to define async function to run the behaviors asynchronously in main."""
-        idle_behav = await idle.start()
-        await idle_behav
+        monitors = [asyncio.create_task(monitor_loop_lag())]
+        if args.metrics_file:
+            monitors.append(asyncio.create_task(MetricsFile(args.metrics_file, args.metrics_period).run()))
+
+        try:
+            await run()
+        finally:
+            for monitor in monitors:
+                monitor.cancel()
+            await asyncio.gather(*monitors, return_exceptions=True)
 
     try:
         asyncio.run(behavior())
     except KeyboardInterrupt:
         logger.info('Ctrl-C received, turning off the application...')
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        tracing.disable()
+
+
+if __name__ == '__main__':
+    main()
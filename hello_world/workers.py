@@ -0,0 +1,257 @@
+"""
+Worker processes.
+
+A single event loop cannot stream the goal positions of many robots at 100 Hz, so the fleet mode
+(see fleet.py) can shard the robots across worker processes: each worker runs the Fleet of its
+share of the robots on its own event loop, on its own core.
+
+The movements are placed once in a shared memory block by the supervisor, in the bundle layout
+(see behaviors/bundle.py). Each worker attaches to it, and its trajectory store plays zero-copy
+views on the block instead of loading the movements folder again.
+
+The supervisor (WorkerPool) restarts the workers which exit unexpectedly, after a delay doubled at
+each consecutive crash, and aggregates the status of the robots the workers report periodically.
+On Ctrl-C, it asks the workers to stop, so that their robots are turned off properly:
+    python3 -m hello_world.hello --hosts 10.0.0.11 10.0.0.12 10.0.0.13 10.0.0.14 --workers 2
+"""
+import asyncio
+import contextlib
+import gc
+import logging
+import multiprocessing
+import queue
+import signal
+import time
+
+from .behaviors import metrics
+from .behaviors.bundle import Bundle, collect
+from .behaviors.trajectories import PLAYBACK_WINDOWS, get_store
+from .fleet import MAX_RESTART_DELAY, RESTART_DELAY, Fleet
+
+
+logger = logging.getLogger(__name__)
+
+_restarts = metrics.counter('worker_restarts', 'Restarts of the crashed worker processes, by worker.')
+
+# Period (in seconds) at which the supervisor checks the workers, and the workers check if they should stop.
+POLL_PERIOD = 0.5
+# Period (in seconds) at which the workers report the status of their robots.
+REPORT_PERIOD = 5.0
+# Time (in seconds) left to the workers to turn their robots off before they are terminated.
+SHUTDOWN_TIMEOUT = 20.0
+
+
+def shard(hosts, workers: int) -> list:
+    """Split the hosts in (at most) workers contiguous shards, return the (index of the first host, hosts) of each."""
+    hosts = list(hosts)
+    workers = max(1, min(workers, len(hosts)))
+    size, extra = divmod(len(hosts), workers)
+
+    shards, start = [], 0
+    for i in range(workers):
+        stop = start + size + (i < extra)
+        shards.append((start, hosts[start:stop]))
+        start = stop
+    return shards
+
+
+def share_movements():
+    """Place the clips the behaviors play in a new shared memory block, return the block.
+
+    The clips of the bundle of the movements folder are shared as they are (quantized or not).
+    """
+    bundle = get_store().bundle
+    if bundle is not None:
+        clips = {name: bundle[name] for name in bundle}
+        metadata = {name: bundle.metadata(name) for name in bundle}
+    else:
+        clips, metadata = collect(list(PLAYBACK_WINDOWS))
+
+    memory = Bundle.share(clips, metadata)
+    logger.info(f'Shared {len(clips)} clips ({memory.size} bytes) in {memory.name}.')
+    return memory
+
+
+def _work(index: int, hosts, seed, blend_transitions: bool, memory_name: str, statuses, stop, status_period: float):
+    """Run the Fleet of the hosts in the worker process, until the supervisor stops it."""
+    # Ctrl-C reaches the whole process group: the supervisor handles it, and stops the workers.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+
+    bundle = Bundle.attach(memory_name)
+    get_store().attach(bundle)
+    try:
+        fleet = Fleet(hosts, seed=seed, blend_transitions=blend_transitions, status_period=None)
+        asyncio.run(_serve(index, fleet, statuses, stop, status_period))
+    finally:
+        # The robots (and their behaviors) are released before the block is unmapped.
+        fleet = None
+        get_store().attach(None)
+        gc.collect()
+        # A clip still referenced somewhere keeps the block mapped until the process exits.
+        with contextlib.suppress(BufferError):
+            bundle.close()
+
+
+async def _serve(index: int, fleet: Fleet, statuses, stop, status_period: float) -> None:
+    """Run the fleet and report its status, until it ends or stop is set."""
+    task = asyncio.create_task(fleet.run())
+    reported_at = time.monotonic()
+    try:
+        while not task.done() and not stop.is_set():
+            await asyncio.wait([task], timeout=POLL_PERIOD)
+            if time.monotonic() - reported_at >= status_period:
+                statuses.put((index, fleet.summary()))
+                reported_at = time.monotonic()
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        statuses.put((index, fleet.summary()))
+
+
+class WorkerPool:
+    """
+    WorkerPool class.
+
+    Supervises the worker processes running the robots of the fleet.
+    """
+
+    def __init__(
+            self,
+            hosts,
+            workers: int,
+            seed: int = None,
+            blend_transitions: bool = True,
+            status_period: float = 60.0,
+            ) -> None:
+        """Initialize the pool, the hosts being split between the workers, each robot getting the seed of the fleet mode."""
+        self.shards = shard(hosts, workers)
+        self.seed = seed
+        self.blend_transitions = blend_transitions
+        self.status_period = status_period
+
+        # The workers do not inherit the event loop (nor the threads) of the supervisor.
+        self._context = multiprocessing.get_context('spawn')
+        self._statuses = self._context.Queue()
+        self._stop = self._context.Event()
+        self._memory = None
+
+        self.processes = [None] * len(self.shards)
+        self.started_at = [None] * len(self.shards)
+        self.crashes = [0] * len(self.shards)
+        self.restarts = [0] * len(self.shards)
+        self.robots = [[] for _ in self.shards]
+
+    def _start(self, index: int) -> None:
+        first, hosts = self.shards[index]
+        process = self._context.Process(
+            target=_work,
+            args=(
+                index, hosts, None if self.seed is None else self.seed + first, self.blend_transitions,
+                self._memory.name, self._statuses, self._stop, min(self.status_period, REPORT_PERIOD),
+            ),
+            name=f'hello_world_worker_{index}',
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        logger.info(f'Worker {index} (pid {process.pid}): {", ".join(hosts)}.')
+
+    def _collect(self) -> None:
+        """Gather the status reported by the workers."""
+        while True:
+            try:
+                index, robots = self._statuses.get_nowait()
+            except queue.Empty:
+                return
+            self.robots[index] = robots
+
+    def summary(self) -> list:
+        """Return the status of each worker and of its robots."""
+        return [
+            {
+                'worker': index,
+                'pid': process.pid if process is not None else None,
+                'alive': process is not None and process.is_alive(),
+                'restarts': self.restarts[index],
+                'robots': self.robots[index],
+            }
+            for index, process in enumerate(self.processes)
+        ]
+
+    def _log_status(self) -> None:
+        for worker in self.summary():
+            logger.info(
+                f'Worker {worker["worker"]} (pid {worker["pid"]}): {"alive" if worker["alive"] else "dead"}, '
+                f'{worker["restarts"]} restarts'
+            )
+            for status in worker['robots']:
+                logger.info(
+                    f'    {status["host"]}: {status["status"]}, {status["failures"]} failures'
+                    + (f', last error {status["last_error"]}' if status['last_error'] else '')
+                )
+
+    async def run(self) -> None:
+        """Run the workers until cancelled (or until all their robots are done), restarting the crashed ones."""
+        self._memory = share_movements()
+        try:
+            for index in range(len(self.shards)):
+                self._start(index)
+
+            restart_at = {}
+            logged_at = time.monotonic()
+            while True:
+                await asyncio.sleep(POLL_PERIOD)
+                self._collect()
+                now = time.monotonic()
+
+                finished = 0
+                for index, process in enumerate(self.processes):
+                    if index in restart_at:
+                        if now >= restart_at[index]:
+                            del restart_at[index]
+                            self.restarts[index] += 1
+                            _restarts.inc(worker=index)
+                            self._start(index)
+                    elif process.exitcode == 0:
+                        finished += 1
+                    elif process.exitcode is not None:
+                        # A worker which ran for a while before crashing starts over with the shortest delay.
+                        if now - self.started_at[index] > MAX_RESTART_DELAY:
+                            self.crashes[index] = 0
+                        delay = min(RESTART_DELAY * 2 ** self.crashes[index], MAX_RESTART_DELAY)
+                        self.crashes[index] += 1
+                        restart_at[index] = now + delay
+                        logger.error(f'Worker {index} exited with code {process.exitcode}, restarting in {delay:.0f}s.')
+
+                if finished == len(self.processes):
+                    return
+
+                if now - logged_at >= self.status_period:
+                    self._log_status()
+                    logged_at = now
+
+        finally:
+            await self._shutdown()
+
+    async def _shutdown(self) -> None:
+        """Ask the workers to stop, terminate those which do not in time, and release the shared movements."""
+        self._stop.set()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        # The statuses are drained while waiting: a worker exits only once its queued statuses are flushed.
+        while any(p is not None and p.is_alive() for p in self.processes) and time.monotonic() < deadline:
+            self._collect()
+            await asyncio.sleep(0.1)
+        self._collect()
+
+        for index, process in enumerate(self.processes):
+            if process is not None and process.is_alive():
+                logger.warning(f'Worker {index} did not stop in time, terminating it.')
+                process.terminate()
+                process.join()
+
+        self._log_status()
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
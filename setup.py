@@ -22,8 +22,15 @@ setup(
     packages=find_packages(exclude=['tests']),
     python_requires='>=3.5',
     install_requires=[
-        'reachy-sdk',
+        # The batched goal positions rely on the joint internals of this version (see behaviors/frames.py).
+        'reachy-sdk==0.7.*',
         'numpy',
-        'playsound',
+        # Plays the pre-decoded sounds without blocking.
+        'simpleaudio',
     ],
+    extras_require={
+        # Decodes other sound formats than PCM WAV.
+        'audio': ['pydub'],
+        'test': ['pytest'],
+    },
 )
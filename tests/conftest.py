@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from hello_world.fake_reachy import FakeReachy
+
+
+@pytest.fixture
+def reachy():
+    reachy = FakeReachy()
+    yield reachy
+    reachy.close()
+
+
+@pytest.fixture
+def recording():
+    """A smooth 3 joints recording of 2 seconds at 100Hz."""
+    t = np.arange(200)[:, np.newaxis] / 100
+    return np.hstack([30 * np.sin(2 * np.pi * 0.5 * t), 20 * np.cos(2 * np.pi * t), 10 * t - 5])
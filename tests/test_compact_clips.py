@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from hello_world.behaviors.bundle import Bundle
+from hello_world.behaviors.keyframes import KeyframeTrajectory
+from hello_world.behaviors.quantized import FLOAT32, INT16, QuantizedFrames, quantize, reconstruction_error
+
+
+def test_keyframes_round_trip_within_tolerance(recording, tmp_path):
+    keyframes = KeyframeTrajectory.fit(recording, tolerance=0.1)
+    assert keyframes.shape == recording.shape
+    assert len(keyframes.knots) < recording.size
+
+    path = str(tmp_path / 'clip.kf.npz')
+    keyframes.save(path)
+    loaded = KeyframeTrajectory.load(path)
+
+    assert np.abs(np.asarray(loaded) - recording).max() <= 0.1
+    # Frame by frame access decodes the same frames as the whole trajectory.
+    np.testing.assert_allclose(np.array([loaded[i] for i in range(len(loaded))]), np.asarray(loaded))
+
+
+@pytest.mark.parametrize('dtype', [INT16, FLOAT32])
+def test_quantized_round_trip_within_tolerance(recording, dtype):
+    compact = quantize(recording, dtype)
+    assert reconstruction_error(recording, compact).max() <= 0.1
+
+
+def test_quantized_static_and_empty_frames():
+    frames = np.full((10, 2), 12.5)
+    np.testing.assert_allclose(np.asarray(QuantizedFrames.quantize(frames)), frames)
+    assert QuantizedFrames.quantize(np.zeros((0, 2))).shape == (0, 2)
+
+
+def test_bundle_round_trip(recording, tmp_path):
+    path = str(tmp_path / 'movements.bundle')
+    clips = {'raw': recording, 'quantized': QuantizedFrames.quantize(recording)}
+    Bundle.write(path, clips, {'raw': {'rate': 100}})
+
+    bundle = Bundle(path)
+    assert sorted(bundle) == ['quantized', 'raw']
+    np.testing.assert_array_equal(bundle['raw'], recording)
+    assert np.abs(np.asarray(bundle['quantized']) - recording).max() <= 0.1
+    assert bundle.metadata('raw') == {'rate': 100}
+    assert not bundle['raw'].flags.writeable
+
+
+def test_bundle_shared_memory_round_trip(recording):
+    memory = Bundle.share({'raw': recording})
+    try:
+        bundle = Bundle.attach(memory.name)
+        np.testing.assert_array_equal(bundle['raw'], recording)
+        bundle.close()
+    finally:
+        memory.close()
+        memory.unlink()
@@ -0,0 +1,28 @@
+import numpy as np
+
+from hello_world.behaviors.oscillators import OscillatorBank
+
+
+def test_evaluate_matches_sin():
+    bank = OscillatorBank(['a', 'b'], amplitudes=[10, 5], frequencies=[0.5, 2.0], phases=[0, np.pi / 2], offsets=[1, -1])
+    for t in np.linspace(0, 3, 31):
+        expected = [1 + 10 * np.sin(np.pi * t), -1 + 5 * np.sin(4 * np.pi * t + np.pi / 2)]
+        np.testing.assert_allclose(bank.evaluate(t), expected, atol=1e-9)
+
+
+def test_precomputed_table_matches_sin():
+    bank = OscillatorBank(['a', 'b'], amplitudes=[10, 5], frequencies=[0.5, 1.0])
+    assert bank.period == 2.0
+
+    bank.precompute(rate=1000)
+    for t in np.linspace(0, 5, 51):
+        np.testing.assert_allclose(bank.evaluate(t), [10 * np.sin(np.pi * t), 5 * np.sin(2 * np.pi * t)], atol=0.05)
+
+
+def test_added_banks_are_evaluated_together():
+    a = OscillatorBank(['a'], amplitudes=2, frequencies=1)
+    b = OscillatorBank(['b'], amplitudes=3, frequencies=0.25)
+    bank = a + b
+
+    assert bank.joints == ['a', 'b']
+    np.testing.assert_allclose(bank.evaluate(0.3), np.concatenate([a.evaluate(0.3), b.evaluate(0.3)]))
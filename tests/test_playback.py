@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from hello_world.behaviors.playback import DROP, INTERPOLATE, TrajectoryPlayer
+
+
+@pytest.mark.parametrize('catch_up', [DROP, INTERPOLATE])
+def test_play_keeps_the_recorded_duration(reachy, recording, catch_up):
+    joints = list(reachy.head.joints.values())[:3]
+    player = TrajectoryPlayer(joints, 100, catch_up=catch_up, compensate_lag=False)
+
+    report = asyncio.run(player.play(recording[:100]))
+
+    assert report.nb_frames == 100
+    assert report.nominal_duration == pytest.approx(1.0)
+    assert report.duration == pytest.approx(1.0, abs=0.1)
+    assert report.frames_written + report.frames_dropped == 100
+    assert player.last_report is report
+
+
+def test_play_sends_the_frames(reachy, recording):
+    joints = list(reachy.head.joints.values())[:3]
+    player = TrajectoryPlayer(joints, 100, compensate_lag=False)
+    reachy.clear_writes()
+
+    report = asyncio.run(player.play(recording[:50], speed=2.0))
+
+    assert report.nominal_duration == pytest.approx(0.25)
+    writes = reachy.writes()
+    for joint, column in zip(joints, recording[:50].T):
+        # The last frame is sent (goal positions are in degrees).
+        assert writes[joint.name][-1][1] == pytest.approx(column[-1], abs=0.01)
+        # The fake robot reached it (the SDK rounds the present positions).
+        assert joint.present_position == pytest.approx(column[-1], abs=0.1)
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from hello_world.behaviors.recorder import FLUSH_PERIOD, NpyWriter, Recorder, RingBuffer
+
+
+def test_ring_buffer_pops_the_samples_pushed_since_the_last_pop():
+    buffer = RingBuffer(4, 2)
+    for i in range(3):
+        buffer.push([i, -i])
+    np.testing.assert_array_equal(buffer.pop(), [[0, 0], [1, -1], [2, -2]])
+    assert len(buffer.pop()) == 0
+
+
+def test_ring_buffer_wraps_around():
+    buffer = RingBuffer(4, 1)
+    for i in range(3):
+        buffer.push([i])
+    buffer.pop()
+    for i in range(3, 7):
+        buffer.push([i])
+
+    np.testing.assert_array_equal(buffer.pop()[:, 0], [3, 4, 5, 6])
+    assert buffer.overruns == 0
+
+
+def test_ring_buffer_counts_the_overwritten_samples():
+    buffer = RingBuffer(4, 1)
+    for i in range(10):
+        buffer.push([i])
+
+    np.testing.assert_array_equal(buffer.pop()[:, 0], [6, 7, 8, 9])
+    assert buffer.overruns == 6
+
+
+def test_npy_writer_round_trip(tmp_path):
+    path = str(tmp_path / 'take.npy')
+    rows = np.arange(30, dtype=np.float64).reshape(10, 3)
+
+    writer = NpyWriter(path, 3, dtype=np.float64)
+    writer.append(rows[:4])
+    writer.append(rows[4:])
+    writer.close()
+
+    loaded = np.load(path)
+    assert loaded.dtype == np.float64
+    np.testing.assert_array_equal(loaded, rows)
+
+
+def test_npy_writer_empty_file_is_valid(tmp_path):
+    path = str(tmp_path / 'take.npy')
+    NpyWriter(path, 5).close()
+    assert np.load(path).shape == (0, 5)
+
+
+def test_npy_writer_refuses_an_existing_file(tmp_path):
+    path = tmp_path / 'take.npy'
+    path.write_bytes(b'recording')
+
+    with pytest.raises(FileExistsError):
+        NpyWriter(str(path), 3)
+    assert path.read_bytes() == b'recording'
+
+    NpyWriter(str(path), 3, overwrite=True).close()
+    assert np.load(str(path)).shape == (0, 3)
+
+
+def test_recorder_rejects_a_buffer_shorter_than_two_flushes(tmp_path):
+    with pytest.raises(ValueError):
+        Recorder([], str(tmp_path / 'take.npy'), buffer_duration=FLUSH_PERIOD)
+
+
+def test_recorder_keeps_every_sample(tmp_path):
+    from hello_world.fake_reachy import FakeReachy
+
+    reachy = FakeReachy()
+    try:
+        path = str(tmp_path / 'take.npy')
+        recorder = Recorder(list(reachy.head.joints.values()), path, rate=100)
+        summary = asyncio.run(recorder.record(0.6))
+    finally:
+        reachy.close()
+
+    assert summary['samples'] == 60
+    assert summary['overruns'] == 0
+    assert np.load(path).shape == (60, len(summary['joints']))
+    with open(str(tmp_path / 'take.json')) as f:
+        assert json.load(f)['rate'] == 100
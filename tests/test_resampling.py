@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from hello_world.behaviors.resampling import CUBIC, LINEAR, resample
+
+
+@pytest.mark.parametrize('kind', [LINEAR, CUBIC])
+def test_resample_speed_changes_the_number_of_frames(recording, kind):
+    assert len(resample(recording, source_rate=100, speed=2.0, kind=kind)) == 100
+    assert len(resample(recording, source_rate=100, speed=0.5, kind=kind)) == 400
+
+
+def test_resample_duration_sets_the_played_duration(recording):
+    frames = resample(recording, source_rate=100, duration=1.5)
+    assert len(frames) == 150
+
+
+def test_resample_rate_conversion_keeps_the_duration(recording):
+    frames = resample(recording, source_rate=50, target_rate=100)
+    assert len(frames) == 2 * len(recording)
+
+
+def test_resample_keeps_the_ends(recording):
+    frames = resample(recording, source_rate=100, speed=1.7, kind=CUBIC)
+    np.testing.assert_allclose(frames[0], recording[0])
+    np.testing.assert_allclose(frames[-1], recording[-1])
+
+
+def test_resample_at_normal_speed_is_a_copy(recording):
+    frames = resample(recording, source_rate=100)
+    np.testing.assert_array_equal(frames, recording)
+    assert frames is not recording
+
+
+def test_resample_rejects_a_negative_speed(recording):
+    with pytest.raises(ValueError):
+        resample(recording, source_rate=100, speed=-1)
@@ -0,0 +1,56 @@
+import asyncio
+
+from hello_world.behaviors.resources import HEAD, LEFT_ARM, RIGHT_ARM, ResourceArbiter
+
+
+class Behavior:
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+
+
+def test_acquire_and_release():
+    arbiter = ResourceArbiter()
+    look, wave = Behavior('look'), Behavior('wave')
+
+    assert arbiter.try_acquire(look, {RIGHT_ARM, HEAD})
+    assert not arbiter.try_acquire(wave, {RIGHT_ARM})
+    assert arbiter.try_acquire(wave, {LEFT_ARM})
+    assert arbiter.holders({RIGHT_ARM, LEFT_ARM}, wave) == {look}
+
+    arbiter.release(look)
+    assert arbiter.is_free({RIGHT_ARM, HEAD}, wave)
+    assert arbiter.try_acquire(wave, {RIGHT_ARM})
+
+
+def test_children_share_the_parts_of_their_parents():
+    arbiter = ResourceArbiter()
+    idle = Behavior('idle')
+    child = Behavior('child', parent=idle)
+    grandchild = Behavior('grandchild', parent=child)
+
+    assert arbiter.try_acquire(idle, {RIGHT_ARM, LEFT_ARM})
+    assert arbiter.try_acquire(grandchild, {RIGHT_ARM})
+    assert not arbiter.try_acquire(Behavior('other'), {LEFT_ARM})
+
+    # Releasing the child does not release the parts of its parent.
+    arbiter.release(grandchild)
+    assert arbiter.owners == {RIGHT_ARM: idle, LEFT_ARM: idle}
+
+
+def test_acquire_waits_for_the_release():
+    arbiter = ResourceArbiter()
+    first, second = Behavior('first'), Behavior('second')
+
+    async def scenario():
+        arbiter.try_acquire(first, {HEAD})
+        waiting = asyncio.create_task(arbiter.acquire(second, {HEAD}))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+
+        arbiter.release(first)
+        await asyncio.wait_for(waiting, 1.0)
+
+    asyncio.run(scenario())
+    assert arbiter.owners == {HEAD: second}
+    assert arbiter.contentions[HEAD] == 1
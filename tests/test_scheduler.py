@@ -0,0 +1,66 @@
+from collections import Counter
+
+import pytest
+
+from hello_world.behaviors.registry import BehaviorRegistry
+from hello_world.behaviors.scheduler import BehaviorScheduler
+
+
+class Often:
+    weight = 3.0
+    cooldown = 0
+
+
+class Rarely:
+    weight = 1.0
+    cooldown = 0
+
+
+class Never:
+    weight = 0.0
+
+
+class Once:
+    cooldown = 2
+
+
+def registry(**factories):
+    return BehaviorRegistry(None, factories=factories, discover=False)
+
+
+def test_weighted_choice():
+    scheduler = BehaviorScheduler(registry(often=Often, rarely=Rarely, never=Never), seed=0)
+    picks = Counter(scheduler.pick() for _ in range(2000))
+
+    assert picks['never'] == 0
+    assert 2.5 < picks['often'] / picks['rarely'] < 3.5
+
+
+def test_same_seed_same_sequence():
+    sequences = [
+        [BehaviorScheduler(registry(often=Often, rarely=Rarely), seed=42).pick() for _ in range(20)]
+        for _ in range(2)
+    ]
+    assert sequences[0] == sequences[1]
+
+
+def test_cooldown_prevents_repeats():
+    scheduler = BehaviorScheduler(registry(a=Once, b=Once, c=Once, d=Once), seed=1)
+    history = [scheduler.pick() for _ in range(200)]
+
+    for i, name in enumerate(history):
+        # Not picked again during the two next cycles.
+        assert name not in history[i + 1:i + 3]
+
+
+def test_cooling_down_behaviors_fall_back_on_the_least_recently_played():
+    scheduler = BehaviorScheduler(registry(a=Once, b=Once), seed=1)
+    history = [scheduler.pick() for _ in range(10)]
+    assert all(history[i] != history[i + 1] for i in range(9))
+
+
+def test_weights_are_validated():
+    with pytest.raises(ValueError):
+        BehaviorScheduler(registry(never=Never))
+    with pytest.raises(ValueError):
+        BehaviorScheduler(registry(often=Often), weights={'often': -1})
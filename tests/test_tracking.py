@@ -0,0 +1,64 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from hello_world.behaviors.playback import DROP, INTERPOLATE, TrajectoryPlayer
+from hello_world.fake_reachy import FakeReachy
+
+
+MOTOR_LAG = 0.05
+
+
+@pytest.fixture
+def lagging_reachy():
+    reachy = FakeReachy(motor_lag=MOTOR_LAG)
+    yield reachy
+    reachy.close()
+
+
+def clip(duration: float = 3.0, rate: float = 100) -> np.ndarray:
+    """Three joints swinging at different paces, the last two ones static."""
+    t = np.arange(int(duration * rate))[:, np.newaxis] / rate
+    moving = 30 * np.sin(2 * np.pi * np.array([0.5, 1.0, 1.5]) * t)
+    return np.hstack([moving, np.full((len(t), 2), 10.0)])
+
+
+@pytest.mark.parametrize('catch_up', [INTERPOLATE, DROP])
+def test_lag_converges_to_the_motor_lag(lagging_reachy, catch_up):
+    joints = list(lagging_reachy.l_arm.joints.values())[:5]
+    player = TrajectoryPlayer(joints, 100, catch_up=catch_up, compensate_lag=True)
+
+    asyncio.run(player.play(clip()))
+
+    report = player.compensator.report()
+    # Plus up to a period of the fake robot synchronisation loop (and of the held frames with DROP).
+    np.testing.assert_allclose(report.lag[:3], MOTOR_LAG, atol=0.02)
+    np.testing.assert_array_equal(report.lag[3:], 0.0)
+
+
+def test_compensation_reduces_the_tracking_error(lagging_reachy):
+    joints = list(lagging_reachy.l_arm.joints.values())[:5]
+    errors = {}
+    for compensate_lag in (False, True):
+        player = TrajectoryPlayer(joints, 100, compensate_lag=True)
+        if not compensate_lag:
+            player.compensator.max_lag = 0.0
+
+        asyncio.run(player.play(clip()))
+        errors[compensate_lag] = player.compensator.report().rms_error[:3].mean()
+
+    assert errors[True] < errors[False] / 2
+
+
+def test_drop_sends_recorded_frames(reachy):
+    joints = list(reachy.l_arm.joints.values())[:5]
+    compensator = TrajectoryPlayer(joints, 100, catch_up=DROP, compensate_lag=True).compensator
+    compensator.lag[:] = 0.033
+    frames = clip(1.0)
+
+    compensator.start(100)
+    for position in np.linspace(0, 90, 37):
+        frame = compensator.frame(frames, position, now=position / 100, interpolate=False)
+        for column, value in enumerate(frame):
+            assert np.any(np.isclose(frames[:, column], value))